@@ -4,6 +4,8 @@ Statistical analysis functions for trading performance.
 
 from collections import defaultdict
 from config import TICK_VALUE, TRAILING_STOP_CONFIGS
+from simulation import TIME_STOP_HORIZONS
+from overfit import cscv_pbo, deflated_best_sharpe
 
 
 def analyze_confluence_effectiveness(roundtrips):
@@ -229,16 +231,54 @@ def analyze_early_exit_impact(roundtrips):
     }
 
 
-def analyze_trailing_stop_impact(roundtrips):
+def analyze_confluence_thresholds(roundtrips):
+    """
+    Confluence drop exit at every threshold k (rt['confluence_thresholds']).
+    
+    Returns {k: {'trades_analyzed', 'trades_with_drop', 'better', 'worse',
+    'total_difference_ticks', 'total_hypo_pnl', 'total_actual_pnl'}} where
+    trades without a drop keep their actual P&L.
+    """
+    results = {}
+    for rt in roundtrips:
+        if not rt['complete'] or not rt.get('confluence_thresholds'):
+            continue
+        actual_pnl = rt['pnl_ticks']
+        for k, hypo_pnl in rt['confluence_thresholds'].items():
+            r = results.setdefault(k, {
+                'trades_analyzed': 0, 'trades_with_drop': 0, 'better': 0, 'worse': 0,
+                'total_difference_ticks': 0, 'total_hypo_pnl': 0, 'total_actual_pnl': 0
+            })
+            r['trades_analyzed'] += 1
+            r['total_actual_pnl'] += actual_pnl
+            if hypo_pnl is None:
+                r['total_hypo_pnl'] += actual_pnl
+                continue
+            difference = hypo_pnl - actual_pnl
+            r['trades_with_drop'] += 1
+            r['total_hypo_pnl'] += hypo_pnl
+            r['total_difference_ticks'] += difference
+            if difference > 0:
+                r['better'] += 1
+            elif difference < 0:
+                r['worse'] += 1
+    return dict(sorted(results.items()))
+
+
+def analyze_trailing_stop_impact(roundtrips, field='trailing_stop_analysis', configs=TRAILING_STOP_CONFIGS):
     """
     Analyze the impact of trailing stop strategies across all trades.
     
+    field/configs select the per-trade results to aggregate; the scale-out
+    simulations use field='scale_out_analysis' with SCALE_OUT_CONFIGS
+    (their trail_pnl is the blended per-contract P&L).
+    
     Returns dict with analysis for each trailing stop configuration.
     """
     results = {}
     trades_no_bar_data = 0
     
-    for config in TRAILING_STOP_CONFIGS:
+    for config in configs:
         config_name = config['name']
         results[config_name] = {
             'config': config,
@@ -249,6 +289,10 @@ def analyze_trailing_stop_impact(roundtrips):
             'total_difference_ticks': 0,
             'total_actual_pnl': 0,
             'total_trail_pnl': 0,
+            # Net of modelled slippage (slippage.apply_slippage_model)
+            'trades_with_slippage': 0,
+            'total_slippage_ticks': 0,
+            'total_trail_net_pnl': 0,
             # Breakdown by actual outcome
             'winners_analyzed': 0,
             'winners_better_with_trail': 0,
@@ -271,7 +315,7 @@ def analyze_trailing_stop_impact(roundtrips):
         if not rt['complete']:
             continue
         
-        trail_analysis = rt.get('trailing_stop_analysis', {})
+        trail_analysis = rt.get(field, {})
         if not trail_analysis:
             trades_no_bar_data += 1
             continue
@@ -292,6 +336,10 @@ def analyze_trailing_stop_impact(roundtrips):
             r['total_actual_pnl'] += actual_pnl
             r['total_trail_pnl'] += trail_pnl
             r['total_difference_ticks'] += difference
+            if 'trail_net_pnl' in analysis:
+                r['trades_with_slippage'] += 1
+                r['total_slippage_ticks'] += analysis['slippage_ticks']
+                r['total_trail_net_pnl'] += analysis['trail_net_pnl']
             
             # Track exit types
             r['trail_exits_by_type'][result['exit_type']] += 1
@@ -347,3 +395,203 @@ def analyze_trailing_stop_impact(roundtrips):
         'trades_no_bar_data': trades_no_bar_data,
         'configs': results
     }
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile (pct in 0..100) of an ascending list."""
+    if not sorted_values:
+        return 0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    frac = pos - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * frac
+
+
+def summarize_distribution(values):
+    """Count, mean and P10/P25/P50/P75/P90 of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'min': ordered[0],
+        'p10': percentile(ordered, 10),
+        'p25': percentile(ordered, 25),
+        'p50': percentile(ordered, 50),
+        'p75': percentile(ordered, 75),
+        'p90': percentile(ordered, 90),
+        'max': ordered[-1]
+    }
+
+
+EXCURSION_BUCKETS = [(0, 10), (10, 20), (20, 40), (40, 80), (80, 120), (120, None)]
+
+
+def analyze_excursions(roundtrips):
+    """
+    Summarize per-trade MAE/MFE excursion stats into distributions.
+    
+    Returns dict with distribution summaries for MAE, MFE, time-to-MFE,
+    oracle best-exit P&L and ticks left on the table, MAE split by
+    winners/losers, and bucketed MAE/MFE histograms.
+    """
+    trades = []
+    for rt in roundtrips:
+        if not rt['complete'] or not rt.get('excursion'):
+            continue
+        exc = rt['excursion']
+        trades.append({
+            'entry_time': rt['entry']['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+            'direction': rt['direction'],
+            'actual_pnl': rt['pnl_ticks'],
+            'was_winner': rt['pnl_ticks'] > 0,
+            **exc
+        })
+    
+    if not trades:
+        return None
+    
+    def histogram(key):
+        counts = []
+        for low, high in EXCURSION_BUCKETS:
+            label = f"{low}-{high}t" if high is not None else f"{low}t+"
+            count = sum(1 for t in trades if t[key] >= low and (high is None or t[key] < high))
+            counts.append((label, count))
+        return counts
+    
+    return {
+        'trades_analyzed': len(trades),
+        'mae': summarize_distribution([t['mae_ticks'] for t in trades]),
+        'mfe': summarize_distribution([t['mfe_ticks'] for t in trades]),
+        'time_to_mfe': summarize_distribution([t['time_to_mfe_seconds'] for t in trades]),
+        'oracle_pnl': summarize_distribution([t['oracle_pnl_ticks'] for t in trades]),
+        'left_on_table': summarize_distribution([t['left_on_table_ticks'] for t in trades]),
+        'winner_mae': summarize_distribution([t['mae_ticks'] for t in trades if t['was_winner']]),
+        'loser_mfe': summarize_distribution([t['mfe_ticks'] for t in trades if not t['was_winner']]),
+        'total_oracle_pnl': sum(t['oracle_pnl_ticks'] for t in trades),
+        'total_actual_pnl': sum(t['actual_pnl'] for t in trades),
+        'mae_histogram': histogram('mae_ticks'),
+        'mfe_histogram': histogram('mfe_ticks'),
+        'trade_details': trades
+    }
+
+
+def analyze_trailing_overfitting(trailing_stop_analysis):
+    """
+    CSCV / PBO and deflated Sharpe over the per-trade x trailing config
+    P&L matrix built from analyze_trailing_stop_impact results.
+    Returns None when fewer than 2 configs or 4 trades are available.
+    """
+    if not trailing_stop_analysis:
+        return None
+    names = [name for name in trailing_stop_analysis['configs']
+             if trailing_stop_analysis['configs'][name]['trades_analyzed'] > 0]
+    if len(names) < 2:
+        return None
+    columns = [[t['trail_pnl'] for t in trailing_stop_analysis['configs'][name]['trade_details']] for name in names]
+    if len(set(len(col) for col in columns)) != 1 or len(columns[0]) < 4:
+        return None
+    matrix = [list(row) for row in zip(*columns)]
+    
+    deflated = deflated_best_sharpe(matrix)
+    return {
+        'cscv': cscv_pbo(matrix),
+        'deflated': deflated,
+        'best_name': names[deflated['best_index']] if deflated else None
+    }
+
+
+def analyze_exit_rules(roundtrips):
+    """
+    Aggregate the per-trade exit rule results (rt['exit_rules']) by rule set.
+    
+    Returns dict with trades_analyzed, total_actual_pnl and per rule set:
+    trades, wins, total_pnl, difference vs actual, avg bars held and exit
+    type counts (in config.EXIT_RULE_SETS order).
+    """
+    rules = {}
+    trades_analyzed = 0
+    total_actual_pnl = 0
+    
+    for rt in roundtrips:
+        if not rt['complete'] or not rt.get('exit_rules'):
+            continue
+        trades_analyzed += 1
+        total_actual_pnl += rt['pnl_ticks']
+        
+        for name, result in rt['exit_rules'].items():
+            r = rules.setdefault(name, {
+                'trades': 0, 'wins': 0, 'total_pnl': 0, 'total_difference': 0,
+                'bars_held': 0, 'exits_by_type': defaultdict(int)
+            })
+            pnl = result['exit_pnl_ticks']
+            r['trades'] += 1
+            r['total_pnl'] += pnl
+            r['total_difference'] += pnl - rt['pnl_ticks']
+            r['bars_held'] += result['bars_held']
+            r['exits_by_type'][result['exit_type']] += 1
+            if pnl > 0:
+                r['wins'] += 1
+    
+    for r in rules.values():
+        r['win_rate'] = r['wins'] / r['trades'] * 100 if r['trades'] else 0
+        r['avg_pnl'] = r['total_pnl'] / r['trades'] if r['trades'] else 0
+        r['avg_bars_held'] = r['bars_held'] / r['trades'] if r['trades'] else 0
+        r['exits_by_type'] = dict(r['exits_by_type'])
+    
+    return {
+        'trades_analyzed': trades_analyzed,
+        'total_actual_pnl': total_actual_pnl,
+        'rules': rules
+    }
+
+
+def analyze_time_stops(roundtrips):
+    """
+    Aggregate the per-trade time-stop sweep (rt['time_stop']) per horizon.
+    
+    Returns dict with trades_analyzed, total_actual_pnl and 'horizons':
+    {minutes: {'trades', 'excluded', 'actual_pnl', 'mtm_pnl', 'mtm_wins',
+    'sltp_pnl', 'sltp_wins'}} where mtm is a pure time stop and sltp the
+    fixed SL/TP with the time stop added, plus the best horizon of each.
+    Trades without a mark at a horizon (no bar inside it, or the data ends
+    before it) are excluded from that horizon only.
+    """
+    horizons = {m: {'trades': 0, 'excluded': 0, 'actual_pnl': 0, 'mtm_pnl': 0, 'mtm_wins': 0,
+                    'sltp_pnl': 0, 'sltp_wins': 0} for m in TIME_STOP_HORIZONS}
+    trades_analyzed = 0
+    total_actual_pnl = 0
+    
+    for rt in roundtrips:
+        if not rt['complete'] or not rt.get('time_stop'):
+            continue
+        trades_analyzed += 1
+        total_actual_pnl += rt['pnl_ticks']
+        for minutes, mtm, sltp in zip(TIME_STOP_HORIZONS, rt['time_stop']['mtm'], rt['time_stop']['with_sltp']):
+            h = horizons[minutes]
+            if mtm is None:
+                h['excluded'] += 1
+                continue
+            h['trades'] += 1
+            h['actual_pnl'] += rt['pnl_ticks']
+            h['mtm_pnl'] += mtm
+            h['sltp_pnl'] += sltp
+            if mtm > 0:
+                h['mtm_wins'] += 1
+            if sltp > 0:
+                h['sltp_wins'] += 1
+    
+    marked = [m for m in horizons if horizons[m]['trades']]
+    if not marked:
+        return None
+    return {
+        'trades_analyzed': trades_analyzed,
+        'total_actual_pnl': total_actual_pnl,
+        'horizons': horizons,
+        'best_mtm': max(marked, key=lambda m: horizons[m]['mtm_pnl'] - horizons[m]['actual_pnl']),
+        'best_sltp': max(marked, key=lambda m: horizons[m]['sltp_pnl'] - horizons[m]['actual_pnl'])
+    }
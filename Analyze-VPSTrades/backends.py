@@ -0,0 +1,58 @@
+"""
+Execution backends for independent per-item work (e.g. per-trade enrichment).
+- serial:  in-process loop
+- thread:  ThreadPoolExecutor (pays off for GIL-releasing kernels and
+           free-threaded CPython builds)
+- process: ProcessPoolExecutor (scales pure-Python work with cores)
+
+Items are split into chunks and results come back in item order, so the
+output never depends on the backend or worker count.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+BACKENDS = ['serial', 'thread', 'process']
+
+
+def auto_chunk_size(n_items, workers):
+    """~4 chunks per worker: enough to balance load, few enough to keep IPC low."""
+    return max(1, -(-n_items // (workers * 4)))
+
+
+def map_chunks(func, items, backend='serial', workers=None, chunk_size=None,
+               initializer=None, initargs=()):
+    """
+    Apply func(chunk) -> list of results to chunks of items; return the
+    flattened results in item order.
+
+    initializer(*initargs) prepares per-process state for the process
+    backend; serial and thread backends run it once in this process.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    items = list(items)
+    if not items:
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    if backend == 'serial' or workers == 1:
+        if initializer:
+            initializer(*initargs)
+        return func(items)
+
+    chunk_size = chunk_size or auto_chunk_size(len(items), workers)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = []
+    if backend == 'thread':
+        if initializer:
+            initializer(*initargs)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(func, chunks):
+                results.extend(chunk_results)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                 initargs=initargs) as executor:
+            for chunk_results in executor.map(func, chunks):
+                results.extend(chunk_results)
+    return results
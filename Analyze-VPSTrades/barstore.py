@@ -0,0 +1,163 @@
+"""
+Columnar BAR store built once per session from the parsed BAR dicts.
+Keeps timestamps, closes, indicator states and confluence counts in compact
+typed arrays so analysis stages can locate a trade's bar window by binary
+search instead of rescanning the list.
+
+The arrays can be published to a multiprocessing.shared_memory block; pool
+workers attach by name and read them through zero-copy read-only views, so
+no bar data is pickled per worker.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from multiprocessing import shared_memory
+
+from config import CSV_INDICATOR_COLUMNS, CONFLUENCE_THRESHOLDS
+
+EPOCH = datetime(1970, 1, 1)
+
+# Indicator state columns (1 = UP, -1 = DN, 0 = missing/other)
+INDICATOR_NAMES = list(CSV_INDICATOR_COLUMNS.values())
+STATE_CODES = {'UP': 1, 'DN': -1}
+
+
+def to_epoch_seconds(timestamp):
+    """Convert a naive BAR timestamp to float seconds since 1970-01-01."""
+    return (timestamp - EPOCH).total_seconds()
+
+
+def build_bar_store(bars):
+    """
+    Build a columnar store from BAR dicts (must be sorted by timestamp).
+
+    Returns dict with:
+    - bars: the original BAR dict list (for callers that need full rows)
+    - times: array('d') of epoch seconds
+    - closes: array('d') of close prices
+    - bull_conf / bear_conf: array('b') of confluence counts
+    - indicators: {name: array('b') of state codes} for INDICATOR_NAMES
+      (0 for bars without indicators: tick windows, decoded remote windows)
+    """
+    return {
+        'bars': bars,
+        'times': array('d', [to_epoch_seconds(b['timestamp']) for b in bars]),
+        'closes': array('d', [b['close'] for b in bars]),
+        'bull_conf': array('b', [b.get('bull_conf', 0) for b in bars]),
+        'bear_conf': array('b', [b.get('bear_conf', 0) for b in bars]),
+        'indicators': {
+            name: array('b', [STATE_CODES.get(b.get('indicators', {}).get(name), 0) for b in bars])
+            for name in INDICATOR_NAMES
+        },
+    }
+
+
+def find_window(store, start_time, end_time):
+    """
+    Return half-open index range (lo, hi) of bars with
+    start_time <= timestamp <= end_time. Empty window when lo >= hi.
+    """
+    times = store['times']
+    lo = bisect_left(times, to_epoch_seconds(start_time))
+    hi = bisect_right(times, to_epoch_seconds(end_time))
+    return lo, hi
+
+
+def build_confluence_drop_index(store, thresholds=CONFLUENCE_THRESHOLDS):
+    """
+    Precompute "next bar at or after i whose confluence is < k" for each
+    threshold k and side, by one reverse scan per (side, k).
+
+    Returns dict with store plus 'bull' / 'bear': {k: array('i')}; an entry
+    equal to len(bars) means the confluence never drops below k again.
+    """
+    n = len(store['times'])
+    index = {'store': store}
+    for side in ('bull', 'bear'):
+        conf = store[f"{side}_conf"]
+        index[side] = {}
+        for k in thresholds:
+            nxt = array('i', bytes(4 * n))
+            following = n
+            for i in range(n - 1, -1, -1):
+                if conf[i] < k:
+                    following = i
+                nxt[i] = following
+            index[side][k] = nxt
+    return index
+
+
+def next_confluence_drop(drop_index, direction, k, start):
+    """
+    Index of the first bar >= start whose trade-side confluence is < k
+    (bull side for LONG, bear side for SHORT), or len(bars) if none.
+    Returns None when k was not precomputed.
+    """
+    side = drop_index['bull' if direction == 'LONG' else 'bear']
+    if k not in side:
+        return None
+    nxt = side[k]
+    return nxt[start] if start < len(nxt) else len(nxt)
+
+
+def _store_columns(store):
+    """(column key, array) pairs in shared-memory layout order."""
+    columns = [('times', store['times']), ('closes', store['closes']),
+               ('bull_conf', store['bull_conf']), ('bear_conf', store['bear_conf'])]
+    columns.extend((f"indicators.{name}", store['indicators'][name]) for name in INDICATOR_NAMES)
+    return columns
+
+
+def publish_bar_store(store):
+    """
+    Copy the store's arrays into one shared memory block.
+
+    Returns (shm, descriptor). The descriptor is a small picklable dict
+    (block name, bar count, column layout) handed to workers for
+    attach_bar_store. The caller owns the block and must call
+    shm.close() and shm.unlink() when the workers are done.
+    """
+    layout = []
+    offset = 0
+    for key, values in _store_columns(store):
+        # Keep every column 8-byte aligned
+        offset = -(-offset // 8) * 8
+        layout.append((key, values.typecode, offset))
+        offset += len(values) * values.itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (key, typecode, start), (_, values) in zip(layout, _store_columns(store)):
+        raw = values.tobytes()
+        shm.buf[start:start + len(raw)] = raw
+    descriptor = {'name': shm.name, 'count': len(store['times']), 'columns': layout}
+    return shm, descriptor
+
+
+def attach_bar_store(descriptor):
+    """
+    Attach to a block published by publish_bar_store.
+
+    Returns a store dict with the same keys as build_bar_store (bars is
+    None) whose columns are read-only memoryviews into shared memory, plus
+    'shm' holding the attachment. Release it with detach_bar_store.
+    """
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    count = descriptor['count']
+    store = {'bars': None, 'indicators': {}, 'shm': shm, 'views': []}
+    for key, typecode, start in descriptor['columns']:
+        itemsize = array(typecode).itemsize
+        view = shm.buf[start:start + count * itemsize].cast(typecode).toreadonly()
+        store['views'].append(view)
+        if key.startswith('indicators.'):
+            store['indicators'][key.split('.', 1)[1]] = view
+        else:
+            store[key] = view
+    return store
+
+
+def detach_bar_store(store):
+    """Release an attached store's views and close its shared memory handle."""
+    for view in store['views']:
+        view.release()
+    store['views'] = []
+    store['shm'].close()
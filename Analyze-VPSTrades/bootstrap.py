@@ -0,0 +1,170 @@
+"""
+Bootstrap confidence intervals for report totals.
+
+Figures like "Trail-80/40 saves +NNt" rest on a handful of trades. Each
+metric is written as a per-unit column (one value per round-trip, or per
+day for multi-day runs) whose sum is the report figure; the bootstrap
+resamples units with replacement and re-sums every column.
+
+The resample index matrix (replicates x units) is drawn once from a fixed
+seed and shared by all metrics, so every replicate is the same pseudo-
+session for total P&L, win rate and each strategy difference, and reruns
+give identical intervals. Each replicate is then one C-level sum per
+column (sum(map(column.__getitem__, indices))), so thousands of
+replicates cost well under a second for a day or a month of trades.
+"""
+
+import random
+
+from config import (
+    BOOTSTRAP_REPLICATES, BOOTSTRAP_CONFIDENCE, BOOTSTRAP_SEED, EXIT_RULE_SETS,
+    TRAILING_STOP_CONFIGS, SCALE_OUT_CONFIGS
+)
+from analysis import percentile
+
+
+def resample_index_matrix(n, replicates=BOOTSTRAP_REPLICATES, seed=BOOTSTRAP_SEED):
+    """replicates lists of n indices drawn with replacement from range(n)."""
+    rng = random.Random(seed)
+    population = range(n)
+    return [rng.choices(population, k=n) for _ in range(replicates)]
+
+
+def replicate_sums(column, matrix):
+    """Sum of column over each row of the index matrix."""
+    get = column.__getitem__
+    return [sum(map(get, indices)) for indices in matrix]
+
+
+def bootstrap_metrics(columns, ratios=None, replicates=BOOTSTRAP_REPLICATES, seed=BOOTSTRAP_SEED,
+                      confidence=BOOTSTRAP_CONFIDENCE):
+    """
+    Percentile intervals for sums of per-unit columns.
+
+    columns: {metric: list of per-unit values} (all the same length)
+    ratios: {metric: (numerator column, denominator column, scale)} for
+    metrics such as win rate = 100 * wins / trades
+    Returns {metric: {'estimate', 'low', 'high', 'positive'}} in columns
+    order; positive is the share of replicates above zero (%).
+    """
+    ratios = ratios or {}
+    n = len(next(iter(columns.values()))) if columns else 0
+    if n == 0:
+        return {}
+    matrix = resample_index_matrix(n, replicates, seed)
+    tail = (100 - confidence) / 2
+
+    sums = {name: replicate_sums(column, matrix) for name, column in columns.items()}
+    results = {}
+
+    def interval(estimate, values):
+        ordered = sorted(values)
+        return {
+            'estimate': estimate,
+            'low': percentile(ordered, tail),
+            'high': percentile(ordered, 100 - tail),
+            'positive': sum(1 for v in ordered if v > 0) / len(ordered) * 100
+        }
+
+    # Ratios take the place of their numerator column; denominators are not shown
+    by_numerator = {num: (name, den, scale) for name, (num, den, scale) in ratios.items()}
+    denominators = {den for _, den, _ in ratios.values()}
+    for name, column in columns.items():
+        if name in by_numerator:
+            ratio_name, den, scale = by_numerator[name]
+            total = sum(columns[den])
+            estimate = scale * sum(column) / total if total else 0
+            values = [scale * a / b if b else 0 for a, b in zip(sums[name], sums[den])]
+            results[ratio_name] = interval(estimate, values)
+        elif name not in denominators:
+            results[name] = interval(sum(column), sums[name])
+    return results
+
+
+def trade_metric_columns(roundtrips):
+    """
+    Per-trade columns for the daily report metrics (complete round-trips).
+
+    Sums reproduce the report: total P&L, ALIGNED P&L, wins / trades (win
+    rate), the early-exit strategy differences, each exit rule set and each
+    trailing / scale-out config difference vs actual (0 for trades a
+    strategy did not cover, as in the report totals).
+    """
+    complete = [rt for rt in roundtrips if rt['complete']]
+    columns = {
+        'Total P&L': [rt['pnl_ticks'] for rt in complete],
+        'ALIGNED P&L': [rt['pnl_ticks'] if rt.get('alignment') == 'ALIGNED' else 0 for rt in complete],
+        'wins': [1 if rt['pnl_ticks'] > 0 else 0 for rt in complete],
+        'trades': [1] * len(complete),
+    }
+
+    def early_exit(rt, key):
+        flip_analysis = rt.get('flip_analysis') or {}
+        hit = flip_analysis.get(key)
+        if flip_analysis.get('no_bar_data', False) or not hit:
+            return 0
+        return hit['hypothetical_pnl_ticks'] - rt['pnl_ticks']
+
+    if any(rt.get('flip_analysis') for rt in complete):
+        columns['Conf drop exit vs actual'] = [early_exit(rt, 'confluence_drop') for rt in complete]
+        columns['Indicator flip exit vs actual'] = [early_exit(rt, 'first_adverse_flip') for rt in complete]
+
+    if any(rt.get('exit_rules') for rt in complete):
+        for rule_set in EXIT_RULE_SETS:
+            name = rule_set['name']
+            columns[f"Rule {name} vs actual"] = [
+                (rt['exit_rules'][name]['exit_pnl_ticks'] - rt['pnl_ticks'])
+                if name in (rt.get('exit_rules') or {}) else 0
+                for rt in complete
+            ]
+
+    for field, configs in (('trailing_stop_analysis', TRAILING_STOP_CONFIGS), ('scale_out_analysis', SCALE_OUT_CONFIGS)):
+        if not any(rt.get(field) for rt in complete):
+            continue
+        for config in configs:
+            name = config['name']
+            columns[f"{name} vs actual"] = [
+                (rt.get(field) or {}).get(name, {}).get('difference', 0) for rt in complete
+            ]
+    return columns
+
+
+def day_metric_columns(day_sums):
+    """
+    Per-day columns from per-day column totals (one {metric: sum} dict per
+    day, e.g. sum_metric_columns of each day); metrics missing on a day count 0.
+    """
+    names = []
+    for sums in day_sums:
+        names.extend(name for name in sums if name not in names)
+    return {name: [sums.get(name, 0) for sums in day_sums] for name in names}
+
+
+def sum_metric_columns(columns):
+    """Column totals {metric: sum} (what a day contributes to a day-level bootstrap)."""
+    return {name: sum(column) for name, column in columns.items()}
+
+
+# Ratio metrics built from the count columns of trade_metric_columns
+WIN_RATE_RATIO = {'Win rate': ('wins', 'trades', 100)}
+
+
+def format_bootstrap_lines(results, units, unit_label, replicates=BOOTSTRAP_REPLICATES,
+                           confidence=BOOTSTRAP_CONFIDENCE):
+    """Report table: estimate, interval and share of replicates > 0 per metric."""
+    lines = []
+    lines.append(f"{replicates} replicates resampling {units} {unit_label} with replacement "
+                 f"(seed {BOOTSTRAP_SEED}) | {confidence:.0f}% percentile intervals")
+    lines.append("")
+    lines.append(f"{'Metric':<36} {'Estimate':>9} {'Low':>9} {'High':>9} {'P(>0)':>7}")
+    lines.append("-" * 74)
+    for name, r in results.items():
+        if name in WIN_RATE_RATIO:
+            lines.append(f"{name:<36} {r['estimate']:>8.1f}% {r['low']:>8.1f}% {r['high']:>8.1f}% {'---':>7}")
+        else:
+            lines.append(f"{name:<36} {r['estimate']:>+8.1f}t {r['low']:>+8.1f}t "
+                         f"{r['high']:>+8.1f}t {r['positive']:>6.0f}%")
+    lines.append("-" * 74)
+    lines.append("P(>0) = share of replicates where the figure is positive (for 'vs actual' rows:")
+    lines.append("how often the alternative exit beats the actual exits)")
+    return lines
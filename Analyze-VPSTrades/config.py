@@ -23,6 +23,26 @@ CSV_INDICATOR_COLUMNS = {
     'SB_IsUp': 'SB'
 }
 
+# Indicators whose adverse flip counts as an exit signal (in tie-break order)
+FLIP_INDICATORS = ['RR', 'DT', 'VY', 'ET', 'SW', 'T3P', 'AAA']
+
+# Confluence thresholds k precomputed for "next bar with confluence < k" lookups
+# (confluence drop exits, report threshold sweep)
+CONFLUENCE_THRESHOLDS = [1, 2, 3, 4, 5, 6, 7, 8]
+
+# === EXIT SIMULATION DEFAULTS ===
+# Fixed SL/TP used by the trailing stop simulations (NQ: 4 ticks = 1 point)
+DEFAULT_SL_TICKS = 40   # 10 points
+DEFAULT_TP_TICKS = 120  # 30 points
+
+# Exit horizon: how long after entry the simulators follow a trade
+# (main.py --horizon MINUTES); trades still open are marked TIMEOUT
+EXIT_HORIZON_MINUTES = 10
+
+# Time-stop sweep: mark-to-market P&L at every horizon 1..TIME_STOP_MAX_MINUTES
+TIME_STOP_MAX_MINUTES = 120
+TIME_STOP_REPORT_MINUTES = [1, 2, 3, 5, 10, 15, 20, 30, 45, 60, 90, 120]  # Rows shown in the report
+
 # === TRAILING STOP CONFIGURATION ===
 # Grid search: Test multiple activation/trail combinations to find optimum
 TRAILING_STOP_CONFIGS = [
@@ -110,3 +130,184 @@ TRAILING_STOP_CONFIGS = [
         'description': 'Activate at +90t, trail 40t'
     },
 ]
+
+# === EXIT PARAMETER SWEEP ===
+# Default ranges for main.py --sweep (start, stop, step) - stop is inclusive.
+# Override per run with --sl / --tp / --act / --trail "start:stop:step".
+SWEEP_RANGES = {
+    'sl_ticks': (20, 80, 10),
+    'tp_ticks': (60, 200, 20),
+    'activation_ticks': (30, 120, 10),
+    'trail_distance_ticks': (10, 60, 5),
+}
+SWEEP_TOP_N = 25  # Rows in the ranked sweep summary
+SWEEP_UNIT_COMBOS = 1000  # Combos per checkpointed (day, config block) unit
+
+# === ADAPTIVE EXIT SEARCH ===
+# main.py --optimize: successive halving over day subsets, then local refinement
+OPTIMIZER_BUDGET = 2000  # Max (config, day) evaluations per run (--budget)
+OPTIMIZER_SEED = 7       # Random seed for candidate sampling (--seed)
+OPTIMIZER_ETA = 3        # Keep top 1/eta configs per rung
+
+# === WALK-FORWARD ===
+# main.py --walk-forward: pick best exit config on a rolling training window,
+# score it on the following out-of-sample day(s)
+WALK_FORWARD_TRAIN_DAYS = 5           # --train
+WALK_FORWARD_TEST_DAYS = 1            # --test
+WALK_FORWARD_REFERENCE = 'Trail-80/40'  # Fixed config shown alongside for comparison
+
+# === OVERFITTING DIAGNOSTICS ===
+CSCV_BLOCKS = 8  # Row blocks for CSCV (C(8,4) = 70 IS/OOS splits)
+
+# === DISTRIBUTED SWEEPS ===
+# main.py --sweep --serve HOST:PORT hands units to `distributed.py worker` processes
+DISTRIBUTED_PORT = 8765
+DISTRIBUTED_LEASE_SECONDS = 300  # Unit re-queued if its worker is silent this long (--lease)
+DISTRIBUTED_POLL_SECONDS = 2     # Idle worker poll interval
+DISTRIBUTED_MAX_ATTEMPTS = 3     # A unit that fails on this many workers fails the job
+
+# === EXECUTION BACKEND ===
+# Per-trade BAR enrichment of the daily report: 'serial', 'thread' or 'process'
+# (main.py --backend / --workers; workers default to all cores)
+ENRICH_BACKEND = 'serial'
+
+# === TRAIL EVENT RECORDING ===
+# trail_details kept per trailing stop simulation: 'none', 'compact' or 'full'
+# (main.py --trail-details). Sweeps always use 'none'; --batch defaults to 'none'.
+TRAIL_RECORDING = 'compact'
+
+# === SIMULATION RESULT CACHE ===
+# Per-trade trailing stop results persisted in the ActiveNikiAnalysis root,
+# so adding a config only simulates that config (main.py --no-cache to skip)
+SIM_CACHE_FILENAME = 'sim_cache.sqlite'
+SIM_CACHE_MAX_ENTRIES = 200000  # Least-recently-used entries evicted beyond this
+
+# === EXIT RULE COMPARISON ===
+# Rule sets run side by side by exitrules.run_exit_rules in one pass over each
+# trade's bars; several rules in one set exit on whichever triggers first.
+# Rule types: fixed, trailing, breakeven, confluence, flip, time (see exitrules.py)
+EXIT_RULE_SETS = [
+    {'name': 'Fixed 40/120', 'rules': [
+        {'type': 'fixed', 'sl_ticks': 40, 'tp_ticks': 120}]},
+    {'name': 'Trail-80/40', 'rules': [
+        {'type': 'trailing', 'sl_ticks': 40, 'tp_ticks': 120, 'activation_ticks': 80, 'trail_distance_ticks': 40}]},
+    {'name': 'Breakeven after +40t', 'rules': [
+        {'type': 'breakeven', 'sl_ticks': 40, 'tp_ticks': 120, 'trigger_ticks': 40}]},
+    {'name': 'SL/TP + Conf<6', 'rules': [
+        {'type': 'fixed', 'sl_ticks': 40, 'tp_ticks': 120}, {'type': 'confluence', 'k': 6}]},
+    {'name': 'SL/TP + Adverse flip', 'rules': [
+        {'type': 'fixed', 'sl_ticks': 40, 'tp_ticks': 120}, {'type': 'flip'}]},
+    {'name': 'SL/TP + 5m time stop', 'rules': [
+        {'type': 'fixed', 'sl_ticks': 40, 'tp_ticks': 120}, {'type': 'time', 'minutes': 5}]},
+    {'name': 'Trail-80/40 + Conf<5', 'rules': [
+        {'type': 'trailing', 'sl_ticks': 40, 'tp_ticks': 120, 'activation_ticks': 80, 'trail_distance_ticks': 40},
+        {'type': 'confluence', 'k': 5}]},
+]
+
+# === INDICATOR BEHAVIOR ===
+# Flip/dwell/whipsaw analytics (daily report section; main.py --indicators for multi-day)
+WHIPSAW_BARS = 12  # Flip and flip back within this many bars counts as a whipsaw
+COFLIP_BARS = 1    # Flips of two indicators within this many bars count as a co-flip
+
+# === SCALE-OUT (MULTI-LEG) EXITS ===
+# Legs: size (contracts), sl_ticks, tp_ticks, optional activation_ticks /
+# trail_distance_ticks for a trailing leg. Shown next to the trailing configs.
+SCALE_OUT_CONFIGS = [
+    {
+        'name': 'Scale 1@40+1 Trail-80/40',
+        'description': '2 contracts: 1 off at +40t, 1 trailed (activate +80t, trail 40t)',
+        'legs': [
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 40},
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 120, 'activation_ticks': 80, 'trail_distance_ticks': 40},
+        ]
+    },
+    {
+        'name': 'Scale 1@40+2 Trail-60/30',
+        'description': '3 contracts: 1 off at +40t, 2 trailed (activate +60t, trail 30t)',
+        'legs': [
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 40},
+            {'size': 2, 'sl_ticks': 40, 'tp_ticks': 120, 'activation_ticks': 60, 'trail_distance_ticks': 30},
+        ]
+    },
+    {
+        'name': 'Scale 40/80+Trl-100/50',
+        'description': '3 contracts: +40t, +80t, last trailed (activate +100t, trail 50t)',
+        'legs': [
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 40},
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 80},
+            {'size': 1, 'sl_ticks': 40, 'tp_ticks': 120, 'activation_ticks': 100, 'trail_distance_ticks': 50},
+        ]
+    },
+]
+
+# main.py --scale-out: grid of 2-leg configs (first leg fixed target, rest trailed)
+# as (start, stop, step); --contracts sets the position size
+SCALE_OUT_SWEEP_RANGES = {
+    'first_target_ticks': (20, 100, 10),   # --t1
+    'activation_ticks': (40, 120, 20),     # --act
+    'trail_distance_ticks': (20, 60, 10),  # --trail
+}
+SCALE_OUT_CONTRACTS = 2
+
+# === TICK DATA ===
+# NT8 historical tick exports ("yyyyMMdd HHmmss fffffff;price;volume") loaded
+# by tickstore.py (main.py --ticks <export file>). The export is converted once
+# into binary time/price columns plus a per-minute index next to the file.
+TICK_CHUNK_LINES = 500000      # Lines parsed per chunk before flushing to disk
+TICK_TIME_OFFSET_HOURS = 0     # Added to export timestamps to match log time (e.g. UTC exports)
+
+# === SLIPPAGE MODEL ===
+# Empirical entry/exit slippage (ticks, positive = cost) calibrated from logged
+# ENTRY FILLED / TRADE CLOSED slippage and applied to simulated exits so the
+# trailing comparisons also show net-of-cost P&L (slippage.py).
+# main.py --calibrate-slippage writes the model to the ActiveNikiAnalysis root;
+# without it the daily report calibrates from the day's own trades.
+SLIPPAGE_MODEL_FILENAME = 'slippage_model.json'
+SLIPPAGE_MODE = 'expectation'  # 'expectation', 'sample' or 'off' (--slippage)
+SLIPPAGE_MIN_SAMPLES = 20      # Fewer samples per reason/hour fall back to the pooled distribution
+SLIPPAGE_SEED = 11             # Seed of the per-trade draws in 'sample' mode
+
+# === BOOTSTRAP CONFIDENCE INTERVALS ===
+# Resampled intervals for the report totals (bootstrap.py): round-trips in the
+# daily report, days in the --batch summary. Fixed seed = reproducible intervals.
+BOOTSTRAP_REPLICATES = 2000
+BOOTSTRAP_CONFIDENCE = 90      # Central interval width in percent
+BOOTSTRAP_SEED = 17
+
+# === STRATEGY EMULATOR ===
+# ActiveNikiTrader settings replayed by emulator.py over IndicatorValues bars
+# (defaults from ActiveNikiTrader.cs SetDefaults); main.py --emulate
+# --set name=value overrides any entry (JSON values, e.g. --set cooldown_bars=5).
+# The CSV has closes only, so trailing is always the tick-based variant.
+STRATEGY_DEFAULTS = {
+    'min_confluence_required': 5,
+    'min_confluence_for_auto_trade': 5,
+    'max_bars_after_yellow_square': 3,
+    'min_solar_wave_count': 1,
+    'cooldown_bars': 10,
+    'auto_trading': True,
+    'stop_loss_usd': 300,
+    'take_profit_usd': 600,
+    'sl_buffer_ticks': 2,
+    'trailing_stop': True,
+    'trail_activation_ticks': 80,
+    'trail_distance_ticks': 30,
+    'trading_sessions': [['10:00', '10:59'], ['10:00', '10:59']],  # [] = no hours filter
+    'news_close': '08:28',             # None = no pre-news close
+    'news_window_minutes': 32,
+    'eod_close': '15:58',              # None = no end-of-day close
+    'daily_loss_limit_usd': 300,       # None = disabled
+    'daily_profit_target_usd': 600,    # None = disabled
+    'indicators': ['RR', 'DT', 'SW', 'VY', 'ET', 'T3P', 'AAA', 'SB'],
+    'long_skip_confirmations': ['RR', 'DT'],  # LONG orders not placed on these confirmations
+    'short_requires_rr_up': True,             # SHORT orders only while RR is UP
+}
+
+# Signal regeneration sweep (main.py --signal-sweep): (start, stop, step) per axis;
+# the other STRATEGY_DEFAULTS settings stay fixed (--set overrides them)
+SIGNAL_SWEEP_RANGES = {
+    'min_confluence_required': (3, 7, 1),        # --conf
+    'min_confluence_for_auto_trade': (3, 7, 1),  # --auto-conf
+    'max_bars_after_yellow_square': (1, 6, 1),   # --window
+    'cooldown_bars': (0, 20, 2),                 # --cooldown
+}
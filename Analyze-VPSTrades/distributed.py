@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Coordinator/worker mode for spreading sweeps and batch re-analysis over
+several machines.
+
+The coordinator (main.py --sweep|--batch --serve HOST:PORT) owns the job's units
+and its jobrunner journal and serves them over plain HTTP/JSON:
+- POST /lease      worker asks for a unit (gets a payload, "wait" or "done")
+- POST /heartbeat  worker extends its lease while computing
+- POST /result     worker returns a finished unit (journaled immediately)
+- GET  /status     progress counts
+A unit whose lease expires (worker died, VPS rebooted, network dropped) goes
+back to the front of the queue. Late duplicate results are ignored, so
+every unit is journaled exactly once and the merge stays deterministic.
+A unit whose computation raises is reported back as an error and
+re-queued; after DISTRIBUTED_MAX_ATTEMPTS failures the job stops
+(UnitFailedError) with the finished units kept in the journal.
+
+Workers only need this folder of scripts, not the logs: sweep payloads carry
+the trade windows they simulate, batch payloads one day's source files (and
+the root slippage model). A batch worker writes the day's report in a
+temporary folder and returns its text with the day's summary; the
+coordinator saves the report in the dated folder.
+
+    python distributed.py worker http://VPS1:8765 [--workers N] [--id NAME]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import socket
+import tempfile
+import threading
+import traceback
+import urllib.request
+import urllib.error
+from collections import deque
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import (
+    DISTRIBUTED_PORT, DISTRIBUTED_LEASE_SECONDS, DISTRIBUTED_POLL_SECONDS, DISTRIBUTED_MAX_ATTEMPTS,
+    SLIPPAGE_MODEL_FILENAME
+)
+from jobrunner import open_journal, record_unit
+from sweep import run_sweep
+from session import find_session_files
+from report import find_previous_analyses
+
+# Consecutive connection failures before a worker gives up
+WORKER_RETRIES = 10
+
+
+class UnitFailedError(Exception):
+    """A unit failed on DISTRIBUTED_MAX_ATTEMPTS workers."""
+
+
+# === UNIT PAYLOADS ===
+
+def encode_trade_windows(windows):
+    """Trade windows (sweep.build_trade_windows) as JSON-safe dicts."""
+    return [
+        {
+            'day': w['day'],
+            'entry_time': w['entry_time'].isoformat(),
+            'entry_price': w['entry_price'],
+            'direction': w['direction'],
+            'actual_pnl': w['actual_pnl'],
+            'slippage': w.get('slippage', {}),
+            'bars': [[b['timestamp'].isoformat(), b['close']] for b in w['bars']]
+        }
+        for w in windows
+    ]
+
+
+def decode_trade_windows(data):
+    """Inverse of encode_trade_windows (bars carry only what the simulator reads)."""
+    windows = []
+    for w in data:
+        bars = []
+        for ts, close in w['bars']:
+            timestamp = datetime.fromisoformat(ts)
+            bars.append({'timestamp': timestamp, 'time_str': timestamp.strftime('%Y-%m-%d %H:%M:%S'), 'close': close})
+        windows.append({
+            'day': w['day'],
+            'entry_time': datetime.fromisoformat(w['entry_time']),
+            'entry_price': w['entry_price'],
+            'direction': w['direction'],
+            'actual_pnl': w['actual_pnl'],
+            'slippage': w['slippage'],
+            'bars': bars
+        })
+    return windows
+
+
+def sweep_unit_payload(windows, combos):
+    """Payload for one (day, config block) sweep unit."""
+    return {'kind': 'sweep', 'windows': encode_trade_windows(windows), 'combos': [list(c) for c in combos]}
+
+
+def _compute_sweep_unit(payload, workers):
+    windows = decode_trade_windows(payload['windows'])
+    combos = [tuple(c) for c in payload['combos']]
+    return run_sweep(windows, combos, workers=workers if windows else 1)
+
+
+def batch_unit_payload(date_str, day_folder, options):
+    """
+    Payload for one batch re-analysis day: the folder's source files
+    (zlib + base64), the root slippage model if there is one, the
+    run_daily_report options of the run (record, backend, horizon_minutes,
+    slippage_mode), and the previous days' analysis files
+    the report's multi-day comparison reads. Those are taken as they are on
+    disk when the unit is leased, so a day re-analysed in the same batch
+    may still show in the comparison with its old report.
+    """
+    files = {}
+    for path in find_session_files(day_folder, date_str):
+        with open(path, 'rb') as f:
+            files[os.path.basename(path)] = base64.b64encode(zlib.compress(f.read())).decode('ascii')
+    previous = {}
+    prev_analyses = [a for a in find_previous_analyses(day_folder, date_str) if a['date'] < date_str]
+    for a in prev_analyses[-5:]:
+        with open(a['filepath'], 'r', encoding='utf-8') as f:
+            previous[os.path.basename(os.path.dirname(a['filepath']))] = {
+                os.path.basename(a['filepath']): f.read()}
+    payload = {'kind': 'batch', 'date': date_str, 'folder': os.path.basename(os.path.normpath(day_folder)),
+               'files': files, 'previous': previous, 'options': dict(options)}
+    model_path = os.path.join(os.path.dirname(os.path.normpath(day_folder)), SLIPPAGE_MODEL_FILENAME)
+    if os.path.exists(model_path):
+        with open(model_path, 'r', encoding='utf-8') as f:
+            payload['slippage_model'] = f.read()
+    return payload
+
+
+def _compute_batch_unit(payload, workers):
+    # main imports this module for the coordinator side, so load it on first use
+    from main import run_daily_report
+    with tempfile.TemporaryDirectory() as root:
+        day_folder = os.path.join(root, payload['folder'])
+        os.makedirs(day_folder)
+        for name, data in payload['files'].items():
+            with open(os.path.join(day_folder, name), 'wb') as f:
+                f.write(zlib.decompress(base64.b64decode(data)))
+        for folder, reports in payload['previous'].items():
+            os.makedirs(os.path.join(root, folder))
+            for name, text in reports.items():
+                with open(os.path.join(root, folder, name), 'w', encoding='utf-8') as f:
+                    f.write(text)
+        if payload.get('slippage_model'):
+            with open(os.path.join(root, SLIPPAGE_MODEL_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(payload['slippage_model'])
+
+        summary = run_daily_report(day_folder, day_folder, payload['date'], use_cache=False,
+                                   workers=workers, **payload['options'])
+        with open(summary['report'], 'r', encoding='utf-8') as f:
+            summary['report_text'] = f.read()
+    summary['report'] = os.path.basename(summary['report'])
+    return summary
+
+
+UNIT_HANDLERS = {
+    'sweep': _compute_sweep_unit,
+    'batch': _compute_batch_unit,
+}
+
+
+# === COORDINATOR ===
+
+def _lease_unit(state, worker):
+    """Hand the next unit to worker; re-queues expired leases first."""
+    if state['failed']:
+        return {'done': True}
+    now = time.time()
+    for unit_id, (holder, deadline) in list(state['leases'].items()):
+        if deadline < now:
+            del state['leases'][unit_id]
+            state['queue'].appendleft(unit_id)
+            state['requeued'] += 1
+            print(f"  Lease on {unit_id} by {holder} expired - re-queued")
+
+    if len(state['completed']) == len(state['order']):
+        return {'done': True}
+    if not state['queue']:
+        return {'wait': DISTRIBUTED_POLL_SECONDS}
+
+    unit_id = state['queue'].popleft()
+    state['leases'][unit_id] = (worker, now + state['lease_seconds'])
+    return {
+        'unit': unit_id,
+        'payload': state['make_payload'](state['payloads'][unit_id]),
+        'lease_seconds': state['lease_seconds']
+    }
+
+
+def _heartbeat(state, worker, unit_id):
+    lease = state['leases'].get(unit_id)
+    if not lease or lease[0] != worker:
+        return {'ok': False}
+    state['leases'][unit_id] = (worker, time.time() + state['lease_seconds'])
+    return {'ok': True}
+
+
+def _accept_result(state, worker, unit_id, result):
+    if unit_id in state['completed'] or unit_id not in state['payloads']:
+        return {'ok': True, 'duplicate': True}
+    record_unit(state['journal'], unit_id, result)
+    state['completed'][unit_id] = result
+    state['leases'].pop(unit_id, None)
+    if unit_id in state['queue']:
+        # Finished by its original worker after being re-queued
+        state['queue'].remove(unit_id)
+    done = len(state['completed'])
+    print(f"  Unit {unit_id} done by {worker} ({done}/{len(state['order'])})")
+    if done == len(state['order']):
+        state['finished'].set()
+    return {'ok': True}
+
+
+def _accept_error(state, worker, unit_id, error):
+    """worker could not compute unit_id: re-queue it, or fail the job after DISTRIBUTED_MAX_ATTEMPTS."""
+    if unit_id in state['completed'] or unit_id not in state['payloads']:
+        return {'ok': True, 'duplicate': True}
+    if state['leases'].get(unit_id, (None,))[0] == worker:
+        del state['leases'][unit_id]
+    attempts = state['failures'][unit_id] = state['failures'].get(unit_id, 0) + 1
+    print(f"  Unit {unit_id} failed on {worker} ({attempts}/{DISTRIBUTED_MAX_ATTEMPTS}): {error}")
+    if attempts >= DISTRIBUTED_MAX_ATTEMPTS:
+        state['failed'] = (unit_id, error)
+        state['finished'].set()
+    elif unit_id not in state['queue'] and unit_id not in state['leases']:
+        state['queue'].append(unit_id)
+    return {'ok': True}
+
+
+def _make_handler(state):
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def _reply(self, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != '/status':
+                self.send_error(404)
+                return
+            with state['lock']:
+                self._reply({
+                    'units': len(state['order']),
+                    'completed': len(state['completed']),
+                    'leased': len(state['leases']),
+                    'queued': len(state['queue']),
+                    'requeued': state['requeued']
+                })
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self.send_error(400)
+                return
+            worker = body.get('worker', self.client_address[0])
+            with state['lock']:
+                if self.path == '/lease':
+                    reply = _lease_unit(state, worker)
+                elif self.path == '/heartbeat':
+                    reply = _heartbeat(state, worker, body.get('unit'))
+                elif self.path == '/result' and 'error' in body:
+                    reply = _accept_error(state, worker, body.get('unit'), body['error'])
+                elif self.path == '/result':
+                    reply = _accept_result(state, worker, body.get('unit'), body.get('result'))
+                else:
+                    self.send_error(404)
+                    return
+            self._reply(reply)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CoordinatorHandler
+
+
+def parse_address(spec, default_host='127.0.0.1'):
+    """'host:port', ':port', 'host' or None -> (host, port)."""
+    if not spec:
+        return default_host, DISTRIBUTED_PORT
+    host, _, port = spec.rpartition(':') if ':' in spec else (spec, '', '')
+    return host or default_host, int(port) if port else DISTRIBUTED_PORT
+
+
+def serve_units(units, make_payload, journal_path, spec, host, port,
+                lease_seconds=DISTRIBUTED_LEASE_SECONDS):
+    """
+    Coordinate units over HTTP until every unit has a result.
+
+    units: (unit_id, local payload) pairs; make_payload(local payload) builds
+    the JSON payload sent to a worker when the unit is leased.
+    Results are journaled like jobrunner.run_units (a restarted coordinator
+    resumes) and returned in unit order. Raises UnitFailedError when a unit
+    fails on DISTRIBUTED_MAX_ATTEMPTS workers.
+    """
+    completed, journal = open_journal(journal_path, spec)
+    order = [unit_id for unit_id, _ in units]
+    state = {
+        'lock': threading.Lock(),
+        'order': order,
+        'payloads': dict(units),
+        'make_payload': make_payload,
+        'queue': deque(unit_id for unit_id in order if unit_id not in completed),
+        'leases': {},
+        'completed': completed,
+        'failures': {},
+        'failed': None,
+        'requeued': 0,
+        'lease_seconds': lease_seconds,
+        'journal': journal,
+        'finished': threading.Event()
+    }
+    if completed:
+        print(f"  Resuming: {len(completed)} of {len(order)} units already in journal")
+    if len(completed) == len(order):
+        state['finished'].set()
+
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"  Coordinator listening on http://{host}:{port} ({len(state['queue'])} units queued)")
+    try:
+        state['finished'].wait()
+        # Give polling workers a chance to hear "done" before the socket closes
+        time.sleep(DISTRIBUTED_POLL_SECONDS * 2)
+    finally:
+        server.shutdown()
+        server.server_close()
+        journal.close()
+    if state['requeued']:
+        print(f"  Re-queued {state['requeued']} unit(s) from lost workers")
+    if state['failed']:
+        unit_id, error = state['failed']
+        raise UnitFailedError(f"Unit {unit_id} failed on {DISTRIBUTED_MAX_ATTEMPTS} attempts ({error}); "
+                              f"{len(completed)} of {len(order)} units are journaled")
+    return [completed[unit_id] for unit_id in order]
+
+
+# === WORKER ===
+
+def _post(url, body, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _keep_lease(base_url, worker_id, unit_id, interval, stop):
+    while not stop.wait(interval):
+        try:
+            _post(f"{base_url}/heartbeat", {'worker': worker_id, 'unit': unit_id})
+        except (urllib.error.URLError, OSError):
+            pass
+
+
+def _post_result(base_url, body):
+    """POST a unit's result (or error), retrying; False if the coordinator never took it."""
+    for attempt in range(WORKER_RETRIES):
+        try:
+            _post(f"{base_url}/result", body)
+            return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(DISTRIBUTED_POLL_SECONDS)
+    return False
+
+
+def run_worker(base_url, workers=None, worker_id=None):
+    """
+    Pull units from the coordinator until it reports done or goes away.
+    Returns the number of units that failed or whose result was not delivered.
+    """
+    base_url = base_url.rstrip('/')
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    failures = 0
+    computed = 0
+    failed = 0
+    print(f"Worker {worker_id} -> {base_url}")
+    while True:
+        try:
+            reply = _post(f"{base_url}/lease", {'worker': worker_id})
+            failures = 0
+        except (urllib.error.URLError, OSError):
+            failures += 1
+            if failures > WORKER_RETRIES:
+                print("  Coordinator unreachable - stopping")
+                break
+            time.sleep(DISTRIBUTED_POLL_SECONDS)
+            continue
+
+        if reply.get('done'):
+            break
+        if 'wait' in reply:
+            time.sleep(reply['wait'])
+            continue
+
+        unit_id = reply['unit']
+        payload = reply['payload']
+        stop = threading.Event()
+        keeper = threading.Thread(target=_keep_lease, daemon=True,
+                                  args=(base_url, worker_id, unit_id, reply['lease_seconds'] / 3, stop))
+        keeper.start()
+        try:
+            body = {'result': UNIT_HANDLERS[payload['kind']](payload, workers)}
+        except Exception as e:
+            # Report the failure so the coordinator re-queues the unit instead of waiting for the lease
+            traceback.print_exc()
+            body = {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            stop.set()
+
+        body.update(worker=worker_id, unit=unit_id)
+        if not _post_result(base_url, body):
+            failed += 1
+            print(f"  Unit {unit_id} failed: coordinator unreachable, result dropped")
+        elif 'error' in body:
+            failed += 1
+            print(f"  Unit {unit_id} failed: {body['error']}")
+        else:
+            computed += 1
+            print(f"  Unit {unit_id} done")
+    print(f"Worker {worker_id} finished: {computed} unit(s), {failed} failed")
+    return failed
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'worker':
+        print("Usage: python distributed.py worker http://HOST:PORT [--workers N] [--id NAME]")
+        sys.exit(1)
+    options = {}
+    i = 3
+    while i < len(sys.argv):
+        if sys.argv[i] in ('--workers', '--id') and i + 1 < len(sys.argv):
+            options[sys.argv[i]] = sys.argv[i + 1]
+            i += 2
+        else:
+            i += 1
+    failed = run_worker(sys.argv[2], workers=int(options.get('--workers', 0)) or None, worker_id=options.get('--id'))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
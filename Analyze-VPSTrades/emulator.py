@@ -0,0 +1,456 @@
+"""
+Python emulator of the ActiveNikiTrader strategy.
+
+Replays a session's IndicatorValues bars through the OnBarUpdate logic of
+ActiveNikiTrader.cs / ActiveNikiTrader.Signals.cs so strategy changes can be
+tried in seconds instead of hours of NT8 Market Replay:
+
+- GetConfluence / GetBullishConfirmation / GetBearishConfirmation
+- Yellow (LONG) / Orange (SHORT) AIQ1 square windows of
+  MaxBarsAfterYellowSquare bars, CooldownBars after each signal
+- auto-trade filters (LONG not on RR/DT confirmations, SHORT only with RR
+  UP), IsTradingHoursAllowed, daily loss limit / profit target
+- SL (+buffer) / TP / tick-based trailing exits, pre-news and EOD closes
+
+Quirks of the C# are kept on purpose: during cooldown only the AIQ1
+previous state is updated, and once a daily limit is hit no state is
+updated for the rest of the day.
+
+Fills are at bar closes (Calculate.OnBarClose): entries at the signal
+bar's close, SL/TP/trailing exits by the same close-crossing rules as
+simulation.scan_scale_out, forced closes at the triggering bar's close.
+The output mirrors the trader-log parser - signals, ORDER PLACED orders and
+TRADE CLOSED closes - and is turned into round-trips by the same
+build_roundtrips_from_trader_log / match_signals_to_trades path, so
+report.py and the enrichment stages consume it unchanged.
+"""
+
+from config import STRATEGY_DEFAULTS, TICK_SIZE, TICK_VALUE
+from simulation import scan_scale_out
+from roundtrips import build_roundtrips_from_trader_log, match_signals_to_trades
+from parsers import find_indicator_csv_files
+from session import load_bars
+
+# GetBullishConfirmation / GetBearishConfirmation check order
+CONFIRMATION_ORDER = ['RR', 'DT', 'VY', 'ET', 'SW', 'T3P', 'AAA', 'SB']
+
+# Indicators that need a live source (Source column shows '-' when not available)
+OPTIONAL_INDICATORS = ['AAA', 'SB']
+
+
+def strategy_params(overrides=None):
+    """STRATEGY_DEFAULTS with overrides applied (unknown names raise ValueError)."""
+    params = dict(STRATEGY_DEFAULTS)
+    for name, value in (overrides or {}).items():
+        if name not in STRATEGY_DEFAULTS:
+            raise ValueError(f"Unknown strategy setting '{name}'")
+        params[name] = value
+    return params
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _direction_state(value):
+    """1 = UP, -1 = DN, 0 = neither; numeric values (DT_Signal) by sign."""
+    if value == 'UP':
+        return 1
+    if value == 'DN':
+        return -1
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return 1 if number > 0 else -1 if number < 0 else 0
+
+
+def bar_states(bar):
+    """
+    Indicator booleans of one BAR dict as the strategy sees them.
+
+    Returns dict name -> (is_up, is_down, available) for AIQ1 and the eight
+    confluence indicators, plus 'SW_COUNT'.
+    """
+    indicators = bar['indicators']
+    source = bar.get('source', '')
+    states = {}
+    for name in ['AIQ1'] + CONFIRMATION_ORDER:
+        state = _direction_state(indicators.get(name))
+        available = not (name in OPTIONAL_INDICATORS and f"{name}:-" in source)
+        if name == 'DT':
+            states[name] = (state > 0, state < 0, available)
+        else:
+            # Boolean series: anything not UP counts as down
+            states[name] = (state > 0, state <= 0, available)
+    states['SW_COUNT'] = bar.get('sw_count', 0)
+    return states
+
+
+def get_confluence(states, params):
+    """(bull, bear, total) as GetConfluence."""
+    bull = bear = total = 0
+    min_sw = params['min_solar_wave_count']
+    for name in params['indicators']:
+        is_up, is_down, available = states[name]
+        if not available:
+            continue
+        total += 1
+        if name == 'SW':
+            if is_up and states['SW_COUNT'] >= min_sw:
+                bull += 1
+            elif not is_up and states['SW_COUNT'] <= -min_sw:
+                bear += 1
+        elif name == 'DT':
+            if is_up:
+                bull += 1
+            elif is_down:
+                bear += 1
+        elif is_up:
+            bull += 1
+        else:
+            bear += 1
+    return bull, bear, total
+
+
+def get_confirmation(states, prev_up, params, bullish):
+    """Confirming indicator name as GetBullishConfirmation / GetBearishConfirmation, or None."""
+    enabled = [name for name in CONFIRMATION_ORDER
+               if name in params['indicators'] and states[name][2]]
+    # A flip on this bar first
+    for name in enabled:
+        is_up, is_down, _ = states[name]
+        if bullish and is_up and not prev_up[name]:
+            return name
+        if not bullish:
+            if name == 'DT':
+                if is_down and not prev_up[name]:
+                    return name
+            elif not is_up and prev_up[name]:
+                return name
+    # Otherwise already in the trade direction (flipped on the same bar as AIQ1)
+    for name in enabled:
+        is_up, is_down, _ = states[name]
+        if bullish and is_up:
+            return name
+        if not bullish and (is_down if name == 'DT' else not is_up):
+            return name
+    return None
+
+
+def trading_hours_allowed(timestamp, params):
+    """IsTradingHoursAllowed: inside any [start, end] session (inclusive minutes)."""
+    sessions = params['trading_sessions']
+    if not sessions:
+        return True
+    minutes = timestamp.hour * 60 + timestamp.minute
+    return any(_minutes(start) <= minutes <= _minutes(end) for start, end in sessions)
+
+
+def forced_close_indices(bars, params):
+    """Per bar: 'PreNews_Exit' / 'EOD_Exit' when an open position is closed on that bar, else None."""
+    news = _minutes(params['news_close']) if params['news_close'] else None
+    eod = _minutes(params['eod_close']) if params['eod_close'] else None
+    reasons = []
+    for bar in bars:
+        minutes = bar['timestamp'].hour * 60 + bar['timestamp'].minute
+        if news is not None and news <= minutes < news + params['news_window_minutes']:
+            reasons.append('PreNews_Exit')
+        elif eod is not None and minutes >= eod:
+            reasons.append('EOD_Exit')
+        else:
+            reasons.append(None)
+    return reasons
+
+
+def exit_leg(params):
+    """scan_scale_out leg for the strategy's SL (+buffer) / TP / trailing settings."""
+    leg = {
+        'size': 1,
+        'sl_ticks': round(params['stop_loss_usd'] / TICK_VALUE) + params['sl_buffer_ticks'],
+        'tp_ticks': round(params['take_profit_usd'] / TICK_VALUE)
+    }
+    if params['trailing_stop']:
+        leg['activation_ticks'] = params['trail_activation_ticks']
+        leg['trail_distance_ticks'] = params['trail_distance_ticks']
+    return leg
+
+
+def simulate_position(closes, forced, entry_index, entry_price, direction, leg):
+    """
+    Exit of a position entered at entry_index's close.
+
+    Returns (exit_index, exit_price, pnl_ticks, reason, flat_index) where
+    flat_index is the first bar the strategy sees the position flat, or
+    None when the position is still open at the end of the bars.
+    """
+    start = entry_index + 1
+    end = start
+    while end < len(closes) and forced[end] is None:
+        end += 1
+    sign = 1 if direction == 'LONG' else -1
+
+    if end > start:
+        result = scan_scale_out(closes, start, end, entry_price, direction, [leg])['legs'][0]
+        if result['exit_type'] != 'TIMEOUT':
+            # Stop/target orders fill inside the bar: flat on the exit bar itself
+            price = entry_price + sign * result['pnl_ticks'] * TICK_SIZE
+            return result['exit_index'], price, result['pnl_ticks'], result['exit_type'], result['exit_index']
+    if end < len(closes):
+        # Market exit on the forced-close bar, flat from the next bar
+        price = closes[end]
+        pnl_ticks = (price - entry_price if direction == 'LONG' else entry_price - price) / TICK_SIZE
+        return end, price, pnl_ticks, forced[end], end + 1
+    return None
+
+
+def open_position(bars, closes, forced, index, direction, leg, params):
+    """Order dict and (precomputed) close of a position entered at bar index."""
+    bar = bars[index]
+    entry_price = bar['close']
+    order = {
+        'timestamp': bar['timestamp'],
+        'time_str': bar['timestamp'].strftime('%H:%M:%S'),
+        'direction': direction,
+        'price': entry_price,
+        'action': 'Buy' if direction == 'LONG' else 'Sell',
+        'is_close': False,
+        'exit_params': {
+            'sl_ticks': leg['sl_ticks'], 'tp_ticks': leg['tp_ticks'],
+            'trail_mode': 'TICK' if params['trailing_stop'] else None,
+            'activation_ticks': leg.get('activation_ticks'),
+            'trail_distance_ticks': leg.get('trail_distance_ticks')
+        },
+        'fill_price': entry_price,
+        'signal_price': entry_price,
+        'entry_slippage_ticks': 0,
+        'entry_slippage_dollars': 0.0
+    }
+    position = {'order': order, 'close': None, 'flat_index': None}
+    exit_info = simulate_position(closes, forced, index, entry_price, direction, leg)
+    if exit_info:
+        exit_index, exit_price, pnl_ticks, reason, flat_index = exit_info
+        exit_time = bars[exit_index]['timestamp']
+        position['flat_index'] = flat_index
+        position['close'] = {
+            'timestamp': exit_time,
+            'time_str': exit_time.strftime('%H:%M:%S'),
+            'direction': direction,
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'pnl_ticks': pnl_ticks,
+            'pnl_dollars': pnl_ticks * TICK_VALUE,
+            'exit_reason': reason,
+            'exit_slippage_ticks': 0,
+            'is_win': pnl_ticks > 0
+        }
+    return position
+
+
+def emulate_session(bars, params=None):
+    """
+    Replay one session's BAR dicts (sorted by timestamp) through the strategy.
+
+    Returns dict with:
+    - signals: signal dicts as parse_trader_signals (source 'Trader')
+    - orders / closes: as parse_trader_orders_and_closes
+    - limit_hit: 'LOSS' / 'PROFIT' when a daily limit stopped trading, else None
+    """
+    params = params or strategy_params()
+    signals = []
+    orders = []
+    closes_out = []
+    if not bars:
+        return {'signals': signals, 'orders': orders, 'closes': closes_out, 'limit_hit': None}
+
+    closes = [b['close'] for b in bars]
+    forced = forced_close_indices(bars, params)
+    leg = exit_leg(params)
+    max_bars = params['max_bars_after_yellow_square']
+    cooldown_bars = params['cooldown_bars']
+    loss_limit = params['daily_loss_limit_usd']
+    profit_target = params['daily_profit_target_usd']
+
+    prev_up = {name: False for name in ['AIQ1'] + CONFIRMATION_ORDER}
+    first_bar = True
+    bars_since_yellow = -1
+    bars_since_orange = -1
+    bars_since_signal = -1
+    position = None
+    daily_pnl = 0.0
+    limit_hit = None
+
+    for i, bar in enumerate(bars):
+        timestamp = bar['timestamp']
+
+        # Position closed by now (stop/target fill, or forced exit on an earlier bar)
+        if position and position['flat_index'] is not None and i >= position['flat_index']:
+            closes_out.append(position['close'])
+            daily_pnl += position['close']['pnl_dollars']
+            position = None
+            if loss_limit is not None and daily_pnl <= -loss_limit:
+                limit_hit = 'LOSS'
+            elif profit_target is not None and daily_pnl >= profit_target:
+                limit_hit = 'PROFIT'
+        if limit_hit:
+            continue
+
+        states = bar_states(bar)
+        if bars_since_signal >= 0:
+            bars_since_signal += 1
+        in_cooldown = cooldown_bars > 0 and 0 <= bars_since_signal < cooldown_bars
+
+        aiq1_up = states['AIQ1'][0]
+        if aiq1_up and not prev_up['AIQ1'] and not first_bar:
+            bars_since_yellow = 0
+            bars_since_orange = -1
+        elif not aiq1_up and prev_up['AIQ1'] and not first_bar:
+            bars_since_orange = 0
+            bars_since_yellow = -1
+        elif bars_since_yellow >= 0:
+            bars_since_yellow += 1
+            if bars_since_yellow > max_bars:
+                bars_since_yellow = -1
+        elif bars_since_orange >= 0:
+            bars_since_orange += 1
+            if bars_since_orange > max_bars:
+                bars_since_orange = -1
+
+        if in_cooldown:
+            prev_up['AIQ1'] = aiq1_up
+            first_bar = False
+            continue
+
+        for bullish in (True, False):
+            window = bars_since_yellow if bullish else bars_since_orange
+            if not 0 <= window <= max_bars:
+                continue
+            confirming = get_confirmation(states, prev_up, params, bullish)
+            if confirming is None:
+                continue
+            bull, bear, total = get_confluence(states, params)
+            count = bull if bullish else bear
+            if count < params['min_confluence_required']:
+                continue
+
+            direction = 'LONG' if bullish else 'SHORT'
+            signal = {
+                'source': 'Trader',
+                'time_str': timestamp.strftime('%H:%M:%S'),
+                'timestamp': timestamp,
+                'direction': direction,
+                'trigger': f"{'YellowSquare' if bullish else 'OrangeSquare'}+{confirming}",
+                'price': bar['close'],
+                'confluence_count': count,
+                'confluence_total': total,
+                'indicators': {name: value for name, value in bar['indicators'].items() if name != 'AIQ1'},
+                'order_placed': False,
+                'blocked_reason': None
+            }
+            signals.append(signal)
+
+            direction_allowed = (confirming not in params['long_skip_confirmations']) if bullish else \
+                (states['RR'][0] or not params['short_requires_rr_up'])
+            if params['auto_trading'] and position is None and direction_allowed \
+                    and count >= params['min_confluence_for_auto_trade']:
+                if trading_hours_allowed(timestamp, params):
+                    signal['order_placed'] = True
+                    position = open_position(bars, closes, forced, i, direction, leg, params)
+                    orders.append(position['order'])
+                else:
+                    signal['blocked_reason'] = 'OUTSIDE_HOURS'
+
+            if bullish:
+                bars_since_yellow = -1
+            else:
+                bars_since_orange = -1
+            bars_since_signal = 0
+
+        for name in prev_up:
+            prev_up[name] = states[name][0]
+        first_bar = False
+
+    if position and position['close']:
+        # Closed on the last bar (or just after it)
+        closes_out.append(position['close'])
+    return {'signals': signals, 'orders': orders, 'closes': closes_out, 'limit_hit': limit_hit}
+
+
+def emulate_roundtrips(bars, date_str, params=None):
+    """
+    Emulate a session and build report-ready data.
+
+    Returns dict with signals, roundtrips (matched to the emulated signals,
+    not yet enriched) and limit_hit.
+    """
+    result = emulate_session(bars, params)
+    roundtrips = build_roundtrips_from_trader_log(result['orders'], result['closes'])
+    roundtrips = match_signals_to_trades(roundtrips, result['signals'], date_str)
+    return {'signals': result['signals'], 'roundtrips': roundtrips, 'limit_hit': result['limit_hit']}
+
+
+def emulate_day_folders(day_folders, params=None):
+    """
+    Load the bars of (date_str, folder) pairs and emulate each day.
+    Returns list of {'date', 'bars', 'signals', 'roundtrips', 'limit_hit'} (in order).
+    """
+    results = []
+    for date_str, day_folder in day_folders:
+        bars = load_bars(find_indicator_csv_files(day_folder), date_str)
+        result = emulate_roundtrips(bars, date_str, params)
+        result['date'] = date_str
+        result['bars'] = len(bars)
+        results.append(result)
+    return results
+
+
+def format_emulation_lines(day_results, params):
+    """Report lines: settings changed from STRATEGY_DEFAULTS and a per-day table."""
+    lines = []
+    changed = {name: value for name, value in params.items() if STRATEGY_DEFAULTS[name] != value}
+    lines.append("Settings: " + (", ".join(f"{name}={value}" for name, value in changed.items())
+                                 if changed else "STRATEGY_DEFAULTS"))
+    trailing = (f"activate +{params['trail_activation_ticks']}t, trail {params['trail_distance_ticks']}t"
+                if params['trailing_stop'] else 'off')
+    lines.append(f"Fills at bar closes | Trailing: {trailing}")
+    lines.append("")
+    lines.append(f"{'Date':<12} {'Bars':>6} {'Signals':>8} {'Orders':>7} {'Trades':>7} {'Wins':>5} "
+                 f"{'P&L':>9} {'P&L $':>10} {'Limit':>7}")
+    lines.append("-" * 80)
+    totals = {'bars': 0, 'signals': 0, 'orders': 0, 'trades': 0, 'wins': 0, 'pnl': 0.0}
+    for day in day_results:
+        complete = [rt for rt in day['roundtrips'] if rt['complete']]
+        row = {
+            'bars': day['bars'],
+            'signals': len(day['signals']),
+            'orders': sum(1 for s in day['signals'] if s['order_placed']),
+            'trades': len(complete),
+            'wins': sum(1 for rt in complete if rt['pnl_ticks'] > 0),
+            'pnl': sum(rt['pnl_ticks'] for rt in complete)
+        }
+        for key, value in row.items():
+            totals[key] += value
+        lines.append(f"{day['date']:<12} {row['bars']:>6} {row['signals']:>8} {row['orders']:>7} {row['trades']:>7} "
+                     f"{row['wins']:>5} {row['pnl']:>+8.0f}t ${row['pnl'] * TICK_VALUE:>+9,.2f} "
+                     f"{day['limit_hit'] or '---':>7}")
+    lines.append("-" * 80)
+    win_rate = totals['wins'] / totals['trades'] * 100 if totals['trades'] else 0
+    lines.append(f"{'TOTAL':<12} {totals['bars']:>6} {totals['signals']:>8} {totals['orders']:>7} {totals['trades']:>7} "
+                 f"{totals['wins']:>5} {totals['pnl']:>+8.0f}t ${totals['pnl'] * TICK_VALUE:>+9,.2f}")
+    lines.append("")
+    lines.append(f"Win rate: {win_rate:.1f}% | Days stopped by a daily limit: "
+                 f"{sum(1 for day in day_results if day['limit_hit'])}/{len(day_results)}")
+
+    reasons = {}
+    for day in day_results:
+        for rt in day['roundtrips']:
+            if rt['complete']:
+                reasons.setdefault(rt['exit_reason'], []).append(rt['pnl_ticks'])
+    if reasons:
+        lines.append("")
+        lines.append(f"{'Exit reason':<14} {'Trades':>7} {'P&L':>9}")
+        lines.append("-" * 32)
+        for reason, pnls in sorted(reasons.items(), key=lambda x: -len(x[1])):
+            lines.append(f"{reason:<14} {len(pnls):>7} {sum(pnls):>+8.0f}t")
+    return lines
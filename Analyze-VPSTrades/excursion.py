@@ -0,0 +1,97 @@
+"""
+MAE/MFE excursion analytics backed by a sparse-table range-min/max index.
+The index is built once over the bar closes (O(n log n)); every trade's
+excursion is then answered with O(1) range queries plus two binary searches.
+"""
+
+from config import TICK_SIZE
+from barstore import build_bar_store, find_window, to_epoch_seconds
+
+
+def build_sparse_table(values, prefer_high):
+    """
+    Build a sparse table of arg-max (prefer_high=True) or arg-min indices.
+    Level j holds, for each start i, the index of the best value in
+    values[i : i + 2**j]. Ties resolve to the earliest index.
+    """
+    n = len(values)
+    levels = [list(range(n))]
+    span = 1
+    while span * 2 <= n:
+        prev = levels[-1]
+        if prefer_high:
+            level = [a if values[a] >= values[b] else b for a, b in zip(prev, prev[span:])]
+        else:
+            level = [a if values[a] <= values[b] else b for a, b in zip(prev, prev[span:])]
+        levels.append(level)
+        span *= 2
+    return levels
+
+
+def query_sparse_table(levels, values, lo, hi, prefer_high):
+    """Return index of the best value in values[lo..hi] (inclusive)."""
+    k = (hi - lo + 1).bit_length() - 1
+    a = levels[k][lo]
+    b = levels[k][hi - (1 << k) + 1]
+    if prefer_high:
+        return a if values[a] >= values[b] else b
+    return a if values[a] <= values[b] else b
+
+
+def build_excursion_index(bars):
+    """Build the bar store plus arg-max/arg-min sparse tables over closes."""
+    store = build_bar_store(bars)
+    closes = store['closes']
+    return {
+        'store': store,
+        'max_table': build_sparse_table(closes, prefer_high=True),
+        'min_table': build_sparse_table(closes, prefer_high=False),
+    }
+
+
+def compute_trade_excursion(index, entry_time, exit_time, entry_price, direction, actual_pnl_ticks=0):
+    """
+    Compute excursion stats for one trade over bars in [entry_time, exit_time].
+
+    Returns dict with (all P&L in ticks):
+    - mae_ticks: Maximum Adverse Excursion (>= 0)
+    - mfe_ticks: Maximum Favorable Excursion (>= 0)
+    - time_to_mfe_seconds: seconds from entry to the first bar at the best close
+    - time_to_mae_seconds: seconds from entry to the first bar at the worst close
+    - oracle_pnl_ticks: P&L of exiting at the best close in the window
+    - left_on_table_ticks: oracle P&L minus actual P&L
+    - bars: number of bars in window
+    Returns None when no bars cover the trade or entry price is unknown.
+    """
+    if not entry_price:
+        return None
+
+    store = index['store']
+    lo, hi = find_window(store, entry_time, exit_time)
+    if lo >= hi:
+        return None
+
+    closes = store['closes']
+    times = store['times']
+    high_idx = query_sparse_table(index['max_table'], closes, lo, hi - 1, prefer_high=True)
+    low_idx = query_sparse_table(index['min_table'], closes, lo, hi - 1, prefer_high=False)
+
+    if direction == 'LONG':
+        best_idx, worst_idx = high_idx, low_idx
+        best_pnl = (closes[high_idx] - entry_price) / TICK_SIZE
+        worst_pnl = (closes[low_idx] - entry_price) / TICK_SIZE
+    else:
+        best_idx, worst_idx = low_idx, high_idx
+        best_pnl = (entry_price - closes[low_idx]) / TICK_SIZE
+        worst_pnl = (entry_price - closes[high_idx]) / TICK_SIZE
+
+    entry_seconds = to_epoch_seconds(entry_time)
+    return {
+        'mae_ticks': max(0.0, -worst_pnl),
+        'mfe_ticks': max(0.0, best_pnl),
+        'time_to_mfe_seconds': times[best_idx] - entry_seconds,
+        'time_to_mae_seconds': times[worst_idx] - entry_seconds,
+        'oracle_pnl_ticks': best_pnl,
+        'left_on_table_ticks': best_pnl - actual_pnl_ticks,
+        'bars': hi - lo
+    }
@@ -0,0 +1,260 @@
+"""
+Single-scan exit-rule engine.
+Each exit idea is a small stateful rule object; run_exit_rules advances all
+of them together over one pass of a trade's bars and retires each rule at
+its first trigger, so comparing N rules costs about one scan.
+
+Rules see every bar from entry onwards (bar 0 is the entry bar) and return
+None to stay in the trade or (exit_price, pnl_ticks, exit_type) to exit.
+Untriggered rules exit at the last bar of the window as TIMEOUT.
+
+Rule sets are declared as plain specs in config.EXIT_RULE_SETS, e.g.
+{'name': 'SL/TP + Conf<6', 'rules': [{'type': 'fixed', 'sl_ticks': 40,
+'tp_ticks': 120}, {'type': 'confluence', 'k': 6}]} - several rules in one
+set exit on whichever triggers first.
+"""
+
+from datetime import timedelta
+
+from config import TICK_SIZE, FLIP_INDICATORS
+
+
+class ExitRule:
+    """Base rule: keeps entry state and converts prices to P&L ticks."""
+
+    def start(self, entry_time, entry_price, direction):
+        self.entry_time = entry_time
+        self.entry_price = entry_price
+        self.is_long = direction == 'LONG'
+
+    def pnl_ticks(self, price):
+        return (price - self.entry_price if self.is_long else self.entry_price - price) / TICK_SIZE
+
+    def update(self, index, bar, prev_bar):
+        raise NotImplementedError
+
+
+class FixedStopTarget(ExitRule):
+    """Fixed SL/TP in ticks, TP checked first (as simulate_trailing_stop)."""
+
+    def __init__(self, sl_ticks, tp_ticks):
+        self.sl_ticks = sl_ticks
+        self.tp_ticks = tp_ticks
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        sign = 1 if self.is_long else -1
+        self.tp_price = entry_price + sign * self.tp_ticks * TICK_SIZE
+        self.sl_price = entry_price - sign * self.sl_ticks * TICK_SIZE
+
+    def update(self, index, bar, prev_bar):
+        close = bar['close']
+        if (close >= self.tp_price) if self.is_long else (close <= self.tp_price):
+            return close, self.tp_ticks, 'TP'
+        if (close <= self.sl_price) if self.is_long else (close >= self.sl_price):
+            return close, -self.sl_ticks, 'SL'
+        return None
+
+
+class TrailingStop(FixedStopTarget):
+    """Fixed SL/TP plus a trailing stop; same state machine as scan_trailing_stop."""
+
+    def __init__(self, sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks):
+        super().__init__(sl_ticks, tp_ticks)
+        self.activation_points = activation_ticks * TICK_SIZE
+        self.trail_distance_points = trail_distance_ticks * TICK_SIZE
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        self.trail_stop = None
+
+    def update(self, index, bar, prev_bar):
+        close = bar['close']
+        if (close >= self.tp_price) if self.is_long else (close <= self.tp_price):
+            return close, self.tp_ticks, 'TP'
+
+        profit_points = close - self.entry_price if self.is_long else self.entry_price - close
+        if self.trail_stop is None and profit_points >= self.activation_points:
+            self.trail_stop = close - self.trail_distance_points if self.is_long else close + self.trail_distance_points
+        if self.trail_stop is not None:
+            if self.is_long:
+                self.trail_stop = max(self.trail_stop, close - self.trail_distance_points)
+                if close <= self.trail_stop:
+                    return self.trail_stop, self.pnl_ticks(self.trail_stop), 'TRAIL'
+            else:
+                self.trail_stop = min(self.trail_stop, close + self.trail_distance_points)
+                if close >= self.trail_stop:
+                    return self.trail_stop, self.pnl_ticks(self.trail_stop), 'TRAIL'
+
+        if (close <= self.sl_price) if self.is_long else (close >= self.sl_price):
+            return close, -self.sl_ticks, 'SL'
+        return None
+
+
+class BreakevenAfter(FixedStopTarget):
+    """Fixed SL/TP; once profit reaches trigger_ticks the stop moves to entry + offset_ticks."""
+
+    def __init__(self, sl_ticks, tp_ticks, trigger_ticks, offset_ticks=0):
+        super().__init__(sl_ticks, tp_ticks)
+        self.trigger_ticks = trigger_ticks
+        self.offset_ticks = offset_ticks
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        sign = 1 if self.is_long else -1
+        self.breakeven_price = entry_price + sign * self.offset_ticks * TICK_SIZE
+        self.armed = False
+
+    def update(self, index, bar, prev_bar):
+        close = bar['close']
+        if (close >= self.tp_price) if self.is_long else (close <= self.tp_price):
+            return close, self.tp_ticks, 'TP'
+        if not self.armed and self.pnl_ticks(close) >= self.trigger_ticks:
+            self.armed = True
+            return None
+        if self.armed:
+            if (close <= self.breakeven_price) if self.is_long else (close >= self.breakeven_price):
+                return self.breakeven_price, self.pnl_ticks(self.breakeven_price), 'BREAKEVEN'
+        elif (close <= self.sl_price) if self.is_long else (close >= self.sl_price):
+            return close, -self.sl_ticks, 'SL'
+        return None
+
+
+class ConfluenceBelow(ExitRule):
+    """Exit at the close of the first bar after entry whose trade-side confluence is < k."""
+
+    def __init__(self, k):
+        self.k = k
+
+    def update(self, index, bar, prev_bar):
+        if index == 0:
+            return None
+        confluence = bar.get('bull_conf', 0) if self.is_long else bar.get('bear_conf', 0)
+        if confluence < self.k:
+            return bar['close'], self.pnl_ticks(bar['close']), f'CONF<{self.k}'
+        return None
+
+
+class AdverseFlip(ExitRule):
+    """Exit at the close of the first bar where any listed indicator flips against the trade."""
+
+    def __init__(self, indicators=None):
+        self.indicators = indicators or FLIP_INDICATORS
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        self.adverse = ('UP', 'DN') if self.is_long else ('DN', 'UP')
+
+    def update(self, index, bar, prev_bar):
+        if prev_bar is None:
+            return None
+        prev_states = prev_bar['indicators']
+        curr_states = bar['indicators']
+        for ind in self.indicators:
+            if (prev_states.get(ind), curr_states.get(ind)) == self.adverse:
+                return bar['close'], self.pnl_ticks(bar['close']), 'FLIP'
+        return None
+
+
+class TimeStop(ExitRule):
+    """Exit at the close of the first bar at or after entry + minutes."""
+
+    def __init__(self, minutes):
+        self.minutes = minutes
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        self.deadline = entry_time + timedelta(minutes=self.minutes)
+
+    def update(self, index, bar, prev_bar):
+        if bar['timestamp'] >= self.deadline:
+            return bar['close'], self.pnl_ticks(bar['close']), 'TIME'
+        return None
+
+
+class AnyOf(ExitRule):
+    """Combination of rules: exits on whichever triggers first (ties go to the earlier rule)."""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def start(self, entry_time, entry_price, direction):
+        super().start(entry_time, entry_price, direction)
+        for rule in self.rules:
+            rule.start(entry_time, entry_price, direction)
+
+    def update(self, index, bar, prev_bar):
+        hit = None
+        for rule in self.rules:
+            # Every rule sees every bar so stateful rules stay in sync
+            result = rule.update(index, bar, prev_bar)
+            if hit is None:
+                hit = result
+        return hit
+
+
+RULE_TYPES = {
+    'fixed': lambda spec: FixedStopTarget(spec['sl_ticks'], spec['tp_ticks']),
+    'trailing': lambda spec: TrailingStop(spec['sl_ticks'], spec['tp_ticks'],
+                                          spec['activation_ticks'], spec['trail_distance_ticks']),
+    'breakeven': lambda spec: BreakevenAfter(spec['sl_ticks'], spec['tp_ticks'],
+                                             spec['trigger_ticks'], spec.get('offset_ticks', 0)),
+    'confluence': lambda spec: ConfluenceBelow(spec['k']),
+    'flip': lambda spec: AdverseFlip(spec.get('indicators')),
+    'time': lambda spec: TimeStop(spec['minutes']),
+}
+
+
+def build_rule_set(rule_set):
+    """Instantiate a config rule set ({'name', 'rules': [specs]}) as one rule."""
+    rules = []
+    for spec in rule_set['rules']:
+        if spec['type'] not in RULE_TYPES:
+            raise ValueError(f"Unknown exit rule type '{spec['type']}' in {rule_set['name']}")
+        rules.append(RULE_TYPES[spec['type']](spec))
+    return rules[0] if len(rules) == 1 else AnyOf(rules)
+
+
+def run_exit_rules(window_bars, entry_time, entry_price, direction, rules):
+    """
+    Advance every rule over window_bars in a single pass.
+
+    rules: {name: rule object}
+    Returns {name: {'exit_type', 'exit_time', 'exit_price', 'exit_pnl_ticks', 'bars_held'}}.
+    """
+    if not window_bars or entry_price == 0:
+        return {
+            name: {'exit_type': 'NO_BARS', 'exit_time': entry_time, 'exit_price': entry_price,
+                   'exit_pnl_ticks': 0, 'bars_held': 0}
+            for name in rules
+        }
+
+    for rule in rules.values():
+        rule.start(entry_time, entry_price, direction)
+
+    results = {}
+    active = list(rules.items())
+    prev_bar = None
+    for index, bar in enumerate(window_bars):
+        still_active = []
+        for name, rule in active:
+            hit = rule.update(index, bar, prev_bar)
+            if hit:
+                exit_price, pnl_ticks, exit_type = hit
+                results[name] = {'exit_type': exit_type, 'exit_time': bar['timestamp'], 'exit_price': exit_price,
+                                 'exit_pnl_ticks': pnl_ticks, 'bars_held': index + 1}
+            else:
+                still_active.append((name, rule))
+        active = still_active
+        if not active:
+            break
+        prev_bar = bar
+
+    last_bar = window_bars[-1]
+    for name, rule in active:
+        results[name] = {'exit_type': 'TIMEOUT', 'exit_time': last_bar['timestamp'],
+                         'exit_price': last_bar['close'], 'exit_pnl_ticks': rule.pnl_ticks(last_bar['close']),
+                         'bars_held': len(window_bars)}
+
+    # Keep the caller's rule order
+    return {name: results[name] for name in rules}
@@ -0,0 +1,242 @@
+"""
+Simulation fidelity: replay every logged trade through the exit simulator
+with the live settings it was placed with and score the result against the
+actual TRADE CLOSED line.
+
+Live settings come from the log itself (parsers.parse_order_exit_params):
+SL/TP of the ORDER PLACED line (SL includes the buffer) and the tick-based
+trailing stop of the strategy header. Each trade is simulated from its
+actual fill price with one scan_scale_out leg - a fixed SL/TP leg is the
+estimate_actual_exit_time rule, a trailing leg is scan_trailing_stop - over
+the bars from entry to the end of the session (or --horizon).
+
+Errors are simulated minus actual:
+- pnl_error_ticks:       P&L difference as logged (includes exit slippage)
+- model_error_ticks:     same with the logged exit slippage added back, i.e.
+                         the error of the exit trigger alone
+- price_error_ticks:     exit price difference, positive = simulated exit
+                         more favourable to the trade
+- time_error_seconds:    simulated exit time - logged close time
+
+Trades placed with ATR-based trailing or dynamic exit, or without SL/TP on
+the ORDER PLACED line, are counted as skipped: the simulator cannot replay
+them from the log alone.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from config import TICK_SIZE
+from barstore import build_bar_store, to_epoch_seconds
+from simulation import scan_scale_out, SIMULATOR_VERSION
+from analysis import summarize_distribution
+from session import load_session
+
+# Simulated exit types; logged reasons outside these never match
+SIMULATED_REASONS = ['SL', 'TP', 'TRAIL', 'TIMEOUT']
+
+ERROR_FIELDS = ['pnl_error_ticks', 'model_error_ticks', 'price_error_ticks', 'time_error_seconds']
+
+
+def live_exit_leg(params):
+    """scan_scale_out leg for a trade's live exit params, or (None, skip reason)."""
+    if not params:
+        return None, 'no SL/TP on order'
+    if params['trail_mode'] == 'ATR':
+        return None, 'ATR trailing'
+    if params['trail_mode'] == 'DYNAMIC':
+        return None, 'dynamic exit'
+    leg = {'size': 1, 'sl_ticks': params['sl_ticks'], 'tp_ticks': params['tp_ticks']}
+    if params['trail_mode'] == 'TICK':
+        if params['activation_ticks'] is None:
+            return None, 'no trailing header'
+        leg['activation_ticks'] = params['activation_ticks']
+        leg['trail_distance_ticks'] = params['trail_distance_ticks']
+    return leg, None
+
+
+def score_trade(store, rt, horizon=None):
+    """
+    Simulate one complete round-trip with its live params and compare it
+    with the logged close.
+
+    Returns (record, None) or (None, skip reason).
+    """
+    leg, skip = live_exit_leg(rt['entry'].get('exit_params'))
+    if skip:
+        return None, skip
+    entry_time = rt['entry']['timestamp']
+    entry_price = rt['entry_price']
+    if not entry_price:
+        return None, 'no entry price'
+
+    times = store['times']
+    lo = bisect_left(times, to_epoch_seconds(entry_time))
+    hi = bisect_right(times, to_epoch_seconds(entry_time + horizon)) if horizon else len(times)
+    if lo >= hi:
+        return None, 'no bars'
+
+    direction = rt['direction']
+    sim = scan_scale_out(store['closes'], lo, hi, entry_price, direction, [leg])['legs'][0]
+    sign = 1 if direction == 'LONG' else -1
+    actual_pnl = rt['pnl_ticks']
+    sim_time = times[sim['exit_index']]
+    return {
+        'time': rt['entry']['time_str'],
+        'direction': direction,
+        'actual_reason': rt['exit_reason'],
+        'sim_reason': sim['exit_type'],
+        'actual_pnl_ticks': actual_pnl,
+        'sim_pnl_ticks': sim['pnl_ticks'],
+        'pnl_error_ticks': sim['pnl_ticks'] - actual_pnl,
+        'model_error_ticks': sim['pnl_ticks'] - (actual_pnl + rt.get('exit_slippage_ticks', 0)),
+        'price_error_ticks': sign * (sim['exit_price'] - rt['exit_price']) / TICK_SIZE if rt['exit_price'] else None,
+        'time_error_seconds': sim_time - to_epoch_seconds(rt['exit']['timestamp'])
+    }, None
+
+
+def score_session(roundtrips, bars, horizon=None):
+    """Score every complete round-trip of one session; returns (records, skipped Counter)."""
+    records = []
+    skipped = Counter()
+    if not bars:
+        skipped['no bars'] = sum(1 for rt in roundtrips if rt['complete'])
+        return records, skipped
+    store = build_bar_store(bars)
+    for rt in roundtrips:
+        if not rt['complete']:
+            continue
+        record, skip = score_trade(store, rt, horizon)
+        if skip:
+            skipped[skip] += 1
+        else:
+            records.append(record)
+    return records, skipped
+
+
+def score_day_folders(day_folders, horizon=None):
+    """
+    Load and score (date_str, folder) pairs.
+    Returns list of {'date', 'records', 'skipped'} (one per day, in order).
+    """
+    results = []
+    for date_str, day_folder in day_folders:
+        session = load_session(day_folder, date_str, verbose=False)
+        records, skipped = score_session(session['roundtrips'], session['bars'], horizon)
+        for record in records:
+            record['date'] = date_str
+        results.append({'date': date_str, 'records': records, 'skipped': dict(skipped)})
+    return results
+
+
+def _error_summary(records):
+    summary = {'count': len(records),
+               'matched': sum(1 for r in records if r['sim_reason'] == r['actual_reason'])}
+    for field in ERROR_FIELDS:
+        values = [r[field] for r in records if r[field] is not None]
+        summary[field] = summarize_distribution(values)
+        summary[f"{field}_abs"] = sum(abs(v) for v in values) / len(values) if values else None
+    return summary
+
+
+def summarize_fidelity(day_results):
+    """
+    Pool per-day scores.
+
+    Returns dict with days, overall and by_reason error summaries (count,
+    matched, distribution and mean absolute value of each ERROR_FIELDS
+    entry), confusion {actual reason: {simulated reason: count}}, skipped
+    counts and per-day (date, count, matched, mean P&L error) rows.
+    """
+    records = [r for day in day_results for r in day['records']]
+    skipped = Counter()
+    for day in day_results:
+        skipped.update(day['skipped'])
+
+    reasons = [reason for reason, _ in Counter(r['actual_reason'] for r in records).most_common()]
+    confusion = {reason: Counter() for reason in reasons}
+    for r in records:
+        confusion[r['actual_reason']][r['sim_reason']] += 1
+
+    per_day = []
+    for day in day_results:
+        day_records = day['records']
+        if not day_records:
+            continue
+        per_day.append({
+            'date': day['date'],
+            'count': len(day_records),
+            'matched': sum(1 for r in day_records if r['sim_reason'] == r['actual_reason']),
+            'mean_pnl_error': sum(r['pnl_error_ticks'] for r in day_records) / len(day_records)
+        })
+
+    return {
+        'days': len(day_results),
+        'overall': _error_summary(records),
+        'by_reason': {reason: _error_summary([r for r in records if r['actual_reason'] == reason])
+                      for reason in reasons},
+        'confusion': {reason: dict(counts) for reason, counts in confusion.items()},
+        'skipped': dict(skipped),
+        'per_day': per_day
+    }
+
+
+def _distribution_row(label, count, dist, mean_abs, unit):
+    if not dist:
+        return f"{label:<12} {count:>6} {'---':>8} {'---':>8} {'---':>8} {'---':>8} {'---':>9}"
+    return (f"{label:<12} {count:>6} {dist['mean']:>+7.1f}{unit} {dist['p10']:>+7.1f}{unit} "
+            f"{dist['p50']:>+7.1f}{unit} {dist['p90']:>+7.1f}{unit} {mean_abs:>8.1f}{unit}")
+
+
+def format_fidelity_lines(summary, horizon_label):
+    """Report lines for summarize_fidelity output."""
+    overall = summary['overall']
+    lines = []
+    lines.append(f"Simulator version: {SIMULATOR_VERSION} | Days: {summary['days']} | "
+                 f"Trades scored: {overall['count']} | Window: {horizon_label}")
+    if summary['skipped']:
+        lines.append("Skipped: " + ", ".join(f"{reason} {count}" for reason, count in sorted(summary['skipped'].items())))
+    if not overall['count']:
+        lines.append("")
+        lines.append("No trades with live exit params and BAR coverage to score")
+        return lines
+    lines.append(f"Exit reason reproduced: {overall['matched']}/{overall['count']} "
+                 f"({overall['matched'] / overall['count'] * 100:.1f}%)")
+    lines.append("")
+
+    sim_reasons = SIMULATED_REASONS
+    lines.append("EXIT REASON CONFUSION (rows = logged reason, columns = simulated)")
+    lines.append(f"{'Logged':<12} {'Trades':>6} " + " ".join(f"{r:>8}" for r in sim_reasons) + f" {'Match%':>7}")
+    lines.append("-" * (28 + 9 * len(sim_reasons)))
+    for reason, counts in summary['confusion'].items():
+        total = sum(counts.values())
+        cells = " ".join(f"{counts.get(r, 0):>8}" for r in sim_reasons)
+        lines.append(f"{reason:<12} {total:>6} {cells} {counts.get(reason, 0) / total * 100:>6.1f}%")
+    lines.append("")
+
+    titles = {
+        'pnl_error_ticks': ('P&L ERROR (simulated - logged, ticks)', 't'),
+        'model_error_ticks': ('TRIGGER ERROR (P&L error with logged exit slippage added back, ticks)', 't'),
+        'price_error_ticks': ('EXIT PRICE ERROR (ticks, + = simulated exit more favourable)', 't'),
+        'time_error_seconds': ('EXIT TIME ERROR (simulated - logged close, seconds)', 's'),
+    }
+    for field in ERROR_FIELDS:
+        title, unit = titles[field]
+        lines.append(f"{title} BY LOGGED REASON")
+        lines.append(f"{'Logged':<12} {'Trades':>6} {'Mean':>8} {'P10':>8} {'P50':>8} {'P90':>8} {'Mean|e|':>9}")
+        lines.append("-" * 66)
+        for reason, s in summary['by_reason'].items():
+            lines.append(_distribution_row(reason, s['count'], s[field], s[f"{field}_abs"], unit))
+        lines.append("-" * 66)
+        lines.append(_distribution_row('ALL', overall['count'], overall[field], overall[f"{field}_abs"], unit))
+        lines.append("")
+
+    if len(summary['per_day']) > 1:
+        lines.append("BY DAY")
+        lines.append(f"{'Date':<12} {'Trades':>6} {'Match%':>7} {'Mean P&L err':>13}")
+        lines.append("-" * 42)
+        for day in summary['per_day']:
+            lines.append(f"{day['date']:<12} {day['count']:>6} {day['matched'] / day['count'] * 100:>6.1f}% "
+                         f"{day['mean_pnl_error']:>+12.1f}t")
+        lines.append("")
+    return lines
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Resumable, checkpointed job runner.
+Long jobs are split into units (e.g. (day, config block) for a sweep, one
+dated folder for a batch re-analysis, one log for a Market Replay batch).
+Each finished unit's result is appended to a JSONL journal and fsynced, so
+a run killed part-way (e.g. by the scheduled task's one-hour
+ExecutionTimeLimit) restarts from the journal and only computes the units
+that are missing. Results are always returned in unit order, so the merged
+output does not depend on when or in which run a unit finished.
+
+The journal's first line records a fingerprint of the job definition; a
+journal written for different parameters is discarded rather than mixed in.
+
+Market Replay batches:
+    python jobrunner.py replay <analyzer.py> <start_date> <end_date> --trader-log "<glob>"
+                        [--journal path.jsonl] [--csv-log path]
+runs the analyzer once per matching trader log (one unit each) and writes
+a combined report with the per-log reports in log-name order.
+"""
+
+import os
+import sys
+import json
+import glob
+import hashlib
+import subprocess
+from datetime import datetime
+
+
+def job_fingerprint(spec):
+    """Stable hash of a JSON-serializable job definition."""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_journal(journal_path, fingerprint):
+    """
+    Return {unit_id: result} recorded for this job, or {} if the journal is
+    missing or belongs to a different job. A torn last line from a killed
+    run is ignored.
+    """
+    completed = {}
+    if not os.path.exists(journal_path):
+        return completed
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        header = f.readline()
+        try:
+            if json.loads(header).get('job') != fingerprint:
+                print(f"  Journal {os.path.basename(journal_path)} is for a different job - starting over")
+                return completed
+        except ValueError:
+            return completed
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            completed[entry['unit']] = entry['result']
+    return completed
+
+
+def _append_entry(f, entry):
+    f.write(json.dumps(entry) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def open_journal(journal_path, spec):
+    """
+    Open the journal for job spec. Returns (completed, file) where completed
+    is {unit_id: result} from earlier runs and file is open for appending.
+    """
+    fingerprint = job_fingerprint(spec)
+    completed = load_journal(journal_path, fingerprint)
+    # Rewrite the journal when starting fresh so stale entries never linger
+    f = open(journal_path, 'a' if completed else 'w', encoding='utf-8')
+    if not completed:
+        _append_entry(f, {'job': fingerprint, 'created': datetime.now().isoformat(timespec='seconds')})
+    return completed, f
+
+
+def record_unit(f, unit_id, result):
+    """Durably append one finished unit to an open journal."""
+    _append_entry(f, {'unit': unit_id, 'result': result})
+
+
+def run_units(units, compute, journal_path, spec):
+    """
+    Run compute(payload) for every (unit_id, payload) in units, skipping
+    units already in the journal. unit_id must be a string and each result
+    JSON-serializable; compute may return None to leave a unit pending (it
+    is retried on the next run). Returns results in the order of units,
+    with None for units still pending.
+    """
+    completed, f = open_journal(journal_path, spec)
+    pending = [(unit_id, payload) for unit_id, payload in units if unit_id not in completed]
+    if completed:
+        print(f"  Resuming: {len(units) - len(pending)} of {len(units)} units already in journal")
+
+    with f:
+        for n, (unit_id, payload) in enumerate(pending, 1):
+            result = compute(payload)
+            if result is None:
+                print(f"  Unit {unit_id} failed ({n}/{len(pending)})")
+                continue
+            record_unit(f, unit_id, result)
+            completed[unit_id] = result
+            print(f"  Unit {unit_id} done ({n}/{len(pending)})")
+
+    return [completed.get(unit_id) for unit_id, _ in units]
+
+
+def finish_journal(journal_path):
+    """Remove the journal once the merged output has been written."""
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+# === MARKET REPLAY BATCHES ===
+
+def _run_replay_unit(payload):
+    """Run one Market Replay analyzer invocation; returns its report path (None on failure)."""
+    proc = subprocess.run(payload['command'], capture_output=True, text=True, encoding='utf-8')
+    report_path = None
+    for line in proc.stdout.splitlines():
+        if line.startswith('Analysis saved to:'):
+            report_path = line.split(':', 1)[1].strip()
+    if proc.returncode != 0 or not report_path:
+        print(f"  {os.path.basename(payload['log'])}: analyzer exited with code {proc.returncode}")
+        return None
+    return {'log': payload['log'], 'report': report_path}
+
+
+def run_replay_batch(analyzer, start_date, end_date, trader_logs, csv_log=None, journal_path=None):
+    """
+    Run a Market Replay analyzer over several trader logs with checkpointing.
+    Returns (results in log order, None for failed logs; combined report
+    path or None).
+    """
+    logs = sorted(trader_logs)
+    units = []
+    for log in logs:
+        command = [sys.executable, analyzer, start_date, end_date, '--trader-log', log]
+        if csv_log:
+            command += ['--csv-log', csv_log]
+        units.append((os.path.basename(log), {'log': log, 'command': command}))
+
+    spec = {'analyzer': os.path.basename(analyzer), 'start': start_date, 'end': end_date,
+            'logs': [os.path.abspath(log) for log in logs], 'csv_log': csv_log}
+    journal_path = journal_path or f"MR_Batch_{start_date}_{end_date}.journal.jsonl"
+    results = run_units(units, _run_replay_unit, journal_path, spec)
+
+    reports = [r for r in results if r and os.path.exists(r['report'])]
+    if not reports:
+        return results, None
+
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"MARKET REPLAY BATCH - {start_date} to {end_date} ({len(reports)} of {len(results)} logs)")
+    lines.append("=" * 100)
+    for log, r in zip(sorted(trader_logs), results):
+        status = os.path.basename(r['report']) if r in reports else "FAILED"
+        lines.append(f"  {os.path.basename(log):<45} {status}")
+    lines.append("")
+    for r in reports:
+        with open(r['report'], 'r', encoding='utf-8') as f:
+            lines.append(f.read().rstrip('\n'))
+        lines.append("")
+
+    combined = os.path.join(os.path.dirname(reports[0]['report']), f"MR_Batch_{start_date}_{end_date}.txt")
+    with open(combined, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    if len(reports) == len(results):
+        finish_journal(journal_path)
+    return results, combined
+
+
+def main():
+    if len(sys.argv) < 5 or sys.argv[1] != 'replay':
+        print('Usage: python jobrunner.py replay <analyzer.py> <start_date> <end_date> --trader-log "<glob>" '
+              '[--journal path.jsonl] [--csv-log path]')
+        sys.exit(1)
+
+    analyzer, start_date, end_date = sys.argv[2], sys.argv[3], sys.argv[4]
+    options = {}
+    i = 5
+    while i < len(sys.argv):
+        if sys.argv[i] in ('--trader-log', '--journal', '--csv-log') and i + 1 < len(sys.argv):
+            options[sys.argv[i]] = sys.argv[i + 1]
+            i += 2
+        else:
+            i += 1
+
+    trader_logs = glob.glob(options.get('--trader-log', ''))
+    if not trader_logs:
+        print(f"ERROR: No trader logs match {options.get('--trader-log')}")
+        sys.exit(1)
+
+    print(f"Market Replay batch: {len(trader_logs)} log(s), {start_date} to {end_date}")
+    results, combined = run_replay_batch(analyzer, start_date, end_date, trader_logs,
+                                         csv_log=options.get('--csv-log'),
+                                         journal_path=options.get('--journal'))
+    failed = [r for r in results if r is None]
+    if failed:
+        print(f"  {len(failed)} log(s) failed - re-run the same command to retry them")
+    if combined:
+        print(f"\nCombined report saved to: {combined}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,147 +8,781 @@ Includes "what if exit on first adverse flip" analysis.
 Includes TRAILING STOP simulation analysis.
 Generates {Mon}{DD}_Trading_Analysis.txt report.
 
-Usage: python main.py <folder_path> [--date YYYY-MM-DD]
+Usage: python main.py <folder_path> [--date YYYY-MM-DD] [--no-cache]
+                      [--backend serial|thread|process] [--workers N]
+                      [--trail-details none|compact|full] [--horizon MINUTES]
+                      [--slippage expectation|sample|off]
+       python main.py <folder_path> --sweep [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                      [--sl 20:80:10] [--tp 60:200:20] [--act 30:120:10] [--trail 10:60:5]
+                      [--workers N] [--serve [HOST:PORT] [--lease SECONDS]] [--ticks FILE]
+                      [--slippage expectation|sample|off]
+       python main.py <folder_path> --optimize [--budget N] [--seed N] [--eta N]
+                      [--log path.jsonl] [--from/--to/--sl/--tp/--act/--trail/--workers as above]
+       python main.py <folder_path> --walk-forward [--train N] [--test N] [--grid]
+                      [--from/--to/--workers as above]
+       python main.py <folder_path> --batch [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                      [--backend/--workers/--trail-details as above] [--serve [HOST:PORT] [--lease SECONDS]]
+       python main.py <folder_path> --indicators [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+       python main.py <folder_path> --scale-out [--t1 20:100:10] [--act 40:120:20]
+                      [--trail 20:60:10] [--contracts N] [--from/--to/--workers as above]
+       python main.py <folder_path> --calibrate-slippage [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+       python main.py <folder_path> --fidelity [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                      [--horizon MINUTES] [--backend/--workers as above]
+       python main.py <folder_path> --emulate [--set name=value ...] [--reports]
+                      [--from/--to/--backend/--workers as above]
+       python main.py <folder_path> --signal-sweep [--conf 3:7] [--auto-conf 3:7] [--window 1:6]
+                      [--cooldown 0:20:2] [--set/--from/--to/--backend/--workers as above]
+
+Sweep mode simulates every SL/TP/activation/trail combination. <folder_path>
+is either a dated analysis folder or the ActiveNikiAnalysis root (all dated
+subfolders, optionally limited by --from/--to). Optimize mode searches the
+same space adaptively and logs every evaluation so it can be resumed.
+Walk-forward mode picks the best TRAILING_STOP_CONFIGS entry (or sweep grid
+point with --grid) per training window and scores it out-of-sample.
+Batch mode regenerates the daily report of every dated folder; its summary
+adds bootstrap intervals over the days (bootstrap.py).
+Indicators mode summarizes flip rates, dwell times, whipsaws and co-flips
+of every indicator over the IndicatorValues history (CSV files only).
+Scale-out mode sweeps multi-leg exits: 1 contract off at a fixed first
+target (--t1), the rest trailed (--act/--trail), P&L blended per contract.
+
+Sweep and batch runs are checkpointed (jobrunner.py): completed units are
+journaled next to the output, and re-running the same command after an
+interruption only computes what is missing. With --serve the sweep's units
+(or the batch's days) are handed to `distributed.py worker` processes
+(other VPS boxes or local cores) instead of being computed here.
+
+--horizon sets how long after entry the exit simulations follow a trade
+(default EXIT_HORIZON_MINUTES) in every mode.
+
+--ticks <NT8 tick export> makes the sweep, optimize, walk-forward and
+scale-out modes simulate each trade on the export's ticks instead of the
+IndicatorValues bars (tickstore.py; the export is indexed on first use).
+
+Calibrate-slippage mode fits entry/exit slippage distributions to the
+logged fills of every dated folder and saves them as
+ActiveNikiAnalysis/slippage_model.json; the daily report then shows its
+trailing comparisons net of that model (--slippage; without a saved
+model the day's own fills are used). The sweep, optimize, walk-forward
+and scale-out modes subtract the saved model's cost from every simulated
+trade, so their rankings are net too (gross without a saved model).
+
+Fidelity mode replays every logged trade through the exit simulator with
+the SL/TP/trailing settings it was placed with (ORDER PLACED line and
+strategy header) and reports how well the simulated exit reason, price,
+P&L and time match the actual TRADE CLOSED lines (fidelity.py). Without
+--horizon the simulation follows each trade to the end of the session.
+
+Emulate mode replays the IndicatorValues bars of every dated folder
+through a Python copy of the ActiveNikiTrader logic (emulator.py) with the
+STRATEGY_DEFAULTS settings, each overridable with --set (JSON values, e.g.
+--set cooldown_bars=5 --set trading_sessions=[]). It writes a per-day
+summary; --reports also writes a full {Mon}{DD}_Emulated_Analysis.txt
+report of the emulated trades per day.
+Signal-sweep mode regenerates the emulator's signals and trades for every
+MinConfluenceRequired / MinConfluenceForAutoTrade / MaxBarsAfterYellowSquare
+/ CooldownBars tuple of the grid in one pass per day (signalsweep.py) and
+ranks the tuples by traded P&L; --set fixes the other settings.
+
+Trailing stop results of the daily report are cached in
+ActiveNikiAnalysis/sim_cache.sqlite; --no-cache simulates everything afresh.
 """
 
 import sys
 import os
 import re
-from datetime import datetime
+import json
+import itertools
+import functools
+from datetime import datetime, timedelta
 
 from config import TRAILING_STOP_CONFIGS
-from parsers import (
-    parse_trades, find_signal_files, find_indicator_csv_files,
-    parse_monitor_signals, parse_trader_signals,
-    parse_trader_orders_and_closes, parse_indicator_csv,
-    merge_signals
+from session import load_session, load_bars, find_dated_folders
+from parsers import find_indicator_csv_files
+from roundtrips import enrich_roundtrips_with_bar_data
+from report import generate_report
+from sweep import (
+    SWEEP_AXES, parse_range_spec, default_sweep_ranges, expand_sweep_grid,
+    build_trade_windows, run_sweep, merge_sweep_results, write_sweep_cube,
+    format_sweep_summary, SCALE_OUT_AXES, default_scale_out_ranges, scale_out_legs,
+    run_scale_out_sweep, format_scale_out_summary
 )
-from roundtrips import (
-    build_roundtrips, build_roundtrips_from_trader_log,
-    match_signals_to_trades, enrich_roundtrips_with_bar_data
+from simulation import SIMULATOR_VERSION, RECORDING_LEVELS
+from jobrunner import run_units, finish_journal
+from backends import BACKENDS, map_chunks
+from distributed import (
+    serve_units, sweep_unit_payload, batch_unit_payload, parse_address, UnitFailedError
+)
+from optimizer import successive_halving_search, format_optimizer_summary
+from walkforward import (
+    trailing_config_candidates, grid_candidates, run_walk_forward,
+    format_walk_forward_report
+)
+from simcache import open_sim_cache, close_sim_cache
+from barstore import build_bar_store
+from tickstore import open_tick_store, apply_tick_windows
+from slippage import (
+    SLIPPAGE_MODES, calibrate_slippage_model, save_slippage_model, load_slippage_model,
+    apply_slippage_model, apply_window_slippage, format_slippage_model_lines
+)
+from fidelity import score_day_folders, summarize_fidelity, format_fidelity_lines
+from emulator import strategy_params, emulate_day_folders, format_emulation_lines
+from signalsweep import (
+    SIGNAL_SWEEP_AXES, default_signal_sweep_ranges, sweep_day_folders, merge_signal_sweep,
+    format_signal_sweep_summary
+)
+from bootstrap import (
+    bootstrap_metrics, trade_metric_columns, sum_metric_columns, day_metric_columns,
+    format_bootstrap_lines, WIN_RATE_RATIO
+)
+from whipsaw import (
+    day_indicator_stats, merge_indicator_stats, summarize_indicator_stats,
+    format_indicator_behavior_lines
+)
+from config import (
+    OPTIMIZER_BUDGET, OPTIMIZER_SEED, OPTIMIZER_ETA,
+    WALK_FORWARD_TRAIN_DAYS, WALK_FORWARD_TEST_DAYS, SIM_CACHE_FILENAME,
+    SWEEP_UNIT_COMBOS, TICK_VALUE, DISTRIBUTED_LEASE_SECONDS, ENRICH_BACKEND,
+    TRAIL_RECORDING, EXIT_HORIZON_MINUTES, SCALE_OUT_CONTRACTS,
+    SLIPPAGE_MODEL_FILENAME, SLIPPAGE_MODE
 )
-from report import generate_report
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <folder_path> [--date YYYY-MM-DD]")
+# Sweep CLI flag -> cube axis
+SWEEP_FLAGS = {
+    '--sl': 'sl_ticks',
+    '--tp': 'tp_ticks',
+    '--act': 'activation_ticks',
+    '--trail': 'trail_distance_ticks',
+}
+
+# Signal sweep CLI flag -> grid axis
+SIGNAL_SWEEP_FLAGS = {
+    '--conf': 'min_confluence_required',
+    '--auto-conf': 'min_confluence_for_auto_trade',
+    '--window': 'max_bars_after_yellow_square',
+    '--cooldown': 'cooldown_bars',
+}
+
+# Scale-out CLI flag -> grid axis
+SCALE_OUT_FLAGS = {
+    '--t1': 'first_target_ticks',
+    '--act': 'activation_ticks',
+    '--trail': 'trail_distance_ticks',
+}
+
+
+def get_arg_value(name, default=None):
+    """Return the value following a --flag in sys.argv, or default."""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
+
+def get_horizon_minutes():
+    """Exit horizon in minutes from --horizon (default EXIT_HORIZON_MINUTES)."""
+    return int(get_arg_value('--horizon', EXIT_HORIZON_MINUTES))
+
+
+def get_report_options(record=TRAIL_RECORDING):
+    """run_daily_report options from the command line (--trail-details overrides record)."""
+    return {
+        'record': get_arg_value('--trail-details', record),
+        'use_cache': '--no-cache' not in sys.argv,
+        'backend': get_arg_value('--backend', ENRICH_BACKEND),
+        'workers': int(get_arg_value('--workers', 0)) or None,
+        'horizon_minutes': get_horizon_minutes(),
+        'slippage_mode': get_arg_value('--slippage', SLIPPAGE_MODE)
+    }
+
+
+def resolve_day_folders(folder_path):
+    """
+    Map the CLI folder to (date_str, folder) pairs for multi-day modes.
+    A dated folder yields itself; a root folder yields its dated subfolders.
+    """
+    folder_name = os.path.basename(os.path.normpath(folder_path))
+    match = re.match(r'^(\d{4}-\d{2}-\d{2})', folder_name)
+    if match:
+        return [(match.group(1), folder_path)]
+    root = folder_path
+    if os.path.isdir(os.path.join(folder_path, 'ActiveNikiAnalysis')):
+        root = os.path.join(folder_path, 'ActiveNikiAnalysis')
+    return find_dated_folders(root, get_arg_value('--from'), get_arg_value('--to'))
+
+
+def get_serve_options():
+    """(host, port, lease seconds) of the --serve coordinator."""
+    address = get_arg_value('--serve')
+    host, port = parse_address(None if not address or address.startswith('--') else address)
+    return host, port, int(get_arg_value('--lease', DISTRIBUTED_LEASE_SECONDS))
+
+
+
+def serve_job(units, remote_payload, journal, spec):
+    """serve_units with the --serve/--lease options; exits if a unit keeps failing."""
+    host, port, lease = get_serve_options()
+    try:
+        return serve_units(units, remote_payload, journal, spec, host, port, lease_seconds=lease)
+    except UnitFailedError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def get_sweep_ranges():
+    """Sweep ranges from config, overridden by --sl/--tp/--act/--trail."""
+    ranges = default_sweep_ranges()
+    for flag, axis in SWEEP_FLAGS.items():
+        spec = get_arg_value(flag)
+        if spec:
+            ranges[axis] = parse_range_spec(spec)
+    return ranges
+
+
+def load_window_slippage(day_folders):
+    """
+    Slippage the multi-day simulations are net of: {'model', 'mode'} for
+    the root model saved by --calibrate-slippage, or None (no saved model
+    or --slippage off).
+    """
+    mode = get_arg_value('--slippage', SLIPPAGE_MODE)
+    if mode == 'off':
+        return None
+    model_path = os.path.join(os.path.dirname(os.path.normpath(day_folders[0][1])), SLIPPAGE_MODEL_FILENAME)
+    model = load_slippage_model(model_path)
+    return {'model': model, 'mode': mode} if model else None
+
+
+def load_day_windows(day_folders, slippage=None):
+    """
+    Parse each dated folder and cut per-trade simulation windows
+    (from the --ticks export instead of the bars when given), with the
+    slippage cost of load_window_slippage attached.
+    """
+    horizon = timedelta(minutes=get_horizon_minutes())
+    tick_path = get_arg_value('--ticks')
+    tick_store = open_tick_store(tick_path, log=print) if tick_path else None
+    day_windows = {}
+    for date_str, day_folder in day_folders:
+        session = load_session(day_folder, date_str, verbose=False)
+        windows = build_trade_windows(session['roundtrips'], session['bars'], day=date_str, horizon=horizon)
+        if tick_store:
+            windows = apply_tick_windows(windows, tick_store, horizon)
+            print(f"{date_str}: {len(windows)} trades with tick coverage")
+        else:
+            print(f"{date_str}: {len(windows)} trades with BAR coverage ({len(session['bars'])} bars)")
+        if slippage:
+            apply_window_slippage(windows, slippage['model'], slippage['mode'])
+        if windows:
+            day_windows[date_str] = windows
+    return day_windows
+
+
+def multi_day_output(day_folders):
+    """Return (label, output folder) for a multi-day run."""
+    if len(day_folders) == 1:
+        return day_folders[0][0], day_folders[0][1]
+    label = f"{day_folders[0][0]}_to_{day_folders[-1][0]}"
+    return label, os.path.dirname(os.path.normpath(day_folders[0][1]))
+
+
+def run_sweep_mode(folder_path):
+    """
+    Run the exit-parameter sweep over one or more dated folders.
+    Work is split into checkpointed (day, config block) units.
+    """
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
         sys.exit(1)
     
-    folder_path = sys.argv[1]
+    ranges = get_sweep_ranges()
+    workers = int(get_arg_value('--workers', 0)) or None
+    grid = expand_sweep_grid(ranges)
+    label, output_path = multi_day_output(day_folders)
+    slippage = load_window_slippage(day_folders)
+    slippage_mode = slippage['mode'] if slippage else None
     
-    # Get date from argument or folder name
-    date_str = None
-    if '--date' in sys.argv:
-        idx = sys.argv.index('--date')
-        if idx + 1 < len(sys.argv):
-            date_str = sys.argv[idx + 1]
+    print(f"Sweeping {len(grid)} combinations over {len(day_folders)} day(s)")
+    for axis in SWEEP_AXES:
+        print(f"  {axis}: {ranges[axis]}")
     
-    if not date_str:
-        folder_name = os.path.basename(folder_path.rstrip('/\\'))
-        # Handle both YYYY-MM-DD and YYYY-MM-DD_local formats
-        match = re.match(r'(\d{4}-\d{2}-\d{2})', folder_name)
-        if match:
-            date_str = match.group(1)
-        else:
-            print("Error: Could not determine date. Use --date YYYY-MM-DD")
-            sys.exit(1)
+    units = [
+        (f"{date_str}#{start}", (date_str, day_folder, start))
+        for date_str, day_folder in day_folders
+        for start in range(0, len(grid), SWEEP_UNIT_COMBOS)
+    ]
+    loaded = {}
     
-    # Resolve paths:
-    # - If folder_path is the raw log root, source files live there and output
-    #   goes into <log_root>/ActiveNikiAnalysis/<date>/
-    # - If folder_path is already a dated analysis subfolder, keep existing behaviour
-    analysis_subfolder = os.path.join('ActiveNikiAnalysis', date_str)
-    if os.path.basename(os.path.normpath(folder_path)) == date_str or        'ActiveNikiAnalysis' in folder_path:
-        # Already a dated/analysis folder — use as-is
-        source_path = folder_path
-        output_path = folder_path
+    def unit_windows(date_str, day_folder):
+        if date_str not in loaded:
+            loaded.clear()
+            loaded[date_str] = load_day_windows([(date_str, day_folder)], slippage).get(date_str, [])
+        return loaded[date_str]
+    
+    def compute_unit(payload):
+        date_str, day_folder, start = payload
+        windows = unit_windows(date_str, day_folder)
+        return run_sweep(windows, grid[start:start + SWEEP_UNIT_COMBOS], workers=workers if windows else 1)
+    
+    def remote_payload(payload):
+        date_str, day_folder, start = payload
+        return sweep_unit_payload(unit_windows(date_str, day_folder), grid[start:start + SWEEP_UNIT_COMBOS])
+    
+    journal = os.path.join(output_path, f"Exit_Sweep_{label}.journal.jsonl")
+    spec = {'mode': 'sweep', 'days': [d for d, _ in day_folders], 'ranges': ranges,
+            'unit_combos': SWEEP_UNIT_COMBOS, 'simulator': SIMULATOR_VERSION,
+            'horizon_minutes': get_horizon_minutes()}
+    if get_arg_value('--ticks'):
+        spec['ticks'] = os.path.abspath(get_arg_value('--ticks'))
+    if slippage:
+        spec['slippage'] = slippage
+    if '--serve' in sys.argv:
+        unit_results = serve_job(units, remote_payload, journal, spec)
     else:
-        # Log root passed — search files here, write output to analysis subfolder
-        source_path = folder_path
-        output_path = os.path.join(folder_path, 'ActiveNikiAnalysis', date_str)
-        os.makedirs(output_path, exist_ok=True)
-        print(f"Output folder: {output_path}")
+        unit_results = run_units(units, compute_unit, journal, spec)
+    
+    # Reassemble per-day result lists (blocks in grid order), then merge days in date order
+    per_day = {}
+    for (_, (date_str, _, _)), block_results in zip(units, unit_results):
+        per_day.setdefault(date_str, []).extend(block_results)
+    days = [d for d, _ in day_folders if per_day[d] and per_day[d][0]['trades']]
+    results = merge_sweep_results([per_day[d] for d in days])
+    if not results:
+        print("Error: No trades with BAR coverage to sweep")
+        sys.exit(1)
+    print(f"\nSimulated {results[0]['trades']} trades per combination")
+    
+    cube_file = os.path.join(output_path, f"Exit_Sweep_{label}_cube.json")
+    write_sweep_cube(cube_file, ranges, grid, results, days)
+    summary_file = os.path.join(output_path, f"Exit_Sweep_{label}.txt")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write(format_sweep_summary(label, ranges, grid, results, days, slippage_mode=slippage_mode))
+    finish_journal(journal)
+    
+    print(f"\nSweep cube saved to: {cube_file}")
+    print(f"Sweep summary saved to: {summary_file}")
 
-    trades_path = os.path.join(source_path, 'trades_final.txt')
-
-    # Find signal files
-    monitor_files, trader_files = find_signal_files(source_path, date_str)
-
-    # Find indicator CSV files
-    csv_files = find_indicator_csv_files(source_path)
-    
-    print(f"Date: {date_str}")
-    print(f"Folder: {folder_path}")
-    print(f"Monitor files: {len(monitor_files)}")
-    print(f"Trader files: {len(trader_files)}")
-    print(f"CSV files: {len(csv_files)}")
-    
-    # Parse trades from trades_final.txt (for discretionary trades)
-    print(f"\nParsing trades from: {trades_path}")
-    trades = parse_trades(trades_path)
-    print(f"  Found {len(trades)} trade records from trades_final.txt")
-    
-    # Parse all signal files
-    all_monitor_signals = []
-    all_trader_signals = []
-    all_trader_orders = []
-    all_trader_closes = []
-    
-    for f in monitor_files:
-        print(f"Parsing Monitor: {os.path.basename(f)}")
-        sigs = parse_monitor_signals(f, date_str)
-        print(f"  Found {len(sigs)} signals")
-        all_monitor_signals.extend(sigs)
-    
-    for f in trader_files:
-        print(f"Parsing Trader: {os.path.basename(f)}")
-        sigs = parse_trader_signals(f, date_str)
-        orders, closes = parse_trader_orders_and_closes(f, date_str)
-        print(f"  Found {len(sigs)} signals, {len(orders)} orders, {len(closes)} closed trades")
-        all_trader_signals.extend(sigs)
-        all_trader_orders.extend(orders)
-        all_trader_closes.extend(closes)
-    
-    # Parse indicator CSV files for BAR data
-    all_bars = []
-    for f in csv_files:
-        print(f"Parsing CSV: {os.path.basename(f)}")
-        bars = parse_indicator_csv(f, date_str)
-        print(f"  Found {len(bars)} BAR records")
-        all_bars.extend(bars)
-    
-    # Sort bars by timestamp
-    all_bars.sort(key=lambda x: x['timestamp'])
-    
-    # Show time range of CSV data
-    if all_bars:
-        first_bar_time = all_bars[0]['timestamp']
-        last_bar_time = all_bars[-1]['timestamp']
-        print(f"  CSV time range: {first_bar_time.strftime('%H:%M:%S')} to {last_bar_time.strftime('%H:%M:%S')}")
-    
-    # Merge signals
-    all_signals = merge_signals(all_monitor_signals, all_trader_signals)
-    print(f"\nTotal unique signals: {len(all_signals)}")
-    
-    # Build round-trips - prefer trader log data if available, fall back to trades_final.txt
-    if all_trader_orders and all_trader_closes:
-        print(f"\nBuilding round-trips from trader log ({len(all_trader_orders)} orders, {len(all_trader_closes)} closes)")
-        roundtrips = build_roundtrips_from_trader_log(all_trader_orders, all_trader_closes)
+
+def run_batch_mode(folder_path):
+    """
+    Regenerate the daily report of every dated folder (checkpointed per day)
+    and write a one-line-per-day batch summary.
+    """
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    label, output_path = multi_day_output(day_folders)
+    units = [(date_str, (date_str, day_folder)) for date_str, day_folder in day_folders]
+    report_options = get_report_options(record='none')
+    
+    def compute_unit(payload):
+        date_str, day_folder = payload
+        return run_daily_report(day_folder, day_folder, date_str, **report_options)
+    
+    journal = os.path.join(output_path, f"Batch_{label}.journal.jsonl")
+    spec = {'mode': 'batch', 'days': [d for d, _ in day_folders], 'simulator': SIMULATOR_VERSION,
+            'horizon_minutes': get_horizon_minutes()}
+    if '--serve' in sys.argv:
+        # Report options travel with each day; workers use their own --workers and no cache
+        options = {name: value for name, value in report_options.items() if name not in ('use_cache', 'workers')}
+    
+        def remote_payload(payload):
+            date_str, day_folder = payload
+            return batch_unit_payload(date_str, day_folder, options)
+    
+        results = serve_job(units, remote_payload, journal, spec)
+        for (_, (date_str, day_folder)), r in zip(units, results):
+            report_file = os.path.join(day_folder, r['report'])
+            with open(report_file, 'w', encoding='utf-8') as f:
+                f.write(r.pop('report_text'))
+            r['report'] = report_file
+            print(f"{date_str}: report saved to {report_file}")
+    else:
+        results = run_units(units, compute_unit, journal, spec)
+    
+    lines = []
+    lines.append("=" * 80)
+    lines.append(f"BATCH RE-ANALYSIS - {label}")
+    lines.append("=" * 80)
+    lines.append(f"{'Date':<12} {'Trades':>7} {'Win%':>6} {'P&L':>9} {'$':>11}  Report")
+    lines.append("-" * 80)
+    for (date_str, _), r in zip(units, results):
+        wr = r['wins'] / r['trades'] * 100 if r['trades'] else 0
+        lines.append(f"{date_str:<12} {r['trades']:>7} {wr:>5.0f}% {r['pnl_ticks']:>+8.0f}t "
+                     f"{r['pnl_ticks'] * TICK_VALUE:>+11.2f}  {os.path.basename(r['report'])}")
+    lines.append("-" * 80)
+    total_trades = sum(r['trades'] for r in results)
+    total_pnl = sum(r['pnl_ticks'] for r in results)
+    lines.append(f"{'TOTAL':<12} {total_trades:>7} {'':>6} {total_pnl:>+8.0f}t {total_pnl * TICK_VALUE:>+11.2f}")
+    lines.append("=" * 80)
+    
+    # Day-level bootstrap (days resampled, so within-day dependence is kept)
+    day_sums = [r['metric_sums'] for r in results if r.get('metric_sums')]
+    if len(day_sums) > 1:
+        stats = bootstrap_metrics(day_metric_columns(day_sums), WIN_RATE_RATIO)
+        lines.append("")
+        lines.append("BOOTSTRAP CONFIDENCE INTERVALS (days resampled)")
+        lines.append("-" * 80)
+        lines.extend(format_bootstrap_lines(stats, len(day_sums), "days"))
+    
+    summary_file = os.path.join(output_path, f"Batch_{label}.txt")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    finish_journal(journal)
+    print(f"\nBatch summary saved to: {summary_file}")
+
+
+def run_indicators_mode(folder_path):
+    """Indicator flip/dwell/whipsaw/co-flip analytics over all dated folders' bars."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    day_stats = []
+    for date_str, day_folder in day_folders:
+        bars = load_bars(find_indicator_csv_files(day_folder), date_str)
+        if not bars:
+            continue
+        day_stats.append(day_indicator_stats(build_bar_store(bars)))
+        print(f"{date_str}: {len(bars)} bars")
+    if not day_stats:
+        print("Error: No IndicatorValues bars found")
+        sys.exit(1)
+    
+    summary = summarize_indicator_stats(merge_indicator_stats(day_stats))
+    label, output_path = multi_day_output(day_folders)
+    lines = []
+    lines.append("=" * 90)
+    lines.append(f"INDICATOR BEHAVIOR - {label}")
+    lines.append("=" * 90)
+    lines.append("")
+    lines.extend(format_indicator_behavior_lines(summary))
+    
+    report_file = os.path.join(output_path, f"Indicator_Behavior_{label}.txt")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    print(f"\nIndicator behavior report saved to: {report_file}")
+
+
+def run_scale_out_mode(folder_path):
+    """Sweep 2-leg scale-out exits (first target x activation x trail) over dated folders."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    contracts = int(get_arg_value('--contracts', SCALE_OUT_CONTRACTS))
+    if contracts < 2:
+        print(f"Error: --contracts must be at least 2 to scale out (got {contracts})")
+        sys.exit(1)
+    ranges = default_scale_out_ranges()
+    for flag, axis in SCALE_OUT_FLAGS.items():
+        spec = get_arg_value(flag)
+        if spec:
+            ranges[axis] = parse_range_spec(spec)
+    workers = int(get_arg_value('--workers', 0)) or None
+    grid = list(itertools.product(*(ranges[axis] for axis in SCALE_OUT_AXES)))
+    legs_grid = [scale_out_legs(combo, contracts) for combo in grid]
+    slippage = load_window_slippage(day_folders)
+    
+    day_windows = load_day_windows(day_folders, slippage)
+    days = list(day_windows)
+    windows = [w for d in days for w in day_windows[d]]
+    if not windows:
+        print("Error: No trades with BAR coverage to simulate")
+        sys.exit(1)
+    
+    print(f"Simulating {len(grid)} scale-out configurations over {len(windows)} trades")
+    results = run_scale_out_sweep(windows, legs_grid, workers=workers)
+    
+    label, output_path = multi_day_output(day_folders)
+    summary_file = os.path.join(output_path, f"Scale_Out_{label}.txt")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write(format_scale_out_summary(label, ranges, grid, results, days, contracts,
+                                         slippage_mode=slippage['mode'] if slippage else None))
+    print(f"\nScale-out summary saved to: {summary_file}")
+
+
+def run_calibrate_slippage_mode(folder_path):
+    """Calibrate the slippage model from every dated folder's fills and save it in the root."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    roundtrips = []
+    for date_str, day_folder in day_folders:
+        session = load_session(day_folder, date_str, verbose=False)
+        roundtrips.extend(session['roundtrips'])
+        print(f"{date_str}: {sum(1 for rt in session['roundtrips'] if rt['complete'])} trades")
+    
+    label, _ = multi_day_output(day_folders)
+    model = calibrate_slippage_model(roundtrips, source=label)
+    if not model:
+        print("Error: No trades with logged slippage")
+        sys.exit(1)
+    
+    model_path = os.path.join(os.path.dirname(os.path.normpath(day_folders[0][1])), SLIPPAGE_MODEL_FILENAME)
+    save_slippage_model(model_path, model)
+    print("")
+    for line in format_slippage_model_lines(model):
+        print(line)
+    print(f"\nSlippage model saved to: {model_path}")
+
+
+def run_fidelity_mode(folder_path):
+    """Score the exit simulator against the logged closes of every dated folder."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    horizon_arg = get_arg_value('--horizon')
+    horizon = timedelta(minutes=int(horizon_arg)) if horizon_arg else None
+    backend = get_arg_value('--backend', ENRICH_BACKEND)
+    workers = int(get_arg_value('--workers', 0)) or None
+    
+    # One day per work item: parsing dominates, so --backend process runs days in parallel
+    day_results = map_chunks(functools.partial(score_day_folders, horizon=horizon), day_folders,
+                             backend=backend, workers=workers, chunk_size=1)
+    for day in day_results:
+        skipped = sum(day['skipped'].values())
+        print(f"{day['date']}: {len(day['records'])} trades scored" + (f", {skipped} skipped" if skipped else ""))
+    
+    summary = summarize_fidelity(day_results)
+    label, output_path = multi_day_output(day_folders)
+    lines = []
+    lines.append("=" * 90)
+    lines.append(f"SIMULATION FIDELITY - {label}")
+    lines.append("=" * 90)
+    lines.append("")
+    lines.extend(format_fidelity_lines(summary, f"{horizon_arg} min" if horizon_arg else "to end of session"))
+    
+    report_file = os.path.join(output_path, f"Simulation_Fidelity_{label}.txt")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    print(f"\nSimulation fidelity report saved to: {report_file}")
+
+
+def get_strategy_overrides():
+    """--set name=value pairs (repeatable) as a dict; values are JSON, else plain strings."""
+    overrides = {}
+    for idx, arg in enumerate(sys.argv[:-1]):
+        if arg != '--set':
+            continue
+        name, sep, value = sys.argv[idx + 1].partition('=')
+        if not sep:
+            raise ValueError(f"--set expects name=value (got '{sys.argv[idx + 1]}')")
+        try:
+            overrides[name] = json.loads(value)
+        except ValueError:
+            overrides[name] = value
+    return overrides
+
+
+def run_emulate_mode(folder_path):
+    """Replay every dated folder's bars through the strategy emulator."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    try:
+        params = strategy_params(get_strategy_overrides())
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    backend = get_arg_value('--backend', ENRICH_BACKEND)
+    workers = int(get_arg_value('--workers', 0)) or None
+    day_results = map_chunks(functools.partial(emulate_day_folders, params=params), day_folders,
+                             backend=backend, workers=workers, chunk_size=1)
+    for day in day_results:
+        trades = sum(1 for rt in day['roundtrips'] if rt['complete'])
+        print(f"{day['date']}: {len(day['signals'])} signals, {trades} trades ({day['bars']} bars)")
+    
+    if '--reports' in sys.argv:
+        folders = dict(day_folders)
+        for day in day_results:
+            date_str = day['date']
+            bars = load_bars(find_indicator_csv_files(folders[date_str]), date_str)
+            roundtrips = day['roundtrips']
+            if bars:
+                roundtrips = enrich_roundtrips_with_bar_data(roundtrips, bars, backend=backend, workers=workers,
+                                                             horizon=timedelta(minutes=get_horizon_minutes()))
+            report = generate_report(roundtrips, day['signals'], date_str, folders[date_str], bars)
+            dt = datetime.strptime(date_str, "%Y-%m-%d")
+            report_file = os.path.join(folders[date_str], f"{dt.strftime('%b')}{dt.day:02d}_Emulated_Analysis.txt")
+            with open(report_file, 'w', encoding='utf-8') as f:
+                f.write(report)
+            print(f"  Emulated report saved to: {report_file}")
+    
+    label, output_path = multi_day_output(day_folders)
+    lines = []
+    lines.append("=" * 90)
+    lines.append(f"STRATEGY EMULATION - {label}")
+    lines.append("=" * 90)
+    lines.append("")
+    lines.extend(format_emulation_lines(day_results, params))
+    
+    report_file = os.path.join(output_path, f"Emulation_{label}.txt")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    print(f"\nEmulation summary saved to: {report_file}")
+
+
+def run_signal_sweep_mode(folder_path):
+    """Sweep the entry settings (confluence, square window, cooldown) over dated folders' bars."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    try:
+        params = strategy_params(get_strategy_overrides())
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    ranges = default_signal_sweep_ranges()
+    for flag, axis in SIGNAL_SWEEP_FLAGS.items():
+        spec = get_arg_value(flag)
+        if spec:
+            ranges[axis] = parse_range_spec(spec)
+    grid = list(itertools.product(*(ranges[axis] for axis in SIGNAL_SWEEP_AXES)))
+    backend = get_arg_value('--backend', ENRICH_BACKEND)
+    workers = int(get_arg_value('--workers', 0)) or None
+    
+    print(f"Regenerating signals for {len(grid)} tuples over {len(day_folders)} day(s)")
+    day_results = map_chunks(functools.partial(sweep_day_folders, grid=grid, params=params), day_folders,
+                             backend=backend, workers=workers, chunk_size=1)
+    day_results = [day for day in day_results if day['bars']]
+    for day in day_results:
+        print(f"{day['date']}: {day['bars']} bars")
+    if not day_results:
+        print("Error: No IndicatorValues bars found")
+        sys.exit(1)
+    
+    results = merge_signal_sweep(day_results, grid)
+    days = [day['date'] for day in day_results]
+    label, output_path = multi_day_output(day_folders)
+    summary_file = os.path.join(output_path, f"Signal_Sweep_{label}.txt")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write(format_signal_sweep_summary(label, ranges, grid, results, days, params))
+    print(f"\nSignal sweep summary saved to: {summary_file}")
+
+
+def run_optimize_mode(folder_path):
+    """Run the adaptive (successive halving) exit search."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    ranges = get_sweep_ranges()
+    workers = int(get_arg_value('--workers', 0)) or None
+    budget = int(get_arg_value('--budget', OPTIMIZER_BUDGET))
+    seed = int(get_arg_value('--seed', OPTIMIZER_SEED))
+    eta = int(get_arg_value('--eta', OPTIMIZER_ETA))
+    
+    label, output_path = multi_day_output(day_folders)
+    horizon_minutes = get_horizon_minutes()
+    # Evaluations depend on the horizon: keep non-default horizons in their own log
+    suffix = f"_h{horizon_minutes}" if horizon_minutes != EXIT_HORIZON_MINUTES else ""
+    if get_arg_value('--ticks'):
+        suffix += "_ticks"
+    # Logged P&L is net of the slippage model: keep net evaluations apart from gross ones
+    slippage = load_window_slippage(day_folders)
+    if slippage:
+        suffix += f"_slip-{slippage['mode']}"
+    log_path = get_arg_value('--log') or os.path.join(output_path, f"Exit_Optimize_{label}_seed{seed}{suffix}.jsonl")
+    
+    day_windows = load_day_windows(day_folders, slippage)
+    print(f"\nAdaptive search: budget {budget}, seed {seed}, eta {eta}")
+    print(f"  Evaluation log: {log_path}")
+    
+    search = successive_halving_search(day_windows, ranges, budget=budget, seed=seed, eta=eta,
+                                       log_path=log_path, workers=workers)
+    if not search:
+        print("Error: No trades with BAR coverage to optimize over")
+        sys.exit(1)
+    
+    summary_file = os.path.join(output_path, f"Exit_Optimize_{label}.txt")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write(format_optimizer_summary(label, search, slippage_mode=slippage['mode'] if slippage else None))
+    
+    print(f"  Evaluations: {search['evaluations_used']} ({search['evaluations_replayed']} replayed from log)")
+    print(f"\nOptimizer summary saved to: {summary_file}")
+
+
+def run_walk_forward_mode(folder_path):
+    """Run walk-forward evaluation over dated folders."""
+    day_folders = resolve_day_folders(folder_path)
+    if not day_folders:
+        print(f"Error: No dated analysis folders found under {folder_path}")
+        sys.exit(1)
+    
+    train_days = int(get_arg_value('--train', WALK_FORWARD_TRAIN_DAYS))
+    test_days = int(get_arg_value('--test', WALK_FORWARD_TEST_DAYS))
+    workers = int(get_arg_value('--workers', 0)) or None
+    if '--grid' in sys.argv:
+        candidates = grid_candidates(expand_sweep_grid(get_sweep_ranges()))
     else:
-        print("\nBuilding round-trips from trades_final.txt")
-        roundtrips = build_roundtrips(trades)
+        candidates = trailing_config_candidates()
+    slippage = load_window_slippage(day_folders)
+    
+    day_windows = load_day_windows(day_folders, slippage)
+    print(f"\nWalk-forward: train {train_days} day(s), test {test_days} day(s), {len(candidates)} candidate configs")
+    
+    wf = run_walk_forward(day_windows, candidates, train_days, test_days, workers=workers)
+    if not wf:
+        print(f"Error: Need at least {train_days + test_days} days with BAR coverage for one fold")
+        sys.exit(1)
     
-    complete_rts = [rt for rt in roundtrips if rt['complete']]
-    print(f"Built {len(complete_rts)} complete round-trips")
+    label, output_path = multi_day_output(day_folders)
+    report_file = os.path.join(output_path, f"Walk_Forward_{label}.txt")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write(format_walk_forward_report(label, wf, slippage_mode=slippage['mode'] if slippage else None))
     
-    # Match signals
-    roundtrips = match_signals_to_trades(roundtrips, all_signals, date_str)
+    print(f"  Folds: {len(wf['folds'])} | OOS P&L: {wf['total_oos_pnl']:+.0f}t")
+    print(f"\nWalk-forward report saved to: {report_file}")
+
+
+def run_daily_report(source_path, output_path, date_str, record=TRAIL_RECORDING, use_cache=True,
+                     backend=ENRICH_BACKEND, workers=None, horizon_minutes=EXIT_HORIZON_MINUTES,
+                     slippage_mode=SLIPPAGE_MODE):
+    """
+    Parse one session, enrich it with BAR data and write the daily report.
+    record is the trail event recording level; use_cache reuses the root
+    simulation cache; backend/workers run the enrichment; horizon_minutes
+    is the exit simulation horizon and slippage_mode the --slippage mode
+    (get_report_options reads them all from the command line).
+    Returns dict with report path, trade count, wins and P&L (ticks).
+    """
+    session = load_session(source_path, date_str)
+    roundtrips = session['roundtrips']
+    all_signals = session['signals']
+    all_bars = session['bars']
     
     # Enrich with BAR data if available
     if all_bars:
         print(f"\nEnriching round-trips with BAR data ({len(all_bars)} bars)")
-        roundtrips = enrich_roundtrips_with_bar_data(roundtrips, all_bars)
+        sim_cache = None
+        if use_cache:
+            # Shared by all dated folders: lives in the ActiveNikiAnalysis root
+            cache_path = os.path.join(os.path.dirname(os.path.normpath(output_path)), SIM_CACHE_FILENAME)
+            sim_cache = open_sim_cache(cache_path)
+        try:
+            roundtrips = enrich_roundtrips_with_bar_data(roundtrips, all_bars, sim_cache=sim_cache,
+                                                         backend=backend, workers=workers, record=record,
+                                                         horizon=timedelta(minutes=horizon_minutes))
+        finally:
+            if sim_cache is not None:
+                close_sim_cache(sim_cache)
+        if sim_cache is not None:
+            print(f"  Simulation cache: {sim_cache['hits']} reused, {sim_cache['misses']} simulated ({cache_path})")
         
         # Count trades with/without bar data
         trades_with_bars = sum(1 for rt in roundtrips if rt['complete'] and not rt.get('flip_analysis', {}).get('no_bar_data', False))
@@ -161,8 +795,17 @@ def main():
         for config in TRAILING_STOP_CONFIGS:
             print(f"  - {config['name']}: {config['description']}")
     
+    # Net-of-slippage trailing comparisons (root model, else this session's fills)
+    slippage = None
+    if all_bars and slippage_mode != 'off':
+        model_path = os.path.join(os.path.dirname(os.path.normpath(output_path)), SLIPPAGE_MODEL_FILENAME)
+        model = load_slippage_model(model_path) or calibrate_slippage_model(roundtrips)
+        if model:
+            apply_slippage_model(roundtrips, model, slippage_mode)
+            slippage = {'model': model, 'mode': slippage_mode}
+    
     # Generate report
-    report = generate_report(roundtrips, all_signals, date_str, output_path, all_bars)
+    report = generate_report(roundtrips, all_signals, date_str, output_path, all_bars, slippage=slippage)
     
     # Output file
     dt = datetime.strptime(date_str, "%Y-%m-%d")
@@ -175,6 +818,120 @@ def main():
     
     print(f"\nAnalysis saved to: {report_file}")
     print(f"  File size: {os.path.getsize(report_file)} bytes")
+    
+    complete = [rt for rt in roundtrips if rt['complete']]
+    return {
+        'report': report_file,
+        'trades': len(complete),
+        'wins': sum(1 for rt in complete if rt['pnl_ticks'] > 0),
+        'pnl_ticks': sum(rt['pnl_ticks'] for rt in complete),
+        'metric_sums': sum_metric_columns(trade_metric_columns(roundtrips))
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python main.py <folder_path> [--date YYYY-MM-DD] [--sweep ...]")
+        sys.exit(1)
+    
+    folder_path = sys.argv[1]
+    
+    backend = get_arg_value('--backend', ENRICH_BACKEND)
+    if backend not in BACKENDS:
+        print(f"Error: Unknown --backend '{backend}' (use {', '.join(BACKENDS)})")
+        sys.exit(1)
+    record = get_arg_value('--trail-details', TRAIL_RECORDING)
+    if record not in RECORDING_LEVELS:
+        print(f"Error: Unknown --trail-details '{record}' (use {', '.join(RECORDING_LEVELS)})")
+        sys.exit(1)
+    horizon = get_arg_value('--horizon', str(EXIT_HORIZON_MINUTES))
+    if not horizon.isdigit() or int(horizon) < 1:
+        print(f"Error: --horizon must be a whole number of minutes >= 1 (got '{horizon}')")
+        sys.exit(1)
+    
+    slippage_mode = get_arg_value('--slippage', SLIPPAGE_MODE)
+    if slippage_mode not in SLIPPAGE_MODES:
+        print(f"Error: Unknown --slippage '{slippage_mode}' (use {', '.join(SLIPPAGE_MODES)})")
+        sys.exit(1)
+    tick_path = get_arg_value('--ticks')
+    if tick_path and not os.path.isfile(tick_path):
+        print(f"Error: --ticks file not found: {tick_path}")
+        sys.exit(1)
+    
+    if '--sweep' in sys.argv:
+        run_sweep_mode(folder_path)
+        return
+    
+    if '--optimize' in sys.argv:
+        run_optimize_mode(folder_path)
+        return
+    
+    if '--walk-forward' in sys.argv:
+        run_walk_forward_mode(folder_path)
+        return
+    
+    if '--batch' in sys.argv:
+        run_batch_mode(folder_path)
+        return
+    
+    if '--indicators' in sys.argv:
+        run_indicators_mode(folder_path)
+        return
+    
+    if '--scale-out' in sys.argv:
+        run_scale_out_mode(folder_path)
+        return
+    
+    if '--calibrate-slippage' in sys.argv:
+        run_calibrate_slippage_mode(folder_path)
+        return
+    
+    if '--fidelity' in sys.argv:
+        run_fidelity_mode(folder_path)
+        return
+    
+    if '--emulate' in sys.argv:
+        run_emulate_mode(folder_path)
+        return
+    
+    if '--signal-sweep' in sys.argv:
+        run_signal_sweep_mode(folder_path)
+        return
+    
+    # Get date from argument or folder name
+    date_str = None
+    if '--date' in sys.argv:
+        idx = sys.argv.index('--date')
+        if idx + 1 < len(sys.argv):
+            date_str = sys.argv[idx + 1]
+    
+    if not date_str:
+        folder_name = os.path.basename(folder_path.rstrip('/\\'))
+        # Handle both YYYY-MM-DD and YYYY-MM-DD_local formats
+        match = re.match(r'(\d{4}-\d{2}-\d{2})', folder_name)
+        if match:
+            date_str = match.group(1)
+        else:
+            print("Error: Could not determine date. Use --date YYYY-MM-DD")
+            sys.exit(1)
+    
+    # Resolve paths:
+    # - If folder_path is the raw log root, source files live there and output
+    #   goes into <log_root>/ActiveNikiAnalysis/<date>/
+    # - If folder_path is already a dated analysis subfolder, keep existing behaviour
+    analysis_subfolder = os.path.join('ActiveNikiAnalysis', date_str)
+    if os.path.basename(os.path.normpath(folder_path)) == date_str or        'ActiveNikiAnalysis' in folder_path:
+        # Already a dated/analysis folder — use as-is
+        source_path = folder_path
+        output_path = folder_path
+    else:
+        # Log root passed — search files here, write output to analysis subfolder
+        source_path = folder_path
+        output_path = os.path.join(folder_path, 'ActiveNikiAnalysis', date_str)
+        os.makedirs(output_path, exist_ok=True)
+        print(f"Output folder: {output_path}")
+
+    run_daily_report(source_path, output_path, date_str, **get_report_options())
 
 
 if __name__ == '__main__':
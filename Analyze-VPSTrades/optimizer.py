@@ -0,0 +1,292 @@
+"""
+Adaptive exit-parameter search (successive halving over day subsets).
+Starts from the TRAILING_STOP_CONFIGS entries plus seeded random grid
+points, evaluates them on a growing subset of days, keeps the best 1/eta
+each rung, then hill-climbs around the survivors on all days.
+
+Every (config, day) evaluation is appended to a JSONL log; re-running with
+the same seed and log replays the logged points and resumes the search.
+P&L is net of the trade windows' slippage cost when they carry one
+(slippage.apply_window_slippage), so configs are ranked net.
+"""
+
+import os
+import json
+import random
+
+from config import (
+    TRAILING_STOP_CONFIGS, DEFAULT_SL_TICKS, DEFAULT_TP_TICKS,
+    OPTIMIZER_BUDGET, OPTIMIZER_SEED, OPTIMIZER_ETA, TICK_VALUE
+)
+from sweep import SWEEP_AXES, run_sweep, slippage_note
+
+# Share of the budget spent on the halving rungs; the rest goes to refinement
+HALVING_BUDGET_SHARE = 0.7
+
+
+def load_evaluation_log(log_path):
+    """Load logged evaluations into {(combo, day): result}."""
+    evaluations = {}
+    if not log_path or not os.path.exists(log_path):
+        return evaluations
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Partial last line from an interrupted run
+                continue
+            evaluations[(tuple(entry['combo']), entry['day'])] = entry
+    return evaluations
+
+
+def new_evaluator(day_windows, budget, log_path=None, workers=None):
+    """Budgeted (combo, day) evaluation state backed by the JSONL log."""
+    return {
+        'day_windows': day_windows,
+        'budget': budget,
+        'used': 0,
+        'replayed': 0,
+        'workers': workers,
+        'log_path': log_path,
+        'cache': load_evaluation_log(log_path),
+        'charged': set()
+    }
+
+
+def remaining_budget(evaluator):
+    return evaluator['budget'] - evaluator['used']
+
+
+def evaluate_combos(evaluator, combos, days):
+    """
+    Evaluate combos on days (skipping logged pairs), charging the budget.
+    Returns {combo: total P&L over days} for combos fully evaluated;
+    combos cut off by the budget are omitted.
+    """
+    cache = evaluator['cache']
+    charged = evaluator['charged']
+    pending = {}
+    for combo in combos:
+        for day in days:
+            key = (combo, day)
+            if key not in cache:
+                pending.setdefault(day, []).append(combo)
+            elif key not in charged:
+                # Logged pairs still count, so a resumed run follows the same path
+                charged.add(key)
+                evaluator['used'] += 1
+                evaluator['replayed'] += 1
+
+    for day in days:
+        day_combos = pending.get(day, [])[:max(0, remaining_budget(evaluator))]
+        if not day_combos:
+            continue
+        results = run_sweep(evaluator['day_windows'][day], day_combos, workers=evaluator['workers'])
+        log_file = open(evaluator['log_path'], 'a', encoding='utf-8') if evaluator['log_path'] else None
+        try:
+            for combo, result in zip(day_combos, results):
+                entry = {
+                    'combo': list(combo),
+                    'day': day,
+                    'pnl': result['total_pnl'],
+                    'slippage': result['slippage'],
+                    'trades': result['trades'],
+                    'wins': result['wins'],
+                    'exits': result['exits']
+                }
+                cache[(combo, day)] = entry
+                charged.add((combo, day))
+                evaluator['used'] += 1
+                if log_file:
+                    log_file.write(json.dumps(entry) + "\n")
+        finally:
+            if log_file:
+                log_file.close()
+
+    scores = {}
+    for combo in combos:
+        entries = [cache.get((combo, day)) for day in days]
+        if all(entries):
+            scores[combo] = sum(e['pnl'] for e in entries)
+    return scores
+
+
+def summarize_combo(evaluator, combo, days):
+    """Aggregate logged results of combo over days."""
+    entries = [evaluator['cache'][(combo, day)] for day in days]
+    exits = {}
+    for e in entries:
+        for exit_type, count in e['exits'].items():
+            exits[exit_type] = exits.get(exit_type, 0) + count
+    return {
+        'combo': combo,
+        'total_pnl': sum(e['pnl'] for e in entries),
+        'slippage': sum(e.get('slippage', 0.0) for e in entries),
+        'trades': sum(e['trades'] for e in entries),
+        'wins': sum(e['wins'] for e in entries),
+        'exits': exits
+    }
+
+
+def seed_candidates():
+    """Starting points from TRAILING_STOP_CONFIGS at the default SL/TP."""
+    return [
+        (DEFAULT_SL_TICKS, DEFAULT_TP_TICKS, c['activation_ticks'], c['trail_distance_ticks'])
+        for c in TRAILING_STOP_CONFIGS
+    ]
+
+
+def neighbors(combo, ranges):
+    """Grid points one step away on each axis (values outside ranges are snapped)."""
+    result = []
+    for axis_idx, axis in enumerate(SWEEP_AXES):
+        values = ranges[axis]
+        current = combo[axis_idx]
+        # Nearest grid position (seed configs may sit between grid points)
+        pos = min(range(len(values)), key=lambda i: abs(values[i] - current))
+        for step in (-1, 1):
+            j = pos + step
+            if 0 <= j < len(values) and values[j] != current:
+                candidate = list(combo)
+                candidate[axis_idx] = values[j]
+                result.append(tuple(candidate))
+    return result
+
+
+def successive_halving_search(day_windows, ranges, budget=OPTIMIZER_BUDGET, seed=OPTIMIZER_SEED,
+                              eta=OPTIMIZER_ETA, log_path=None, workers=None):
+    """
+    Run the adaptive search.
+
+    day_windows: {date_str: trade windows from sweep.build_trade_windows}
+    ranges: per-axis value lists (the search space)
+    budget: max number of (config, day) evaluations, including replayed ones
+
+    Returns dict with ranked full-day results, rung history, evaluations
+    used/replayed and the size of the equivalent full grid.
+    """
+    rng = random.Random(seed)
+    days = sorted(day for day, windows in day_windows.items() if windows)
+    if not days:
+        return None
+    day_order = days[:]
+    rng.shuffle(day_order)
+
+    evaluator = new_evaluator(day_windows, budget, log_path=log_path, workers=workers)
+
+    # Rung sizes: 1, eta, eta^2, ... days, ending with all days
+    rung_days = []
+    d = len(days)
+    while d > 1:
+        rung_days.append(d)
+        d = -(-d // eta)
+    rung_days.append(d)
+    rung_days.reverse()
+
+    # Every rung costs ~n0 * rung_days[0] evaluations
+    n_initial = int(budget * HALVING_BUDGET_SHARE / (rung_days[0] * len(rung_days)))
+    candidates = list(dict.fromkeys(seed_candidates()))
+    grid_size = 1
+    for axis in SWEEP_AXES:
+        grid_size *= len(ranges[axis])
+    n_initial = max(len(candidates), min(n_initial, grid_size + len(candidates)))
+    seen = set(candidates)
+    attempts = 0
+    while len(candidates) < n_initial and attempts < n_initial * 20:
+        attempts += 1
+        combo = tuple(rng.choice(ranges[axis]) for axis in SWEEP_AXES)
+        if combo not in seen:
+            seen.add(combo)
+            candidates.append(combo)
+
+    history = []
+    for n_days in rung_days:
+        if remaining_budget(evaluator) <= 0:
+            break
+        subset = day_order[:n_days]
+        scores = evaluate_combos(evaluator, candidates, subset)
+        ranked = sorted(scores, key=lambda c: scores[c], reverse=True)
+        history.append({'days': n_days, 'evaluated': len(ranked), 'best': ranked[0] if ranked else None,
+                        'best_pnl': scores[ranked[0]] if ranked else 0})
+        if n_days == len(days):
+            candidates = ranked
+            break
+        candidates = ranked[:max(1, -(-len(ranked) // eta))]
+
+    # Hill-climb around survivors on all days with the remaining budget
+    full_scores = evaluate_combos(evaluator, candidates, days) if remaining_budget(evaluator) > 0 else {}
+    frontier = sorted(full_scores, key=lambda c: full_scores[c], reverse=True)[:eta]
+    visited = set(full_scores)
+    refinement_steps = 0
+    while frontier and remaining_budget(evaluator) >= len(days):
+        current = frontier.pop(0)
+        fresh = [c for c in neighbors(current, ranges) if c not in visited]
+        visited.update(fresh)
+        if not fresh:
+            continue
+        scores = evaluate_combos(evaluator, fresh, days)
+        refinement_steps += 1
+        full_scores.update(scores)
+        improved = [c for c in scores if scores[c] > full_scores[current]]
+        frontier.extend(sorted(improved, key=lambda c: scores[c], reverse=True))
+
+    ranked = sorted(full_scores, key=lambda c: full_scores[c], reverse=True)
+    return {
+        'days': days,
+        'results': [summarize_combo(evaluator, combo, days) for combo in ranked],
+        'history': history,
+        'refinement_steps': refinement_steps,
+        'evaluations_used': evaluator['used'],
+        'evaluations_replayed': evaluator['replayed'],
+        'budget': budget,
+        'seed': seed,
+        'grid_evaluations': grid_size * len(days)
+    }
+
+
+def format_optimizer_summary(label, search, top_n=15, slippage_mode=None):
+    """Text summary of an adaptive search run (slippage_mode: model the P&L is net of)."""
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"ADAPTIVE EXIT SEARCH (SUCCESSIVE HALVING) - {label}")
+    lines.append("=" * 100)
+    lines.append("")
+    lines.append(f"Days: {len(search['days'])} | Seed: {search['seed']} | Budget: {search['budget']} (config, day) evaluations")
+    used = search['evaluations_used']
+    grid = search['grid_evaluations']
+    pct = used / grid * 100 if grid else 0
+    lines.append(f"Evaluations used: {used} ({search['evaluations_replayed']} replayed from log) "
+                 f"vs {grid} for the full grid ({pct:.1f}%)")
+    lines.append(slippage_note(slippage_mode))
+    lines.append("")
+
+    lines.append("HALVING RUNGS")
+    lines.append("-" * 60)
+    for rung in search['history']:
+        best = rung['best']
+        best_str = f"SL{best[0]}/TP{best[1]}/Act{best[2]}/Trail{best[3]}" if best else "---"
+        lines.append(f"  {rung['days']:>3} day(s): {rung['evaluated']:>5} configs | best {best_str} {rung['best_pnl']:+.0f}t")
+    lines.append(f"  Refinement steps on all days: {search['refinement_steps']}")
+    lines.append("")
+
+    lines.append(f"TOP {min(top_n, len(search['results']))} CONFIGS (all days)")
+    lines.append("-" * 100)
+    slip_header = f" {'Slip':>7}" if slippage_mode else ""
+    lines.append(f"{'Rank':>4} {'SL':>5} {'TP':>5} {'Act':>5} {'Trail':>6} {'Trades':>7} {'Win%':>6} {'P&L':>10} {'$':>11}{slip_header}")
+    lines.append("-" * 100)
+    for rank, r in enumerate(search['results'][:top_n], 1):
+        sl, tp, act, trail = r['combo']
+        wr = r['wins'] / r['trades'] * 100 if r['trades'] else 0
+        slip_str = f" {-r['slippage']:>+6.0f}t" if slippage_mode else ""
+        lines.append(
+            f"{rank:>4} {sl:>5} {tp:>5} {act:>5} {trail:>6} {r['trades']:>7} {wr:>5.0f}% "
+            f"{r['total_pnl']:>+9.0f}t {r['total_pnl'] * TICK_VALUE:>+11.2f}{slip_str}"
+        )
+    lines.append("-" * 100)
+    lines.append("")
+    lines.append("=" * 100)
+    return "\n".join(lines)
@@ -0,0 +1,189 @@
+"""
+Overfitting diagnostics for "pick the best config" results.
+Works on a rows x configs P&L matrix (rows = trades or days):
+- CSCV (combinatorially symmetric cross-validation) and the probability
+  of backtest overfitting (PBO), per Bailey, Borwein, Lopez de Prado & Zhu
+- Deflated Sharpe ratio of the best config, per Bailey & Lopez de Prado
+
+Row blocks are collapsed to per-config block sums once, so every IS/OOS
+split costs O(configs) regardless of how many rows the matrix has.
+"""
+
+import math
+import itertools
+from statistics import NormalDist
+
+from config import CSCV_BLOCKS
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def build_block_sums(matrix, n_blocks):
+    """Split rows into n_blocks contiguous blocks; return per-block column sums."""
+    rows = len(matrix)
+    bounds = [round(i * rows / n_blocks) for i in range(n_blocks + 1)]
+    return [
+        [sum(col) for col in zip(*matrix[bounds[i]:bounds[i + 1]])]
+        for i in range(n_blocks)
+    ]
+
+
+def cscv_pbo(matrix, n_blocks=CSCV_BLOCKS):
+    """
+    Run CSCV over a rows x configs P&L matrix.
+
+    Every way of choosing half the row blocks as in-sample is evaluated:
+    the best in-sample config's out-of-sample rank among all configs is
+    mapped to a logit (ties get the average rank). PBO is the share of
+    splits where that logit <= 0, i.e. the in-sample winner lands in the
+    bottom half out-of-sample. Tied splits, where the winner ties other
+    configs out-of-sample and their average rank is exactly the median
+    (e.g. every config ties, as trailing configs do on trades that never
+    reach activation), say nothing either way: they are left out of PBO
+    and counted as tied_share. PBO is None when every split is tied.
+
+    Returns None when there are fewer than 2 configs or 2 rows.
+    """
+    rows = len(matrix)
+    configs = len(matrix[0]) if rows else 0
+    n_blocks = min(n_blocks, rows - rows % 2)
+    if configs < 2 or n_blocks < 2:
+        return None
+
+    blocks = build_block_sums(matrix, n_blocks)
+    totals = [sum(col) for col in zip(*blocks)]
+
+    logits = []
+    tied = []
+    oos_best = []
+    is_best = []
+    for in_blocks in itertools.combinations(range(n_blocks), n_blocks // 2):
+        in_sample = [sum(col) for col in zip(*(blocks[b] for b in in_blocks))]
+        best = max(range(configs), key=in_sample.__getitem__)
+        best_oos = totals[best] - in_sample[best]
+        below = 0
+        equal = 0
+        for total, ins in zip(totals, in_sample):
+            oos = total - ins
+            if oos < best_oos:
+                below += 1
+            elif oos == best_oos:
+                equal += 1
+        # Average rank (1..N) of the IS winner among OOS results, ties split
+        rank = below + (equal + 1) / 2
+        tied.append(equal > 1 and 2 * below + equal == configs)
+        omega = rank / (configs + 1)
+        logits.append(math.log(omega / (1 - omega)))
+        oos_best.append(best_oos)
+        is_best.append(in_sample[best])
+
+    splits = len(logits)
+    ordered = sorted(logits)
+    return {
+        'rows': rows,
+        'configs': configs,
+        'blocks': n_blocks,
+        'splits': splits,
+        'pbo': (sum(1 for v, t in zip(logits, tied) if v <= 0 and not t) / (splits - sum(tied))
+                if not all(tied) else None),
+        'tied_share': sum(tied) / splits,
+        'median_logit': ordered[splits // 2] if splits % 2 else (ordered[splits // 2 - 1] + ordered[splits // 2]) / 2,
+        'prob_oos_loss': sum(1 for v in oos_best if v < 0) / splits,
+        'avg_is_best': sum(is_best) / splits,
+        'avg_oos_best': sum(oos_best) / splits
+    }
+
+
+def _moments(values):
+    """Mean, sample std, skewness and (non-excess) kurtosis."""
+    n = len(values)
+    mean = sum(values) / n
+    dev = [v - mean for v in values]
+    m2 = sum(d * d for d in dev) / n
+    if m2 == 0:
+        return mean, 0.0, 0.0, 3.0
+    m3 = sum(d ** 3 for d in dev) / n
+    m4 = sum(d ** 4 for d in dev) / n
+    std = math.sqrt(m2 * n / (n - 1)) if n > 1 else 0.0
+    return mean, std, m3 / m2 ** 1.5, m4 / m2 ** 2
+
+
+def deflated_best_sharpe(matrix):
+    """
+    Deflated Sharpe ratio of the best config (highest total P&L, the
+    same pick the report recommends).
+
+    The best Sharpe is compared with the Sharpe expected from the best of
+    N unskilled trials (N = number of configs, an upper bound since the
+    configs are correlated). Returns dict with the best column index, its
+    Sharpe, the expected max Sharpe under the null and the deflated
+    probability (> 0.95 suggests real edge), or None for < 3 rows.
+    """
+    rows = len(matrix)
+    if rows < 3 or not matrix[0]:
+        return None
+    columns = list(zip(*matrix))
+    trials = len(columns)
+
+    sharpes = []
+    totals = []
+    for col in columns:
+        mean, std, _, _ = _moments(col)
+        sharpes.append(mean / std if std > 0 else 0.0)
+        totals.append(sum(col))
+    best = max(range(trials), key=totals.__getitem__)
+    best_sharpe = sharpes[best]
+
+    normal = NormalDist()
+    if trials > 1:
+        sr_mean = sum(sharpes) / trials
+        sr_var = sum((s - sr_mean) ** 2 for s in sharpes) / (trials - 1)
+        expected_max = math.sqrt(sr_var) * (
+            (1 - EULER_GAMMA) * normal.inv_cdf(1 - 1 / trials)
+            + EULER_GAMMA * normal.inv_cdf(1 - 1 / (trials * math.e))
+        )
+    else:
+        expected_max = 0.0
+
+    _, _, skew, kurt = _moments(columns[best])
+    denom = 1 - skew * best_sharpe + (kurt - 1) / 4 * best_sharpe ** 2
+    if denom <= 0:
+        deflated = 0.0
+    else:
+        deflated = normal.cdf((best_sharpe - expected_max) * math.sqrt(rows - 1) / math.sqrt(denom))
+
+    return {
+        'best_index': best,
+        'sharpe': best_sharpe,
+        'expected_max_sharpe': expected_max,
+        'deflated_sharpe': deflated,
+        'trials': trials,
+        'rows': rows
+    }
+
+
+def format_overfit_lines(cscv, deflated, best_name, row_label):
+    """Report lines for CSCV/PBO and deflated Sharpe results."""
+    lines = []
+    if cscv:
+        lines.append(f"  CSCV: {cscv['rows']} {row_label} x {cscv['configs']} configs, "
+                     f"{cscv['blocks']} blocks, {cscv['splits']} IS/OOS splits")
+        pbo = f"{cscv['pbo'] * 100:.0f}%" if cscv['pbo'] is not None else "n/a"
+        tied = f" ({cscv['tied_share'] * 100:.0f}% of splits tied, left out)" if cscv['tied_share'] else ""
+        lines.append(f"  Probability of backtest overfitting (PBO): {pbo}{tied}")
+        lines.append(f"  IS winner OOS: median logit {cscv['median_logit']:+.2f}, "
+                     f"loses money in {cscv['prob_oos_loss'] * 100:.0f}% of splits "
+                     f"(avg IS {cscv['avg_is_best']:+.0f}t -> OOS {cscv['avg_oos_best']:+.0f}t)")
+    if deflated:
+        lines.append(f"  Deflated Sharpe of best config ({best_name}): {deflated['deflated_sharpe']:.2f} "
+                     f"(SR {deflated['sharpe']:.2f}/{row_label[:-1]} vs {deflated['expected_max_sharpe']:.2f} "
+                     f"expected best of {deflated['trials']} trials)")
+    if cscv or deflated:
+        if cscv and cscv['pbo'] is not None and cscv['pbo'] >= 0.5:
+            verdict = "best config is likely a selection-bias artifact"
+        elif deflated and deflated['deflated_sharpe'] < 0.95:
+            verdict = "edge of best config is not significant after deflation"
+        else:
+            verdict = "best config survives overfitting checks"
+        lines.append(f"  → {verdict}")
+    return lines
@@ -380,6 +380,78 @@ def parse_trader_signals(filepath, date_str):
     return signals
 
 
+def new_trader_header():
+    """Empty live-settings dict filled by parse_trader_header_line."""
+    return {'sl_usd': None, 'tp_usd': None, 'sl_buffer_ticks': 0,
+            'trail_mode': None, 'trail_activation_ticks': None, 'trail_distance_ticks': None}
+
+
+def parse_trader_header_line(line, header):
+    """
+    Update header in place from an ActiveNikiTrader startup line:
+        ActiveNikiTrader | 7-indicator confluence | ... | SL=$300 TP=$600 | AutoTrade=True
+        SL Buffer: 2 ticks
+        📈 Trailing Stop: TICK-BASED | Activate=80t | Distance=30t
+        📈 Trailing Stop: ATR-BASED | Period=14 | Activate=2×ATR | Distance=1.5×ATR
+    The SL Buffer and Trailing Stop lines are only logged when enabled, so
+    the main line resets them. Returns True if the line was a header line.
+    """
+    main_match = re.search(r'ActiveNikiTrader \| .*SL=\$(\d+\.?\d*) TP=\$(\d+\.?\d*)', line)
+    if main_match:
+        header.update(new_trader_header())
+        header['sl_usd'] = float(main_match.group(1))
+        header['tp_usd'] = float(main_match.group(2))
+        return True
+    
+    buffer_match = re.search(r'SL Buffer: (\d+) ticks', line)
+    if buffer_match:
+        header['sl_buffer_ticks'] = int(buffer_match.group(1))
+        return True
+    
+    trail_match = re.search(r'Trailing Stop: TICK-BASED \| Activate=(\d+)t \| Distance=(\d+)t', line)
+    if trail_match:
+        header['trail_mode'] = 'TICK'
+        header['trail_activation_ticks'] = int(trail_match.group(1))
+        header['trail_distance_ticks'] = int(trail_match.group(2))
+        return True
+    
+    if 'Trailing Stop: ATR-BASED' in line:
+        header['trail_mode'] = 'ATR'
+        return True
+    return False
+
+
+def parse_order_exit_params(line, header):
+    """
+    Live exit parameters of one ORDER PLACED line:
+        >>> ORDER PLACED: LONG @ Market | Signal=25914.00 | SL=60.00pts (+2t buffer) TP=120.00pts [TRAIL]
+    The stop is placed at SL points + buffer ticks from the fill. The [TRAIL]
+    / [TRAIL-ATR] / [DYNAMIC] suffix gives the exit mode; lines without one
+    (older logs) take the trailing mode from the header.
+    
+    Returns dict with sl_ticks, tp_ticks, trail_mode ('TICK', 'ATR',
+    'DYNAMIC' or None), activation_ticks, trail_distance_ticks - or None.
+    """
+    match = re.search(r'SL=(\d+\.?\d*)pts(?:\s*\(\+(\d+)t buffer\))?\s*TP=(\d+\.?\d*)pts\s*(?:\[([\w-]+)\])?', line)
+    if not match:
+        return None
+    
+    buffer_ticks = int(match.group(2)) if match.group(2) else header['sl_buffer_ticks']
+    suffix = match.group(4)
+    if suffix is None:
+        trail_mode = header['trail_mode']
+    else:
+        trail_mode = {'TRAIL': 'TICK', 'TRAIL-ATR': 'ATR', 'DYNAMIC': 'DYNAMIC'}.get(suffix)
+    tick_trail = trail_mode == 'TICK'
+    return {
+        'sl_ticks': round(float(match.group(1)) / TICK_SIZE) + buffer_ticks,
+        'tp_ticks': round(float(match.group(3)) / TICK_SIZE),
+        'trail_mode': trail_mode,
+        'activation_ticks': header['trail_activation_ticks'] if tick_trail else None,
+        'trail_distance_ticks': header['trail_distance_ticks'] if tick_trail else None
+    }
+
+
 def parse_trader_orders_and_closes(filepath, date_str):
     """
     Parse ActiveNikiTrader log for order placements and trade closes.
@@ -391,6 +463,11 @@ def parse_trader_orders_and_closes(filepath, date_str):
         ✅ TRADE CLOSED: P&L $600.00 | Daily P&L: $600.00 (1 trades)
         ❌ TRADE CLOSED: P&L $-185.00 | Daily P&L: $415.00 (2 trades)
     
+    Each order also gets 'exit_params': the live SL/TP in ticks (SL
+    includes the buffer) from the ORDER PLACED line, plus the trailing
+    stop settings from the most recent strategy header (see
+    parse_trader_header_line). None when the line carries no SL/TP.
+    
     Returns tuple: (orders, closes)
     """
     orders = []
@@ -408,8 +485,12 @@ def parse_trader_orders_and_closes(filepath, date_str):
     current_signal_direction = None
     current_signal_price = 0
     
+    # Live exit settings from the strategy header (re-logged on every start)
+    header = new_trader_header()
+    
     for i, line in enumerate(lines):
         line_stripped = line.strip()
+        parse_trader_header_line(line_stripped, header)
         
         # Track signal context (for associating orders with signals)
         # Try NEW format with date first
@@ -455,7 +536,8 @@ def parse_trader_orders_and_closes(filepath, date_str):
                     'direction': direction,
                     'price': current_signal_price,
                     'action': 'Buy' if direction == 'LONG' else 'Sell',
-                    'is_close': False
+                    'is_close': False,
+                    'exit_params': parse_order_exit_params(line_stripped, header)
                 })
         
         # Parse ENTRY FILLED with slippage
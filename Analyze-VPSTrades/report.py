@@ -7,12 +7,20 @@ import re
 from datetime import datetime
 from collections import defaultdict
 
-from config import TICK_VALUE, TICK_SIZE
+from config import (
+    TICK_VALUE, TICK_SIZE, TIME_STOP_REPORT_MINUTES, TIME_STOP_MAX_MINUTES, SCALE_OUT_CONFIGS
+)
 from analysis import (
     analyze_confluence_effectiveness, analyze_trigger_effectiveness,
     analyze_indicator_correlation, analyze_adverse_flips,
-    analyze_early_exit_impact, analyze_trailing_stop_impact
+    analyze_early_exit_impact, analyze_trailing_stop_impact,
+    analyze_excursions, analyze_trailing_overfitting, analyze_exit_rules,
+    analyze_confluence_thresholds, analyze_time_stops
 )
+from overfit import format_overfit_lines
+from whipsaw import analyze_indicator_behavior, format_indicator_behavior_lines
+from slippage import format_slippage_model_lines
+from bootstrap import bootstrap_metrics, trade_metric_columns, format_bootstrap_lines, WIN_RATE_RATIO
 
 
 def find_previous_analyses(folder_path, current_date_str):
@@ -114,8 +122,12 @@ def parse_analysis_file(filepath, date_str):
         return None
 
 
-def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
-    """Generate the trading analysis report."""
+def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None, slippage=None):
+    """
+    Generate the trading analysis report.
+    slippage: {'model', 'mode'} applied by slippage.apply_slippage_model,
+    shown as net-of-cost trailing comparisons (None = gross only).
+    """
     
     # Filter complete round-trips
     complete_rts = [rt for rt in roundtrips if rt['complete']]
@@ -154,9 +166,29 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
     # Adverse flip analysis (if BAR data available)
     adverse_flip_stats = analyze_adverse_flips(roundtrips) if bars else {}
     early_exit_analysis = analyze_early_exit_impact(roundtrips) if bars else None
+    threshold_stats = analyze_confluence_thresholds(roundtrips) if bars else None
     
     # Trailing stop analysis (if BAR data available)
     trailing_stop_analysis = analyze_trailing_stop_impact(roundtrips) if bars else None
+    scale_out_analysis = analyze_trailing_stop_impact(
+        roundtrips, 'scale_out_analysis', SCALE_OUT_CONFIGS
+    ) if bars else None
+    
+    # Selection-bias diagnostics over the trailing configs
+    overfit_stats = analyze_trailing_overfitting(trailing_stop_analysis) if trailing_stop_analysis else None
+    
+    # Exit rule comparison (if BAR data available)
+    exit_rule_stats = analyze_exit_rules(roundtrips) if bars else None
+    time_stop_stats = analyze_time_stops(roundtrips) if bars else None
+    
+    # MAE/MFE excursion analysis (if BAR data available)
+    excursion_stats = analyze_excursions(roundtrips) if bars else None
+    
+    # Indicator flip/dwell/whipsaw behaviour over the session's bars
+    indicator_behavior = analyze_indicator_behavior(bars) if bars else None
+    
+    # Bootstrap intervals for the totals above (round-trips resampled)
+    bootstrap_stats = bootstrap_metrics(trade_metric_columns(roundtrips), WIN_RATE_RATIO) if total_trades > 1 else None
     
     # Best/worst trades
     sorted_by_pnl = sorted(complete_rts, key=lambda x: x['pnl_ticks'], reverse=True)
@@ -335,6 +367,21 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
         lines.append("-" * 70)
         lines.append("")
         
+        # === CONFLUENCE THRESHOLD SWEEP ===
+        if threshold_stats:
+            lines.append("CONFLUENCE DROP THRESHOLD SWEEP (exit at first bar with confluence < k)")
+            lines.append("-" * 70)
+            lines.append(f"{'Threshold':<12} {'Trades':>7} {'Drops':>7} {'Better':>7} {'Worse':>7} {'Total P&L':>11} {'NET':>10}")
+            lines.append("-" * 70)
+            for k, r in threshold_stats.items():
+                lines.append(
+                    f"{'Conf < ' + str(k):<12} {r['trades_analyzed']:>7} {r['trades_with_drop']:>7} {r['better']:>7} "
+                    f"{r['worse']:>7} {r['total_hypo_pnl']:>+10.0f}t {r['total_difference_ticks']:>+9.0f}t"
+                )
+            lines.append("-" * 70)
+            lines.append("  Trades without a drop keep their actual P&L.")
+            lines.append("")
+        
         # === DETAILED BREAKDOWN: CONFLUENCE DROP ===
         if conf_ea and conf_ea['trades_analyzed'] > 0:
             lines.append("STRATEGY 2: CONFLUENCE DROP BELOW 6")
@@ -415,9 +462,46 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
                 f"{ts['trades_worse']:>7} {ts['trades_same']:>6} {actual_str:>10} {trail_str:>10} {net_str:>10}"
             )
         
+        # Scale-out configs (Trail column = blended P&L per contract)
+        if scale_out_analysis:
+            for config in SCALE_OUT_CONFIGS:
+                so = scale_out_analysis['configs'][config['name']]
+                if so['trades_analyzed'] == 0:
+                    continue
+                lines.append(
+                    f"{config['name']:<25} {so['trades_analyzed']:>7} {so['trades_better']:>7} "
+                    f"{so['trades_worse']:>7} {so['trades_same']:>6} {so['total_actual_pnl']:>+10.0f}t "
+                    f"{so['total_trail_pnl']:>+10.0f}t {so['total_difference_ticks']:>+10.0f}t"
+                )
+        
         lines.append("-" * 90)
+        if scale_out_analysis:
+            lines.append("Scale-out rows: Trail = blended P&L per contract (see SCALE-OUT below)")
         lines.append("")
         
+        # Same comparison net of modelled slippage (actual P&L already includes real fills)
+        if slippage:
+            net_rows = [(name, ts) for name, ts in sorted(trailing_stop_analysis['configs'].items())]
+            if scale_out_analysis:
+                net_rows += [(config['name'], scale_out_analysis['configs'][config['name']])
+                             for config in SCALE_OUT_CONFIGS]
+            net_rows = [(name, ts) for name, ts in net_rows if ts['trades_with_slippage']]
+            if net_rows:
+                lines.append(f"NET OF SLIPPAGE ({slippage['mode']})")
+                lines.append("-" * 90)
+                lines.extend(format_slippage_model_lines(slippage['model']))
+                lines.append("")
+                lines.append(f"{'Strategy':<25} {'Trades':>7} {'Trail':>10} {'Slippage':>10} {'Net':>10} {'Actual':>10} {'NET':>10}")
+                lines.append("-" * 90)
+                for name, ts in net_rows:
+                    lines.append(
+                        f"{name:<25} {ts['trades_with_slippage']:>7} {ts['total_trail_pnl']:>+10.0f}t "
+                        f"{-ts['total_slippage_ticks']:>+10.0f}t {ts['total_trail_net_pnl']:>+10.0f}t "
+                        f"{ts['total_actual_pnl']:>+10.0f}t {ts['total_trail_net_pnl'] - ts['total_actual_pnl']:>+10.0f}t"
+                    )
+                lines.append("-" * 90)
+                lines.append("")
+        
         # Detailed breakdown for each config
         for config_name in sorted(trailing_stop_analysis['configs'].keys()):
             ts = trailing_stop_analysis['configs'][config_name]
@@ -478,6 +562,36 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
                 lines.append(f"  ... and {len(ts['trade_details']) - 30} more trades")
             lines.append("")
         
+        # Scale-out (multi-leg) configs
+        if scale_out_analysis:
+            lines.append("SCALE-OUT (MULTI-LEG) EXITS")
+            lines.append("-" * 50)
+            lines.append("  All legs share the entry; P&L is per contract (size-weighted).")
+            lines.append("")
+            for config in SCALE_OUT_CONFIGS:
+                so = scale_out_analysis['configs'][config['name']]
+                if so['trades_analyzed'] == 0:
+                    continue
+                contracts = sum(leg['size'] for leg in config['legs'])
+                lines.append(f"SCALE-OUT: {config['name']}")
+                lines.append(f"  Configuration: {config['description']}")
+                for leg in config['legs']:
+                    leg_str = f"  - {leg['size']} x SL {leg['sl_ticks']}t / TP {leg['tp_ticks']}t"
+                    if leg.get('activation_ticks') is not None:
+                        leg_str += f", trail {leg['trail_distance_ticks']}t after +{leg['activation_ticks']}t"
+                    lines.append(leg_str)
+                lines.append(f"  Trades analyzed: {so['trades_analyzed']}")
+                lines.append(f"  NET impact: {so['total_difference_ticks']:+.0f}t per contract "
+                             f"(${so['total_difference_ticks'] * TICK_VALUE:+.2f}; "
+                             f"x{contracts} contracts: ${so['total_difference_ticks'] * TICK_VALUE * contracts:+.2f})")
+                lines.append(f"  Winners P&L change: {so['winners_difference']:+.0f}t | "
+                             f"Losers P&L change: {so['losers_difference']:+.0f}t")
+                lines.append("  Exit Type Breakdown (legs joined with '+'):")
+                for exit_type, count in sorted(so['trail_exits_by_type'].items()):
+                    pct = count / so['trades_analyzed'] * 100
+                    lines.append(f"    {exit_type}: {count} ({pct:.0f}%)")
+                lines.append("")
+        
         # Recommendation
         lines.append("TRAILING STOP RECOMMENDATION")
         lines.append("-" * 30)
@@ -495,6 +609,123 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
             lines.append(f"  No trailing stop configuration improved results.")
             lines.append(f"  Current fixed SL/TP strategy performs best.")
         lines.append("")
+        
+        if overfit_stats and (overfit_stats['cscv'] or overfit_stats['deflated']):
+            lines.append("OVERFITTING DIAGNOSTICS (selection bias of best config)")
+            lines.append("-" * 55)
+            lines.extend(format_overfit_lines(overfit_stats['cscv'], overfit_stats['deflated'],
+                                              overfit_stats['best_name'], 'trades'))
+            lines.append("")
+    
+    # === EXIT RULE COMPARISON ===
+    if exit_rule_stats and exit_rule_stats['rules']:
+        lines.append("=" * 90)
+        lines.append("EXIT RULE COMPARISON (single-scan engine)")
+        lines.append("=" * 90)
+        lines.append("")
+        lines.append("All rule sets advanced together over each trade's bars (entry to exit horizon); each stops at its first trigger.")
+        lines.append("")
+        lines.append(f"{'Rule set':<26} {'Trades':>6} {'Win%':>6} {'Total':>8} {'Avg':>7} {'vs Actual':>10} {'Bars':>5}  Exits")
+        lines.append("-" * 90)
+        for name, r in exit_rule_stats['rules'].items():
+            exits = ", ".join(f"{t}:{c}" for t, c in sorted(r['exits_by_type'].items(), key=lambda x: -x[1]))
+            lines.append(
+                f"{name:<26} {r['trades']:>6} {r['win_rate']:>5.1f}% {r['total_pnl']:>+7.0f}t {r['avg_pnl']:>+6.1f}t "
+                f"{r['total_difference']:>+9.0f}t {r['avg_bars_held']:>5.1f}  {exits}"
+            )
+        lines.append("-" * 90)
+        lines.append(f"  Trades analyzed: {exit_rule_stats['trades_analyzed']} | "
+                     f"Actual P&L: {exit_rule_stats['total_actual_pnl']:+.0f}t")
+        lines.append("")
+    
+    # === TIME STOP SWEEP ===
+    if time_stop_stats:
+        lines.append("=" * 90)
+        lines.append(f"TIME STOP SWEEP (1-{TIME_STOP_MAX_MINUTES} min)")
+        lines.append("=" * 90)
+        lines.append("")
+        lines.append("Time stop = exit at the last BAR close at or before entry + N minutes.")
+        lines.append("SL/TP + time stop = fixed SL/TP if hit first, otherwise the time stop.")
+        lines.append("Excl = trades without a BAR inside the horizon or whose data ends before it.")
+        lines.append("")
+        n = time_stop_stats['trades_analyzed']
+        actual = time_stop_stats['total_actual_pnl']
+        lines.append(f"{'Minutes':>7} {'Time stop':>10} {'Win%':>6} {'vs Actual':>10}   {'SL/TP+time':>10} {'Win%':>6} {'vs Actual':>10} {'Excl':>5}")
+        lines.append("-" * 76)
+        best = {time_stop_stats['best_mtm'], time_stop_stats['best_sltp']}
+        for minutes in sorted(set(TIME_STOP_REPORT_MINUTES) | best):
+            h = time_stop_stats['horizons'].get(minutes)
+            if not h:
+                continue
+            marker = ""
+            if minutes == time_stop_stats['best_mtm']:
+                marker += " <- best time stop"
+            if minutes == time_stop_stats['best_sltp']:
+                marker += " <- best SL/TP+time"
+            trades = h['trades'] or 1
+            lines.append(
+                f"{minutes:>7} {h['mtm_pnl']:>+9.0f}t {h['mtm_wins'] / trades * 100:>5.1f}% {h['mtm_pnl'] - h['actual_pnl']:>+9.0f}t   "
+                f"{h['sltp_pnl']:>+9.0f}t {h['sltp_wins'] / trades * 100:>5.1f}% {h['sltp_pnl'] - h['actual_pnl']:>+9.0f}t "
+                f"{h['excluded']:>5}{marker}"
+            )
+        lines.append("-" * 76)
+        lines.append(f"  Trades analyzed: {n} | Actual P&L: {actual:+.0f}t")
+        lines.append(f"  Best time stop: {time_stop_stats['best_mtm']} min | "
+                     f"Best SL/TP + time stop: {time_stop_stats['best_sltp']} min")
+        lines.append("")
+    
+    # === MAE/MFE EXCURSION ANALYSIS ===
+    if excursion_stats:
+        lines.append("=" * 90)
+        lines.append("MAE / MFE EXCURSION ANALYSIS")
+        lines.append("=" * 90)
+        lines.append("")
+        lines.append("Maximum Adverse/Favorable Excursion per trade from BAR closes (entry to estimated exit).")
+        lines.append("Oracle = P&L if exited at the best close in the trade window.")
+        lines.append("")
+        
+        lines.append("EXCURSION DISTRIBUTIONS")
+        lines.append("-" * 90)
+        lines.append(f"{'Metric':<24} {'N':>5} {'Mean':>8} {'P10':>8} {'P25':>8} {'P50':>8} {'P75':>8} {'P90':>8}")
+        lines.append("-" * 90)
+        rows = [
+            ('MAE (ticks)', excursion_stats['mae']),
+            ('MFE (ticks)', excursion_stats['mfe']),
+            ('Time to MFE (sec)', excursion_stats['time_to_mfe']),
+            ('Oracle P&L (ticks)', excursion_stats['oracle_pnl']),
+            ('Left on table (ticks)', excursion_stats['left_on_table']),
+            ('MAE of winners', excursion_stats['winner_mae']),
+            ('MFE of losers', excursion_stats['loser_mfe']),
+        ]
+        for label, dist in rows:
+            if not dist:
+                continue
+            lines.append(
+                f"{label:<24} {dist['count']:>5} {dist['mean']:>8.1f} {dist['p10']:>8.1f} {dist['p25']:>8.1f} "
+                f"{dist['p50']:>8.1f} {dist['p75']:>8.1f} {dist['p90']:>8.1f}"
+            )
+        lines.append("-" * 90)
+        lines.append("")
+        
+        lines.append("EXCURSION HISTOGRAM")
+        lines.append(f"  {'Range':<10} {'MAE':>6} {'MFE':>6}")
+        for (label, mae_count), (_, mfe_count) in zip(excursion_stats['mae_histogram'], excursion_stats['mfe_histogram']):
+            lines.append(f"  {label:<10} {mae_count:>6} {mfe_count:>6}")
+        lines.append("")
+        
+        total_oracle = excursion_stats['total_oracle_pnl']
+        total_actual = excursion_stats['total_actual_pnl']
+        lines.append(f"  Trades analyzed: {excursion_stats['trades_analyzed']}")
+        lines.append(f"  Actual P&L: {total_actual:+.0f}t | Oracle best-exit P&L: {total_oracle:+.0f}t | Left on table: {total_oracle - total_actual:+.0f}t")
+        lines.append("")
+    
+    # === INDICATOR BEHAVIOR ===
+    if indicator_behavior and indicator_behavior['indicators']:
+        lines.append("=" * 90)
+        lines.append("INDICATOR BEHAVIOR: FLIP RATES, DWELL TIMES, WHIPSAWS")
+        lines.append("=" * 90)
+        lines.append("")
+        lines.extend(format_indicator_behavior_lines(indicator_behavior))
     
     # Signal alignment section
     lines.append("SIGNAL ALIGNMENT ANALYSIS")
@@ -599,6 +830,15 @@ def generate_report(roundtrips, signals, date_str, folder_path=None, bars=None):
             lines.append(f"{bucket:12}: {stats['trades']} trades, {stats['wins']}W, {stats['pnl']:+.0f}t")
     lines.append("")
     
+    # Bootstrap confidence intervals
+    if bootstrap_stats:
+        lines.append("=" * 80)
+        lines.append("BOOTSTRAP CONFIDENCE INTERVALS")
+        lines.append("=" * 80)
+        lines.append("")
+        lines.extend(format_bootstrap_lines(bootstrap_stats, total_trades, "round-trips"))
+        lines.append("")
+    
     # Key insights
     lines.append("=" * 80)
     lines.append("KEY INSIGHTS")
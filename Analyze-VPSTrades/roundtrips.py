@@ -2,14 +2,34 @@
 Round-trip trade matching, signal alignment, and BAR data enrichment.
 """
 
+import os
 from datetime import timedelta
-from config import TICK_SIZE, SIGNAL_WINDOW_SECONDS, TRAILING_STOP_CONFIGS
+from config import (
+    TICK_SIZE, SIGNAL_WINDOW_SECONDS, TRAILING_STOP_CONFIGS,
+    DEFAULT_SL_TICKS, DEFAULT_TP_TICKS, TRAIL_RECORDING, EXIT_RULE_SETS,
+    SCALE_OUT_CONFIGS, TIME_STOP_MAX_MINUTES
+)
 from simulation import (
     find_bar_at_time, estimate_actual_exit_time,
-    analyze_indicator_flips_during_trade, simulate_trailing_stop
+    analyze_indicator_flips_during_trade, simulate_trailing_stop,
+    confluence_threshold_exits, time_stop_marks, scan_scale_out, SIMULATION_WINDOW,
+    TIME_STOP_HORIZONS
+)
+from excursion import build_excursion_index, compute_trade_excursion
+from barstore import build_bar_store, find_window, build_confluence_drop_index
+from timelines import build_flip_index
+from backends import map_chunks
+from exitrules import build_rule_set, run_exit_rules
+from simcache import (
+    trade_identity, bar_fingerprint, make_cache_key,
+    cache_get_many, cache_put_many
 )
 
 
+# How far from the entry time a BAR may be to count as the entry BAR
+ENTRY_BAR_TOLERANCE_SECONDS = 120
+
+
 def build_roundtrips(trades):
     """Match entry/exit trades into round-trips."""
     roundtrips = []
@@ -173,101 +193,301 @@ def match_signals_to_trades(roundtrips, signals, date_str):
     return roundtrips
 
 
-def enrich_roundtrips_with_bar_data(roundtrips, bars):
+def trailing_cache_params(config, record, horizon=SIMULATION_WINDOW):
+    """Simulation parameters identifying a trailing stop result in the cache."""
+    return {
+        'sim': 'trailing_stop',
+        'sl_ticks': DEFAULT_SL_TICKS,
+        'tp_ticks': DEFAULT_TP_TICKS,
+        'activation_ticks': config['activation_ticks'],
+        'trail_distance_ticks': config['trail_distance_ticks'],
+        'record': record,
+        'horizon_seconds': horizon.total_seconds()
+    }
+
+
+def _no_bar_fields():
+    """Enrichment fields for a trade without BAR coverage."""
+    return {
+        'flip_analysis': {
+            'bars_in_trade': 0,
+            'confluence_drop': None,
+            'had_confluence_drop': False,
+            'first_adverse_flip': None,
+            'had_adverse_flip': False,
+            'no_bar_data': True
+        },
+        'confluence_exit_difference': None,
+        'confluence_thresholds': None,
+        'flip_exit_difference': None,
+        'trailing_stop_analysis': {},
+        'scale_out_analysis': {},
+        'exit_rules': None,
+        'time_stop': None,
+        'excursion': None
+    }
+
+
+def enrich_roundtrip(rt, bars, excursion_index, cached_trails=None, record=TRAIL_RECORDING,
+                     drop_index=None, flip_index=None, horizon=SIMULATION_WINDOW):
     """
-    Add BAR-level data to each round-trip:
-    - Entry BAR state
-    - Estimated actual exit time (from BAR price hitting SL/TP)
-    - Confluence drop analysis
-    - Single indicator flip analysis
-    - Trailing stop simulations
+    Compute the BAR-level enrichment of one complete round-trip.
+    
+    cached_trails: {config name: trailing stop result} already known for
+    this trade; only the other configs are simulated.
+    record: trail event recording level for simulate_trailing_stop.
+    drop_index: barstore.build_confluence_drop_index over bars; enables
+    O(1) confluence drop lookups and the per-threshold exits.
+    flip_index: timelines.build_flip_index over bars; first adverse flip
+    by binary search instead of a bar-by-bar scan.
+    horizon: how long after entry the SL/TP and trailing simulations follow
+    the trade (timedelta).
+    
+    Returns (fields, simulated) - fields to merge into rt and the newly
+    simulated trailing stop results by config name. rt is not modified.
     """
-    for rt in roundtrips:
-        if not rt['complete']:
-            continue
-        
-        entry_time = rt['entry']['timestamp']
-        entry_price = rt['entry'].get('price', 0)
-        
-        # Find entry BAR
-        entry_bar = find_bar_at_time(bars, entry_time, tolerance_seconds=120)
-        rt['entry_bar'] = entry_bar
-        
-        # Estimate actual exit time by scanning BARs for SL/TP hit
-        # This is more accurate than using TRADE CLOSED log timestamp
-        estimated_exit = estimate_actual_exit_time(
-            bars, entry_time, entry_price, rt['direction'],
-            sl_points=10.0, tp_points=30.0
+    cached_trails = cached_trails or {}
+    fields = {}
+    entry_time = rt['entry']['timestamp']
+    entry_price = rt['entry'].get('price', 0)
+    
+    # Find entry BAR
+    fields['entry_bar'] = find_bar_at_time(bars, entry_time, tolerance_seconds=ENTRY_BAR_TOLERANCE_SECONDS)
+    
+    # Estimate actual exit time by scanning BARs for SL/TP hit
+    # This is more accurate than using TRADE CLOSED log timestamp
+    estimated_exit = estimate_actual_exit_time(
+        bars, entry_time, entry_price, rt['direction'],
+        sl_points=DEFAULT_SL_TICKS * TICK_SIZE, tp_points=DEFAULT_TP_TICKS * TICK_SIZE,
+        horizon=horizon
+    )
+    fields['estimated_exit'] = estimated_exit
+    
+    # Check if we have bar data for this trade
+    exit_type = estimated_exit.get('exit_type', '') if estimated_exit else ''
+    if exit_type in ['NO_BARS', 'NO_DATA']:
+        # No bar data for this trade - skip analysis
+        fields.update(_no_bar_fields())
+        return fields, {}
+    
+    # Determine exit time to use for analysis
+    exit_time = estimated_exit['exit_time']
+    
+    # Analyze both exit strategies during trade
+    flip_analysis = analyze_indicator_flips_during_trade(
+        bars, entry_time, exit_time, rt['direction'], entry_price,
+        min_confluence=6,  # MinConfluenceForAutoTrade threshold
+        drop_index=drop_index, flip_index=flip_index
+    )
+    flip_analysis['no_bar_data'] = False
+    fields['flip_analysis'] = flip_analysis
+    
+    actual_pnl = rt['pnl_ticks']
+    
+    # Calculate difference for confluence drop exit
+    confluence_drop = flip_analysis.get('confluence_drop')
+    if confluence_drop:
+        hypo_pnl = confluence_drop['hypothetical_pnl_ticks']
+        fields['confluence_exit_difference'] = hypo_pnl - actual_pnl
+    else:
+        fields['confluence_exit_difference'] = None
+    
+    # Confluence drop exit at every threshold k (report sweep)
+    if drop_index is not None:
+        fields['confluence_thresholds'] = confluence_threshold_exits(
+            drop_index, entry_time, exit_time, rt['direction'], entry_price
         )
-        rt['estimated_exit'] = estimated_exit
-        
-        # Check if we have bar data for this trade
-        exit_type = estimated_exit.get('exit_type', '') if estimated_exit else ''
-        if exit_type in ['NO_BARS', 'NO_DATA']:
-            # No bar data for this trade - skip analysis
-            rt['flip_analysis'] = {
-                'bars_in_trade': 0,
-                'confluence_drop': None,
-                'had_confluence_drop': False,
-                'first_adverse_flip': None,
-                'had_adverse_flip': False,
-                'no_bar_data': True
+    else:
+        fields['confluence_thresholds'] = None
+    
+    # Calculate difference for single indicator flip exit
+    first_flip = flip_analysis.get('first_adverse_flip')
+    if first_flip:
+        hypo_pnl = first_flip['hypothetical_pnl_ticks']
+        fields['flip_exit_difference'] = hypo_pnl - actual_pnl
+    else:
+        fields['flip_exit_difference'] = None
+    
+    # === MAE/MFE EXCURSION ===
+    fields['excursion'] = compute_trade_excursion(
+        excursion_index, entry_time, exit_time, entry_price, rt['direction'],
+        actual_pnl_ticks=actual_pnl
+    )
+    
+    # === EXIT RULE COMPARISON (all rule sets in one pass) ===
+    store = excursion_index['store']
+    lo, hi = find_window(store, entry_time, entry_time + horizon)
+    rules = {rule_set['name']: build_rule_set(rule_set) for rule_set in EXIT_RULE_SETS}
+    fields['exit_rules'] = run_exit_rules(store['bars'][lo:hi], entry_time, entry_price, rt['direction'], rules)
+    
+    # === TIME STOP SWEEP (mark-to-market at every horizon) ===
+    fields['time_stop'] = time_stop_marks(
+        store, entry_time, entry_price, rt['direction'], TIME_STOP_HORIZONS,
+        DEFAULT_SL_TICKS, DEFAULT_TP_TICKS
+    )
+    
+    # === SCALE-OUT (MULTI-LEG) SIMULATIONS ===
+    fields['scale_out_analysis'] = {}
+    if lo < hi and entry_price:
+        for config in SCALE_OUT_CONFIGS:
+            scale_result = scan_scale_out(store['closes'], lo, hi, entry_price, rt['direction'], config['legs'])
+            scale_result['exit_time'] = store['bars'][scale_result['exit_index']]['timestamp']
+            scale_pnl = scale_result['exit_pnl_ticks']
+            fields['scale_out_analysis'][config['name']] = {
+                'config': config,
+                'result': scale_result,
+                'trail_pnl': scale_pnl,
+                'actual_pnl': actual_pnl,
+                'difference': scale_pnl - actual_pnl,
+                'is_better': scale_pnl > actual_pnl
             }
-            rt['confluence_exit_difference'] = None
-            rt['flip_exit_difference'] = None
-            rt['trailing_stop_analysis'] = {}
-            continue
-        
-        # Determine exit time to use for analysis
-        exit_time = estimated_exit['exit_time']
-        
-        # Analyze both exit strategies during trade
-        flip_analysis = analyze_indicator_flips_during_trade(
-            bars, entry_time, exit_time, rt['direction'], entry_price,
-            min_confluence=6  # MinConfluenceForAutoTrade threshold
-        )
-        flip_analysis['no_bar_data'] = False
-        rt['flip_analysis'] = flip_analysis
-        
-        actual_pnl = rt['pnl_ticks']
-        
-        # Calculate difference for confluence drop exit
-        confluence_drop = flip_analysis.get('confluence_drop')
-        if confluence_drop:
-            hypo_pnl = confluence_drop['hypothetical_pnl_ticks']
-            rt['confluence_exit_difference'] = hypo_pnl - actual_pnl
-        else:
-            rt['confluence_exit_difference'] = None
-        
-        # Calculate difference for single indicator flip exit
-        first_flip = flip_analysis.get('first_adverse_flip')
-        if first_flip:
-            hypo_pnl = first_flip['hypothetical_pnl_ticks']
-            rt['flip_exit_difference'] = hypo_pnl - actual_pnl
-        else:
-            rt['flip_exit_difference'] = None
-        
-        # === TRAILING STOP SIMULATIONS ===
-        rt['trailing_stop_analysis'] = {}
-        for config in TRAILING_STOP_CONFIGS:
+    
+    # === TRAILING STOP SIMULATIONS ===
+    simulated = {}
+    fields['trailing_stop_analysis'] = {}
+    for config in TRAILING_STOP_CONFIGS:
+        trail_result = cached_trails.get(config['name'])
+        if trail_result is None:
             trail_result = simulate_trailing_stop(
                 bars, entry_time, entry_price, rt['direction'],
-                sl_ticks=40, tp_ticks=120,
+                sl_ticks=DEFAULT_SL_TICKS, tp_ticks=DEFAULT_TP_TICKS,
                 activation_ticks=config['activation_ticks'],
-                trail_distance_ticks=config['trail_distance_ticks']
+                trail_distance_ticks=config['trail_distance_ticks'],
+                record=record, horizon=horizon
             )
-            
-            # Calculate difference vs actual
-            trail_pnl = trail_result['exit_pnl_ticks']
-            trail_difference = trail_pnl - actual_pnl
-            
-            rt['trailing_stop_analysis'][config['name']] = {
-                'config': config,
-                'result': trail_result,
-                'trail_pnl': trail_pnl,
-                'actual_pnl': actual_pnl,
-                'difference': trail_difference,
-                'is_better': trail_difference > 0
-            }
+            simulated[config['name']] = trail_result
+        
+        # Calculate difference vs actual
+        trail_pnl = trail_result['exit_pnl_ticks']
+        trail_difference = trail_pnl - actual_pnl
+        
+        fields['trailing_stop_analysis'][config['name']] = {
+            'config': config,
+            'result': trail_result,
+            'trail_pnl': trail_pnl,
+            'actual_pnl': actual_pnl,
+            'difference': trail_difference,
+            'is_better': trail_difference > 0
+        }
+    
+    return fields, simulated
+
+
+def trade_window_bars(store, entry_time, horizon):
+    """
+    The BARs enrich_roundtrip reads for one trade: from the entry BAR
+    tolerance before entry to the longer of the simulation horizon and the
+    time-stop sweep after it, plus one BAR on each side (the state before
+    the first flip, and whether the data goes on past the last horizon).
+    """
+    span = max(horizon, timedelta(minutes=TIME_STOP_MAX_MINUTES))
+    lo, hi = find_window(store, entry_time - timedelta(seconds=ENTRY_BAR_TOLERANCE_SECONDS), entry_time + span)
+    return store['bars'][max(lo - 1, 0):hi + 1]
+
+
+def _bar_context(bars):
+    """BAR list plus the excursion, confluence-drop and flip indexes over it."""
+    excursion_index = build_excursion_index(bars)
+    return {
+        'bars': bars,
+        'excursion_index': excursion_index,
+        'drop_index': build_confluence_drop_index(excursion_index['store']),
+        'flip_index': build_flip_index(excursion_index['store'])
+    }
+
+
+# BAR context and settings used by enrichment chunks (per process for the process backend)
+_enrich_context = None
+
+
+def _init_enrich_context(bars, record, horizon):
+    """bars is None when every item carries its own trade window (process backend)."""
+    global _enrich_context
+    _enrich_context = _bar_context(bars) if bars is not None else {}
+    _enrich_context['record'] = record
+    _enrich_context['horizon'] = horizon
+
+
+def _enrich_chunk(items):
+    record = _enrich_context['record']
+    horizon = _enrich_context['horizon']
+    results = []
+    for rt, cached, window in items:
+        context = _bar_context(window) if window is not None else _enrich_context
+        results.append(enrich_roundtrip(rt, context['bars'], context['excursion_index'], cached, record=record,
+                                        drop_index=context['drop_index'], flip_index=context['flip_index'],
+                                        horizon=horizon))
+    return results
+
+
+def enrich_roundtrips_with_bar_data(roundtrips, bars, sim_cache=None, backend='serial', workers=None,
+                                    record=TRAIL_RECORDING, horizon=SIMULATION_WINDOW):
+    """
+    Add BAR-level data to each round-trip:
+    - Entry BAR state
+    - Estimated actual exit time (from BAR price hitting SL/TP)
+    - Confluence drop analysis
+    - Single indicator flip analysis
+    - Trailing stop simulations
+    - Scale-out (multi-leg) simulations (config.SCALE_OUT_CONFIGS)
+    - Exit rule comparison (config.EXIT_RULE_SETS, single pass per trade)
+    - Time-stop P&L at every horizon up to TIME_STOP_MAX_MINUTES
+    - MAE/MFE excursion stats (sparse-table range queries)
+    
+    With sim_cache (simcache.open_sim_cache), trailing stop results already
+    stored for the same trade, bar window and parameters are reused and
+    only the missing (trade, config) pairs are simulated.
+    
+    record sets the trail event recording level (simulation.RECORDING_LEVELS);
+    horizon (timedelta) how long after entry the exit simulations run.
+    
+    Trades are independent and are enriched via backends.map_chunks
+    (backend 'serial', 'thread' or 'process'); the result is identical
+    for every backend. The cache is only touched from this process.
+    Process workers never receive the whole session: each trade is sent
+    with its own BAR window (trade_window_bars) and the indexes are built
+    over that window, so worker start-up and memory do not grow with the
+    session length.
+    """
+    complete = [rt for rt in roundtrips if rt['complete']]
+    windowed = backend == 'process' and (workers or os.cpu_count() or 1) > 1
+    
+    cache_keys = []
+    items = []
+    store = build_bar_store(bars) if sim_cache is not None or windowed else None
+    for rt in complete:
+        keys = {}
+        cached = {}
+        if sim_cache is not None:
+            entry_time = rt['entry']['timestamp']
+            entry_price = rt['entry'].get('price', 0)
+            lo, hi = find_window(store, entry_time, entry_time + horizon)
+            if lo < hi and entry_price:
+                trade_id = trade_identity(entry_time, rt['direction'], entry_price)
+                fingerprint = bar_fingerprint(store, lo, hi)
+                keys = {
+                    config['name']: make_cache_key(trade_id, fingerprint,
+                                                   trailing_cache_params(config, record, horizon))
+                    for config in TRAILING_STOP_CONFIGS
+                }
+                found = cache_get_many(sim_cache, keys.values())
+                cached = {name: found[key] for name, key in keys.items() if key in found}
+        cache_keys.append(keys)
+        window = trade_window_bars(store, rt['entry']['timestamp'], horizon) if windowed else None
+        items.append((rt, cached, window))
+    
+    outputs = map_chunks(_enrich_chunk, items, backend=backend, workers=workers,
+                         initializer=_init_enrich_context,
+                         initargs=(None if windowed else bars, record, horizon))
+    
+    new_results = {}
+    for rt, keys, (fields, simulated) in zip(complete, cache_keys, outputs):
+        rt.update(fields)
+        for name, result in simulated.items():
+            if name in keys:
+                new_results[keys[name]] = result
+    
+    if sim_cache is not None:
+        cache_put_many(sim_cache, new_results)
     
     return roundtrips
@@ -0,0 +1,163 @@
+"""
+Session loading: parse one dated folder's logs and CSVs into round-trips,
+signals and BAR data. Shared by the daily report and the multi-day modes.
+"""
+
+import os
+import re
+
+from parsers import (
+    parse_trades, find_signal_files, find_indicator_csv_files,
+    parse_monitor_signals, parse_trader_signals,
+    parse_trader_orders_and_closes, parse_indicator_csv,
+    merge_signals
+)
+from roundtrips import (
+    build_roundtrips, build_roundtrips_from_trader_log,
+    match_signals_to_trades
+)
+
+
+def load_bars(csv_files, date_str, log=None):
+    """Parse IndicatorValues CSV files into one timestamp-sorted BAR list."""
+    all_bars = []
+    for f in csv_files:
+        if log:
+            log(f"Parsing CSV: {os.path.basename(f)}")
+        bars = parse_indicator_csv(f, date_str)
+        if log:
+            log(f"  Found {len(bars)} BAR records")
+        all_bars.extend(bars)
+
+    # Sort bars by timestamp
+    all_bars.sort(key=lambda x: x['timestamp'])
+    return all_bars
+
+
+def find_session_files(source_path, date_str):
+    """Source files load_session reads from source_path (trades_final.txt, signal logs, CSVs)."""
+    monitor_files, trader_files = find_signal_files(source_path, date_str)
+    files = monitor_files + trader_files + find_indicator_csv_files(source_path)
+    trades_path = os.path.join(source_path, 'trades_final.txt')
+    if os.path.exists(trades_path):
+        files.append(trades_path)
+    return files
+
+
+def load_session(source_path, date_str, verbose=True):
+    """
+    Parse all source files in source_path for date_str.
+
+    Returns dict with:
+    - date: the session date string
+    - trades: trade records from trades_final.txt
+    - signals: merged, deduplicated signals
+    - bars: BAR dicts sorted by timestamp
+    - roundtrips: round-trips matched to signals (not yet enriched with BAR data)
+    """
+    def log(msg):
+        if verbose:
+            print(msg)
+
+    trades_path = os.path.join(source_path, 'trades_final.txt')
+
+    # Find signal files
+    monitor_files, trader_files = find_signal_files(source_path, date_str)
+
+    # Find indicator CSV files
+    csv_files = find_indicator_csv_files(source_path)
+
+    log(f"Date: {date_str}")
+    log(f"Folder: {source_path}")
+    log(f"Monitor files: {len(monitor_files)}")
+    log(f"Trader files: {len(trader_files)}")
+    log(f"CSV files: {len(csv_files)}")
+
+    # Parse trades from trades_final.txt (for discretionary trades)
+    log(f"\nParsing trades from: {trades_path}")
+    trades = parse_trades(trades_path)
+    log(f"  Found {len(trades)} trade records from trades_final.txt")
+
+    # Parse all signal files
+    all_monitor_signals = []
+    all_trader_signals = []
+    all_trader_orders = []
+    all_trader_closes = []
+
+    for f in monitor_files:
+        log(f"Parsing Monitor: {os.path.basename(f)}")
+        sigs = parse_monitor_signals(f, date_str)
+        log(f"  Found {len(sigs)} signals")
+        all_monitor_signals.extend(sigs)
+
+    for f in trader_files:
+        log(f"Parsing Trader: {os.path.basename(f)}")
+        sigs = parse_trader_signals(f, date_str)
+        orders, closes = parse_trader_orders_and_closes(f, date_str)
+        log(f"  Found {len(sigs)} signals, {len(orders)} orders, {len(closes)} closed trades")
+        all_trader_signals.extend(sigs)
+        all_trader_orders.extend(orders)
+        all_trader_closes.extend(closes)
+
+    # Parse indicator CSV files for BAR data
+    all_bars = load_bars(csv_files, date_str, log)
+
+    # Show time range of CSV data
+    if all_bars:
+        first_bar_time = all_bars[0]['timestamp']
+        last_bar_time = all_bars[-1]['timestamp']
+        log(f"  CSV time range: {first_bar_time.strftime('%H:%M:%S')} to {last_bar_time.strftime('%H:%M:%S')}")
+
+    # Merge signals
+    all_signals = merge_signals(all_monitor_signals, all_trader_signals)
+    log(f"\nTotal unique signals: {len(all_signals)}")
+
+    # Build round-trips - prefer trader log data if available, fall back to trades_final.txt
+    if all_trader_orders and all_trader_closes:
+        log(f"\nBuilding round-trips from trader log ({len(all_trader_orders)} orders, {len(all_trader_closes)} closes)")
+        roundtrips = build_roundtrips_from_trader_log(all_trader_orders, all_trader_closes)
+    else:
+        log("\nBuilding round-trips from trades_final.txt")
+        roundtrips = build_roundtrips(trades)
+
+    complete_rts = [rt for rt in roundtrips if rt['complete']]
+    log(f"Built {len(complete_rts)} complete round-trips")
+
+    # Match signals
+    roundtrips = match_signals_to_trades(roundtrips, all_signals, date_str)
+
+    return {
+        'date': date_str,
+        'trades': trades,
+        'signals': all_signals,
+        'bars': all_bars,
+        'roundtrips': roundtrips
+    }
+
+
+def find_dated_folders(root_path, start_date=None, end_date=None):
+    """
+    Find YYYY-MM-DD analysis folders under root_path (e.g. ActiveNikiAnalysis).
+    Optional start_date/end_date (YYYY-MM-DD, inclusive) restrict the range.
+    Returns list of (date_str, folder_path) sorted by date.
+    """
+    folders = []
+    if not os.path.isdir(root_path):
+        return folders
+
+    for item in os.listdir(root_path):
+        item_path = os.path.join(root_path, item)
+        if not os.path.isdir(item_path):
+            continue
+        match = re.match(r'^(\d{4}-\d{2}-\d{2})$', item)
+        if not match:
+            continue
+        date_str = match.group(1)
+        if start_date and date_str < start_date:
+            continue
+        if end_date and date_str > end_date:
+            continue
+        folders.append((date_str, item_path))
+
+    folders.sort()
+    return folders
@@ -0,0 +1,314 @@
+"""
+Signal regeneration sweep over the entry settings of ActiveNikiTrader:
+MinConfluenceRequired, MinConfluenceForAutoTrade, MaxBarsAfterYellowSquare
+and CooldownBars.
+
+Everything that does not depend on those four settings is computed once
+per session (build_signal_index):
+
+- AIQ1 edges: Yellow (DN->UP) / Orange (UP->DN) square bars
+- bull / bear confluence and confirming indicator of every bar
+- per side and confluence threshold k, "next bar at or after i with a
+  confirmation and confluence >= k" (one reverse scan per k)
+- order filters (confirmation / RR rule, trading hours) per bar
+- the exit of a position entered at a bar's close, simulated on first use
+  and shared by every tuple (emulator.simulate_position)
+
+A tuple is then one scan over the AIQ1 edges: each square opens a window of
+MaxBarsAfterYellowSquare bars, cut short by the next edge, and its signal
+is the first qualifying bar after the cooldown - one array lookup per edge.
+Orders, one position at a time and the daily loss limit / profit target
+are replayed over those signals only, so a tuple costs microseconds per
+day and full grids over months take seconds.
+
+Results match emulator.emulate_session. The strategy keeps the previous
+indicator states frozen during cooldown, so on the first bar after a
+cooldown the confirming indicator (and with it the LONG RR/DT order filter)
+is re-evaluated against the signal bar's states instead of the precomputed
+previous-bar one.
+"""
+
+from array import array
+
+from config import SIGNAL_SWEEP_RANGES, SWEEP_TOP_N, TICK_VALUE
+from emulator import (
+    strategy_params, bar_states, get_confluence, get_confirmation, trading_hours_allowed,
+    forced_close_indices, exit_leg, simulate_position, CONFIRMATION_ORDER
+)
+from parsers import find_indicator_csv_files
+from session import load_bars
+from overfit import cscv_pbo, deflated_best_sharpe, format_overfit_lines
+
+# Axis order of the grid (slowest-varying first)
+SIGNAL_SWEEP_AXES = ['min_confluence_required', 'min_confluence_for_auto_trade',
+                     'max_bars_after_yellow_square', 'cooldown_bars']
+
+# Per-tuple counters of one day (scan_signal_tuple)
+SIGNAL_SWEEP_FIELDS = ['signals', 'longs', 'shorts', 'orders', 'trades', 'wins', 'pnl',
+                       'signal_pnl', 'signal_wins', 'limit_hit']
+
+
+def default_signal_sweep_ranges():
+    """Expand config.SIGNAL_SWEEP_RANGES tuples into value lists per axis."""
+    return {
+        axis: list(range(start, stop + 1, step))
+        for axis, (start, stop, step) in SIGNAL_SWEEP_RANGES.items()
+    }
+
+
+def build_signal_index(bars, params, thresholds):
+    """
+    Tuple-independent arrays of one session (bars sorted by timestamp).
+
+    params: strategy_params() for the settings that are not swept
+    thresholds: MinConfluenceRequired values the grid will ask for
+    Returns dict with n, edges [(index, bullish)], per side ('bull' /
+    'bear') count, allowed and next_ok {k: array('i')} lists, hours,
+    plus what the exit cache needs (closes, forced closes, exit leg).
+    """
+    n = len(bars)
+    states = [bar_states(bar) for bar in bars]
+    index = {
+        'n': n, 'edges': [], 'hours': [trading_hours_allowed(bar['timestamp'], params) for bar in bars],
+        'closes': [bar['close'] for bar in bars], 'forced': forced_close_indices(bars, params),
+        'leg': exit_leg(params), 'exits': {}, 'params': params, 'states': states
+    }
+    for i in range(1, n):
+        up, prev = states[i]['AIQ1'][0], states[i - 1]['AIQ1'][0]
+        if up != prev:
+            index['edges'].append((i, up))
+
+    prev_up = {name: False for name in CONFIRMATION_ORDER}
+    sides = {side: {'count': [], 'confirm': [], 'allowed': []} for side in ('bull', 'bear')}
+    for s in states:
+        bull, bear, _ = get_confluence(s, params)
+        for side, count in (('bull', bull), ('bear', bear)):
+            confirming = get_confirmation(s, prev_up, params, side == 'bull')
+            if side == 'bull':
+                allowed = confirming not in params['long_skip_confirmations']
+            else:
+                allowed = s['RR'][0] or not params['short_requires_rr_up']
+            sides[side]['count'].append(count)
+            sides[side]['confirm'].append(confirming is not None)
+            sides[side]['allowed'].append(allowed)
+        for name in prev_up:
+            prev_up[name] = s[name][0]
+
+    for side, data in sides.items():
+        data['next_ok'] = {}
+        for k in thresholds:
+            nxt = array('i', bytes(4 * (n + 1)))
+            following = n
+            nxt[n] = n
+            for i in range(n - 1, -1, -1):
+                if data['confirm'][i] and data['count'][i] >= k:
+                    following = i
+                nxt[i] = following
+            data['next_ok'][k] = nxt
+        index[side] = data
+    return index
+
+
+def entry_exit(index, i, bullish):
+    """(pnl_ticks, flat_index) of a position entered at bar i's close, or None if still open at the end."""
+    key = (i, bullish)
+    exits = index['exits']
+    if key not in exits:
+        result = simulate_position(index['closes'], index['forced'], i, index['closes'][i],
+                                   'LONG' if bullish else 'SHORT', index['leg'])
+        exits[key] = (result[2], result[4]) if result else None
+    return exits[key]
+
+
+def _order_allowed(index, j, bullish, last_signal, cooldown):
+    """Order filter of a signal at bar j, with the strategy's frozen states on the first bar after a cooldown."""
+    side = index['bull' if bullish else 'bear']
+    if not (bullish and cooldown > 1 and last_signal is not None and j == last_signal + cooldown):
+        return side['allowed'][j]
+    states = index['states']
+    prev_up = {name: states[last_signal][name][0] for name in CONFIRMATION_ORDER}
+    confirming = get_confirmation(states[j], prev_up, index['params'], True)
+    return confirming not in index['params']['long_skip_confirmations']
+
+
+def scan_signal_tuple(index, combo):
+    """
+    Signals, orders and trades of one (min_conf, min_auto, max_bars,
+    cooldown) tuple over a session's signal index.
+
+    Returns dict of SIGNAL_SWEEP_FIELDS: pnl is the strategy as traded
+    (one position, daily limits); signal_pnl is every signal's own exit
+    (forward P&L of the signal, whatever the filters).
+    """
+    min_conf, min_auto, max_bars, cooldown = combo
+    params = index['params']
+    loss_limit = params['daily_loss_limit_usd']
+    profit_target = params['daily_profit_target_usd']
+    hours = index['hours']
+    edges = index['edges']
+    n = index['n']
+    result = dict.fromkeys(SIGNAL_SWEEP_FIELDS, 0)
+    result['limit_hit'] = None
+
+    last_signal = None
+    position = None          # (pnl_ticks, flat_index) or None; flat_index None = open to the end
+    daily_pnl = 0.0
+    for e, (start, bullish) in enumerate(edges):
+        end = min(start + max_bars, edges[e + 1][0] - 1 if e + 1 < len(edges) else n - 1)
+        if last_signal is not None and cooldown > 0:
+            start = max(start, last_signal + cooldown)
+        if start > end:
+            continue
+        side = index['bull' if bullish else 'bear']
+        j = side['next_ok'][min_conf][start]
+        if j > end:
+            continue
+
+        if position and position[1] is not None and position[1] <= j:
+            daily_pnl += position[0] * TICK_VALUE
+            position = None
+            if loss_limit is not None and daily_pnl <= -loss_limit:
+                result['limit_hit'] = 'LOSS'
+            elif profit_target is not None and daily_pnl >= profit_target:
+                result['limit_hit'] = 'PROFIT'
+            if result['limit_hit']:
+                return result
+
+        allowed = _order_allowed(index, j, bullish, last_signal, cooldown)
+        last_signal = j
+        result['signals'] += 1
+        result['longs' if bullish else 'shorts'] += 1
+        exit_info = entry_exit(index, j, bullish)
+        if exit_info:
+            result['signal_pnl'] += exit_info[0]
+            result['signal_wins'] += exit_info[0] > 0
+        if params['auto_trading'] and position is None and allowed \
+                and side['count'][j] >= min_auto and hours[j]:
+            result['orders'] += 1
+            position = exit_info or (None, None)
+            if exit_info:
+                result['trades'] += 1
+                result['wins'] += exit_info[0] > 0
+                result['pnl'] += exit_info[0]
+
+    # The strategy still books a close (and a limit) after the last signal
+    if position and position[1] is not None and position[1] < n:
+        daily_pnl += position[0] * TICK_VALUE
+        if loss_limit is not None and daily_pnl <= -loss_limit:
+            result['limit_hit'] = 'LOSS'
+        elif profit_target is not None and daily_pnl >= profit_target:
+            result['limit_hit'] = 'PROFIT'
+    return result
+
+
+def sweep_day_signals(bars, grid, params=None):
+    """Scan every grid tuple over one session's bars; returns one result dict per tuple."""
+    params = params or strategy_params()
+    index = build_signal_index(bars, params, sorted({combo[0] for combo in grid}))
+    return [scan_signal_tuple(index, combo) for combo in grid]
+
+
+def sweep_day_folders(day_folders, grid, params=None):
+    """
+    Load and sweep (date_str, folder) pairs.
+    Returns list of {'date', 'bars', 'results'} (one per day, in order).
+    """
+    days = []
+    for date_str, day_folder in day_folders:
+        bars = load_bars(find_indicator_csv_files(day_folder), date_str)
+        days.append({'date': date_str, 'bars': len(bars), 'results': sweep_day_signals(bars, grid, params)})
+    return days
+
+
+def merge_signal_sweep(day_results, grid):
+    """
+    Pool per-day tuple results.
+    Returns one dict per tuple: the summed counters, limit_days (days a
+    daily limit stopped trading) and day_pnl {date: pnl}.
+    """
+    merged = []
+    for t in range(len(grid)):
+        total = dict.fromkeys(SIGNAL_SWEEP_FIELDS, 0)
+        total['limit_hit'] = 0
+        total['day_pnl'] = {}
+        for day in day_results:
+            r = day['results'][t]
+            for field in SIGNAL_SWEEP_FIELDS:
+                if field == 'limit_hit':
+                    total['limit_hit'] += r['limit_hit'] is not None
+                else:
+                    total[field] += r[field]
+            total['day_pnl'][day['date']] = r['pnl']
+        total['limit_days'] = total.pop('limit_hit')
+        merged.append(total)
+    return merged
+
+
+def format_signal_sweep_summary(label, ranges, grid, results, days, params, top_n=SWEEP_TOP_N):
+    """Ranked text summary of the signal sweep (best traded P&L first)."""
+    ranked = sorted(range(len(grid)), key=lambda i: results[i]['pnl'], reverse=True)
+    current = tuple(params[axis] for axis in SIGNAL_SWEEP_AXES)
+
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"SIGNAL REGENERATION SWEEP - {label}")
+    lines.append("=" * 100)
+    lines.append("")
+    lines.append(f"Days: {len(days)} ({days[0]} to {days[-1]})" if days else "Days: 0")
+    lines.append(f"Tuples: {len(grid)} (Conf = MinConfluenceRequired, Auto = MinConfluenceForAutoTrade, "
+                 f"Win = MaxBarsAfterYellowSquare, Cool = CooldownBars)")
+    for axis in SIGNAL_SWEEP_AXES:
+        values = ranges[axis]
+        lines.append(f"  {axis:<30} {len(values):>3} values: {values[0]}..{values[-1]}")
+    lines.append("Traded = orders under the other STRATEGY_DEFAULTS settings (one position, hours, daily limits);")
+    lines.append("Signal P&L = every signal's own exit at its bar close, whatever the filters")
+    lines.append("")
+
+    header = (f"{'Rank':>4} {'Conf':>5} {'Auto':>5} {'Win':>4} {'Cool':>5} {'Signals':>8} {'L/S':>9} "
+              f"{'Trades':>7} {'Win%':>6} {'P&L':>9} {'$':>11} {'Sig P&L':>9} {'Sig Win%':>9} {'Lim':>4}")
+
+    def row(rank, i):
+        conf, auto, window, cool = grid[i]
+        r = results[i]
+        wr = (r['wins'] / r['trades'] * 100) if r['trades'] else 0
+        swr = (r['signal_wins'] / r['signals'] * 100) if r['signals'] else 0
+        return (f"{rank:>4} {conf:>5} {auto:>5} {window:>4} {cool:>5} {r['signals']:>8} "
+                f"{str(r['longs']) + '/' + str(r['shorts']):>9} {r['trades']:>7} {wr:>5.0f}% "
+                f"{r['pnl']:>+8.0f}t {r['pnl'] * TICK_VALUE:>+11.2f} {r['signal_pnl']:>+8.0f}t {swr:>8.0f}% "
+                f"{r['limit_days']:>4}")
+
+    lines.append(f"TOP {min(top_n, len(grid))} TUPLES BY TRADED P&L")
+    lines.append("-" * 110)
+    lines.append(header)
+    lines.append("-" * 110)
+    for rank, i in enumerate(ranked[:top_n], 1):
+        lines.append(row(rank, i))
+    lines.append("-" * 110)
+    if current in grid:
+        i = grid.index(current)
+        lines.append(row(ranked.index(i) + 1, i) + "  <- current settings")
+    lines.append("")
+
+    if ranked:
+        median = results[ranked[len(ranked) // 2]]['pnl']
+        lines.append(f"P&L spread across grid: best {results[ranked[0]]['pnl']:+.0f}t | "
+                     f"median {median:+.0f}t | worst {results[ranked[-1]]['pnl']:+.0f}t")
+        lines.append("")
+
+    # Selection-bias check over the day x tuple P&L matrix
+    if len(days) >= 4 and len(grid) >= 2:
+        matrix = [[r['day_pnl'].get(day, 0.0) for r in results] for day in days]
+        cscv = cscv_pbo(matrix)
+        deflated = deflated_best_sharpe(matrix)
+        if cscv or deflated:
+            best_name = "---"
+            if deflated:
+                conf, auto, window, cool = grid[deflated['best_index']]
+                best_name = f"Conf{conf}/Auto{auto}/Win{window}/Cool{cool}"
+            lines.append("OVERFITTING DIAGNOSTICS (selection bias of best tuple)")
+            lines.append("-" * 60)
+            lines.extend(format_overfit_lines(cscv, deflated, best_name, 'days'))
+            lines.append("")
+
+    lines.append("=" * 100)
+    return "\n".join(lines)
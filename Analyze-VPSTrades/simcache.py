@@ -0,0 +1,124 @@
+"""
+Persistent memo of per-trade simulation results.
+Results are keyed by (trade identity, bar-data fingerprint, simulation
+parameters, simulator version) and stored in a small SQLite file next to
+the dated analysis folders. Entries are evicted least-recently-used once
+the store grows past its size bound.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+from array import array
+from datetime import datetime
+
+from config import SIM_CACHE_MAX_ENTRIES
+from simulation import SIMULATOR_VERSION
+
+# Share of max_entries kept after an eviction pass
+EVICT_TO_RATIO = 0.9
+
+
+def open_sim_cache(path, max_entries=SIM_CACHE_MAX_ENTRIES):
+    """Open (creating if needed) the result store at path."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sim_results ("
+        "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sim_results_last_used ON sim_results(last_used)")
+    conn.commit()
+    return {'conn': conn, 'path': path, 'max_entries': max_entries, 'hits': 0, 'misses': 0}
+
+
+def close_sim_cache(cache):
+    """Evict down to the size bound and close the store."""
+    evict_sim_cache(cache)
+    cache['conn'].close()
+
+
+def trade_identity(entry_time, direction, entry_price):
+    """Stable identity of a trade for cache keys."""
+    return f"{entry_time.isoformat()}|{direction}|{entry_price:.2f}"
+
+
+def bar_fingerprint(store, lo, hi):
+    """Hash of the timestamps and closes in bar window [lo, hi)."""
+    digest = hashlib.sha1()
+    digest.update(store['times'][lo:hi].tobytes())
+    digest.update(store['closes'][lo:hi].tobytes())
+    return digest.hexdigest()
+
+
+def make_cache_key(trade_id, fingerprint, params):
+    """Cache key from trade identity, bar fingerprint, params and simulator version."""
+    raw = json.dumps([trade_id, fingerprint, params, SIMULATOR_VERSION], sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _encode_result(result):
+    encoded = dict(result)
+    if isinstance(encoded.get('exit_time'), datetime):
+        encoded['exit_time'] = encoded['exit_time'].isoformat()
+    if isinstance(encoded.get('trail_details'), dict):
+        # Compact recording: typed arrays stored as [typecode, values]
+        encoded['trail_details'] = {k: [v.typecode, v.tolist()] for k, v in encoded['trail_details'].items()}
+    return json.dumps(encoded)
+
+
+def _decode_result(value):
+    result = json.loads(value)
+    if isinstance(result.get('exit_time'), str):
+        result['exit_time'] = datetime.fromisoformat(result['exit_time'])
+    if isinstance(result.get('trail_details'), dict):
+        result['trail_details'] = {k: array(tc, v) for k, (tc, v) in result['trail_details'].items()}
+    return result
+
+
+def cache_get_many(cache, keys):
+    """Return {key: result} for keys present in the store; marks them used."""
+    found = {}
+    conn = cache['conn']
+    keys = list(keys)
+    # SQLite caps bound parameters per statement
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT key, value FROM sim_results WHERE key IN ({placeholders})", chunk)
+        for key, value in rows:
+            found[key] = _decode_result(value)
+    if found:
+        now = time.time()
+        conn.executemany("UPDATE sim_results SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        conn.commit()
+    cache['hits'] += len(found)
+    cache['misses'] += len(keys) - len(found)
+    return found
+
+
+def cache_put_many(cache, items):
+    """Store {key: result} pairs."""
+    if not items:
+        return
+    now = time.time()
+    cache['conn'].executemany(
+        "INSERT OR REPLACE INTO sim_results (key, value, last_used) VALUES (?, ?, ?)",
+        [(key, _encode_result(result), now) for key, result in items.items()]
+    )
+    cache['conn'].commit()
+
+
+def evict_sim_cache(cache):
+    """Drop least-recently-used entries once the store exceeds max_entries."""
+    conn = cache['conn']
+    count = conn.execute("SELECT COUNT(*) FROM sim_results").fetchone()[0]
+    if count <= cache['max_entries']:
+        return 0
+    excess = count - int(cache['max_entries'] * EVICT_TO_RATIO)
+    conn.execute(
+        "DELETE FROM sim_results WHERE key IN "
+        "(SELECT key FROM sim_results ORDER BY last_used ASC LIMIT ?)", (excess,)
+    )
+    conn.commit()
+    return excess
@@ -3,8 +3,30 @@ BAR data utilities and trade simulation functions.
 Includes trailing stop simulation and indicator flip analysis.
 """
 
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import timedelta
-from config import TICK_SIZE, TICK_VALUE
+from config import (
+    TICK_SIZE, TICK_VALUE, FLIP_INDICATORS, EXIT_HORIZON_MINUTES, TIME_STOP_MAX_MINUTES
+)
+from barstore import to_epoch_seconds, find_window, next_confluence_drop
+from timelines import find_adverse_flip
+
+# Bump when simulation logic changes so persisted results are recomputed
+SIMULATOR_VERSION = 1
+
+# Default exit horizon (search window after entry) for the simulators
+SIMULATION_WINDOW = timedelta(minutes=EXIT_HORIZON_MINUTES)
+
+# Horizons (minutes) of the time-stop sweep (time_stop_marks)
+TIME_STOP_HORIZONS = list(range(1, TIME_STOP_MAX_MINUTES + 1))
+
+# Trail event recording levels for simulate_trailing_stop:
+# none = summary only, compact = parallel typed arrays, full = list of dicts
+RECORDING_LEVELS = ['none', 'compact', 'full']
+
+# Trail event action codes used by compact recording
+TRAIL_ACTIONS = ['ACTIVATED', 'TRAIL_UP', 'TRAIL_DN']
 
 
 def find_bar_at_time(bars, target_time, tolerance_seconds=60):
@@ -37,10 +59,20 @@ def find_bars_in_range(bars, start_time, end_time):
     return [b for b in bars if start_time <= b['timestamp'] <= end_time]
 
 
-def estimate_actual_exit_time(bars, entry_time, entry_price, direction, sl_points=10.0, tp_points=30.0):
+def bars_within_horizon(bars, entry_time, horizon):
+    """BARs from entry_time up to entry_time + horizon (horizon None = no limit)."""
+    if horizon is None:
+        return [b for b in bars if entry_time <= b['timestamp']]
+    max_time = entry_time + horizon
+    return [b for b in bars if entry_time <= b['timestamp'] <= max_time]
+
+
+def estimate_actual_exit_time(bars, entry_time, entry_price, direction, sl_points=10.0, tp_points=30.0,
+                              horizon=SIMULATION_WINDOW):
     """
     Scan BARs forward from entry to find when price would have hit SL or TP.
-    Uses TIME-BASED limits (10 minutes) to handle both tick and minute data.
+    Uses a TIME-BASED limit (horizon, a timedelta; None = all bars) to handle
+    both tick and minute data.
     
     Returns dict with:
     - exit_time: timestamp when SL/TP was hit
@@ -61,11 +93,8 @@ def estimate_actual_exit_time(bars, entry_time, entry_price, direction, sl_point
         sl_price = entry_price + sl_points
         tp_price = entry_price - tp_points
     
-    # Time-based limit: search up to 10 minutes after entry
-    max_time = entry_time + timedelta(minutes=10)
-    
-    # Find bars in the trade window (entry_time to entry_time + 10 min)
-    bars_in_window = [b for b in bars if entry_time <= b['timestamp'] <= max_time]
+    # Find bars in the trade window (entry_time to entry_time + horizon)
+    bars_in_window = bars_within_horizon(bars, entry_time, horizon)
     
     if not bars_in_window:
         # No bars found for this time window - trade might be outside CSV coverage
@@ -110,7 +139,7 @@ def estimate_actual_exit_time(bars, entry_time, entry_price, direction, sl_point
                     'bars_in_trade': i + 1
                 }
     
-    # No SL/TP hit found in 10-minute window - return last bar as timeout
+    # No SL/TP hit found within the horizon - return last bar as timeout
     last_bar = bars_in_window[-1]
     return {
         'exit_time': last_bar['timestamp'],
@@ -122,7 +151,8 @@ def estimate_actual_exit_time(bars, entry_time, entry_price, direction, sl_point
 
 def simulate_trailing_stop(bars, entry_time, entry_price, direction, 
                            sl_ticks=40, tp_ticks=120,
-                           activation_ticks=60, trail_distance_ticks=30):
+                           activation_ticks=60, trail_distance_ticks=30,
+                           record='full', horizon=SIMULATION_WINDOW):
     """
     Simulate a trailing stop exit strategy by scanning BAR data.
     
@@ -135,6 +165,9 @@ def simulate_trailing_stop(bars, entry_time, entry_price, direction,
     - tp_ticks: Fixed take profit in ticks (e.g., 120 = 30 points for NQ)
     - activation_ticks: Profit level (in ticks) to activate trailing stop
     - trail_distance_ticks: Trail distance behind price (in ticks)
+    - record: Trail event recording level (see RECORDING_LEVELS)
+    - horizon: How long after entry to follow the trade (timedelta; None =
+      every bar passed in, e.g. windows already cut to the horizon)
     
     Returns dict with:
     - exit_type: 'TP', 'SL', 'TRAIL', 'TIMEOUT', 'NO_BARS'
@@ -143,8 +176,14 @@ def simulate_trailing_stop(bars, entry_time, entry_price, direction,
     - exit_pnl_ticks: P&L in ticks at exit
     - trail_activated: Whether trail was activated
     - max_profit_ticks: Maximum profit reached during trade
-    - trail_details: List of trail stop movements (for debugging)
+    - trail_details: Trail stop movements (for debugging) - a list of dicts
+      for record='full', a dict of parallel arrays (time as epoch seconds,
+      action as TRAIL_ACTIONS codes, price, trail_stop, pnl_ticks) for
+      'compact', an empty list for 'none'
     """
+    if record not in RECORDING_LEVELS:
+        raise ValueError(f"Unknown recording level '{record}' (expected one of {', '.join(RECORDING_LEVELS)})")
+    
     if not bars or entry_price == 0:
         return {
             'exit_type': 'NO_DATA',
@@ -156,25 +195,8 @@ def simulate_trailing_stop(bars, entry_time, entry_price, direction,
             'trail_details': []
         }
     
-    # Convert ticks to price points (NQ: 4 ticks = 1 point)
-    sl_points = sl_ticks * TICK_SIZE
-    tp_points = tp_ticks * TICK_SIZE
-    activation_points = activation_ticks * TICK_SIZE
-    trail_distance_points = trail_distance_ticks * TICK_SIZE
-    
-    # Calculate fixed SL and TP levels
-    if direction == 'LONG':
-        fixed_sl = entry_price - sl_points
-        fixed_tp = entry_price + tp_points
-    else:  # SHORT
-        fixed_sl = entry_price + sl_points
-        fixed_tp = entry_price - tp_points
-    
-    # Time-based limit: search up to 10 minutes after entry
-    max_time = entry_time + timedelta(minutes=10)
-    
     # Find bars in the trade window
-    bars_in_window = [b for b in bars if entry_time <= b['timestamp'] <= max_time]
+    bars_in_window = bars_within_horizon(bars, entry_time, horizon)
     
     if not bars_in_window:
         return {
@@ -187,160 +209,357 @@ def simulate_trailing_stop(bars, entry_time, entry_price, direction,
             'trail_details': []
         }
     
+    scan = scan_trailing_stop(
+        [b['close'] for b in bars_in_window], 0, len(bars_in_window),
+        entry_price, direction, sl_ticks, tp_ticks,
+        activation_ticks, trail_distance_ticks, record=record
+    )
+    
+    events = scan['events']
+    if record == 'full':
+        trail_details = [
+            {
+                'time': bars_in_window[i]['time_str'],
+                'action': action,
+                'price': price,
+                'trail_stop': trail_stop,
+                'pnl_ticks': pnl_ticks
+            }
+            for i, action, price, trail_stop, pnl_ticks in events
+        ]
+    elif record == 'compact':
+        trail_details = {
+            'time': array('d', [to_epoch_seconds(bars_in_window[i]['timestamp']) for i in events['index']]),
+            'action': events['action'],
+            'price': events['price'],
+            'trail_stop': events['trail_stop'],
+            'pnl_ticks': events['pnl_ticks']
+        }
+    else:
+        trail_details = []
+    
+    return {
+        'exit_type': scan['exit_type'],
+        'exit_time': bars_in_window[scan['exit_index']]['timestamp'],
+        'exit_price': scan['exit_price'],
+        'exit_pnl_ticks': scan['exit_pnl_ticks'],
+        'trail_activated': scan['trail_activated'],
+        'max_profit_ticks': scan['max_profit_ticks'],
+        'trail_details': trail_details
+    }
+
+
+def _new_event_log(record):
+    """Trail event container for a recording level (None when not recording)."""
+    if record == 'full':
+        return []
+    if record == 'compact':
+        return {'index': array('i'), 'action': array('b'), 'price': array('d'),
+                'trail_stop': array('d'), 'pnl_ticks': array('d')}
+    return None
+
+
+def _log_event(events, index, action_code, price, trail_stop, pnl_ticks):
+    if isinstance(events, list):
+        events.append((index, TRAIL_ACTIONS[action_code], price, trail_stop, pnl_ticks))
+    else:
+        events['index'].append(index)
+        events['action'].append(action_code)
+        events['price'].append(price)
+        events['trail_stop'].append(trail_stop)
+        events['pnl_ticks'].append(pnl_ticks)
+
+
+def scan_trailing_stop(closes, lo, hi, entry_price, direction,
+                       sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks,
+                       record='none'):
+    """
+    Trailing stop state machine over closes[lo:hi] (any indexable sequence,
+    e.g. a list or a shared-memory view). Window must be non-empty.
+    
+    Returns dict with:
+    - exit_type: 'TP', 'SL', 'TRAIL' or 'TIMEOUT'
+    - exit_index: Index into closes of the exit bar
+    - exit_price, exit_pnl_ticks, trail_activated, max_profit_ticks
+    - events: trail movements - None for record='none', parallel arrays
+      (index, action code, price, trail_stop, pnl_ticks) for 'compact',
+      (index, action, price, trail_stop, pnl_ticks) tuples for 'full'
+    """
+    # Convert ticks to price points (NQ: 4 ticks = 1 point)
+    sl_points = sl_ticks * TICK_SIZE
+    tp_points = tp_ticks * TICK_SIZE
+    activation_points = activation_ticks * TICK_SIZE
+    trail_distance_points = trail_distance_ticks * TICK_SIZE
+    is_long = direction == 'LONG'
+    
+    # Calculate fixed SL and TP levels
+    if is_long:
+        fixed_sl = entry_price - sl_points
+        fixed_tp = entry_price + tp_points
+    else:  # SHORT
+        fixed_sl = entry_price + sl_points
+        fixed_tp = entry_price - tp_points
+    
     # Initialize trailing stop state
     trail_activated = False
     trail_stop = None
     max_profit_points = 0
-    trail_details = []
+    events = _new_event_log(record)
     
-    # Scan bars
-    for bar in bars_in_window:
-        close = bar['close']
+    def result(exit_type, index, price, pnl_ticks):
+        return {
+            'exit_type': exit_type,
+            'exit_index': index,
+            'exit_price': price,
+            'exit_pnl_ticks': pnl_ticks,
+            'trail_activated': trail_activated,
+            'max_profit_ticks': max_profit_points / TICK_SIZE,
+            'events': events
+        }
+    
+    for i in range(lo, hi):
+        close = closes[i]
         
         # Calculate current P&L
-        if direction == 'LONG':
-            current_pnl_points = close - entry_price
-        else:
-            current_pnl_points = entry_price - close
-        
-        current_pnl_ticks = current_pnl_points / TICK_SIZE
+        current_pnl_points = close - entry_price if is_long else entry_price - close
         
         # Track max profit
         if current_pnl_points > max_profit_points:
             max_profit_points = current_pnl_points
         
         # Check fixed TP first (always honored)
-        if direction == 'LONG' and close >= fixed_tp:
-            return {
-                'exit_type': 'TP',
-                'exit_time': bar['timestamp'],
-                'exit_price': close,
-                'exit_pnl_ticks': tp_ticks,
-                'trail_activated': trail_activated,
-                'max_profit_ticks': max_profit_points / TICK_SIZE,
-                'trail_details': trail_details
-            }
-        elif direction == 'SHORT' and close <= fixed_tp:
-            return {
-                'exit_type': 'TP',
-                'exit_time': bar['timestamp'],
-                'exit_price': close,
-                'exit_pnl_ticks': tp_ticks,
-                'trail_activated': trail_activated,
-                'max_profit_ticks': max_profit_points / TICK_SIZE,
-                'trail_details': trail_details
-            }
+        if (is_long and close >= fixed_tp) or (not is_long and close <= fixed_tp):
+            return result('TP', i, close, tp_ticks)
         
         # Check if trailing stop should activate
         if not trail_activated and current_pnl_points >= activation_points:
             trail_activated = True
             # Set initial trail stop
-            if direction == 'LONG':
-                trail_stop = close - trail_distance_points
-            else:
-                trail_stop = close + trail_distance_points
-            trail_details.append({
-                'time': bar['time_str'],
-                'action': 'ACTIVATED',
-                'price': close,
-                'trail_stop': trail_stop,
-                'pnl_ticks': current_pnl_ticks
-            })
+            trail_stop = close - trail_distance_points if is_long else close + trail_distance_points
+            if events is not None:
+                _log_event(events, i, 0, close, trail_stop, current_pnl_points / TICK_SIZE)
         
         # Update trailing stop if activated
         if trail_activated:
-            if direction == 'LONG':
+            if is_long:
                 # Move trail up only
                 new_trail = close - trail_distance_points
                 if new_trail > trail_stop:
                     trail_stop = new_trail
-                    trail_details.append({
-                        'time': bar['time_str'],
-                        'action': 'TRAIL_UP',
-                        'price': close,
-                        'trail_stop': trail_stop,
-                        'pnl_ticks': current_pnl_ticks
-                    })
+                    if events is not None:
+                        _log_event(events, i, 1, close, trail_stop, current_pnl_points / TICK_SIZE)
                 
                 # Check if trail stop hit
                 if close <= trail_stop:
-                    exit_pnl_ticks = (trail_stop - entry_price) / TICK_SIZE
-                    return {
-                        'exit_type': 'TRAIL',
-                        'exit_time': bar['timestamp'],
-                        'exit_price': trail_stop,
-                        'exit_pnl_ticks': exit_pnl_ticks,
-                        'trail_activated': True,
-                        'max_profit_ticks': max_profit_points / TICK_SIZE,
-                        'trail_details': trail_details
-                    }
+                    return result('TRAIL', i, trail_stop, (trail_stop - entry_price) / TICK_SIZE)
             else:  # SHORT
                 # Move trail down only
                 new_trail = close + trail_distance_points
                 if new_trail < trail_stop:
                     trail_stop = new_trail
-                    trail_details.append({
-                        'time': bar['time_str'],
-                        'action': 'TRAIL_DN',
-                        'price': close,
-                        'trail_stop': trail_stop,
-                        'pnl_ticks': current_pnl_ticks
-                    })
+                    if events is not None:
+                        _log_event(events, i, 2, close, trail_stop, current_pnl_points / TICK_SIZE)
                 
                 # Check if trail stop hit
                 if close >= trail_stop:
-                    exit_pnl_ticks = (entry_price - trail_stop) / TICK_SIZE
-                    return {
-                        'exit_type': 'TRAIL',
-                        'exit_time': bar['timestamp'],
-                        'exit_price': trail_stop,
-                        'exit_pnl_ticks': exit_pnl_ticks,
-                        'trail_activated': True,
-                        'max_profit_ticks': max_profit_points / TICK_SIZE,
-                        'trail_details': trail_details
-                    }
+                    return result('TRAIL', i, trail_stop, (entry_price - trail_stop) / TICK_SIZE)
         
         # Check fixed SL (if trail not activated or price went below trail)
-        if direction == 'LONG' and close <= fixed_sl:
-            return {
-                'exit_type': 'SL',
-                'exit_time': bar['timestamp'],
-                'exit_price': close,
-                'exit_pnl_ticks': -sl_ticks,
-                'trail_activated': trail_activated,
-                'max_profit_ticks': max_profit_points / TICK_SIZE,
-                'trail_details': trail_details
-            }
-        elif direction == 'SHORT' and close >= fixed_sl:
-            return {
-                'exit_type': 'SL',
-                'exit_time': bar['timestamp'],
-                'exit_price': close,
-                'exit_pnl_ticks': -sl_ticks,
-                'trail_activated': trail_activated,
-                'max_profit_ticks': max_profit_points / TICK_SIZE,
-                'trail_details': trail_details
-            }
+        if (is_long and close <= fixed_sl) or (not is_long and close >= fixed_sl):
+            return result('SL', i, close, -sl_ticks)
     
     # Timeout - use last bar price
-    last_bar = bars_in_window[-1]
+    last_close = closes[hi - 1]
+    pnl_points = last_close - entry_price if is_long else entry_price - last_close
+    return result('TIMEOUT', hi - 1, last_close, pnl_points / TICK_SIZE)
+
+
+def scan_scale_out(closes, lo, hi, entry_price, direction, legs):
+    """
+    Multi-leg (scale-out) exit over closes[lo:hi] in a single pass.
+
+    legs: list of dicts with size (contracts), sl_ticks, tp_ticks and
+    optionally activation_ticks / trail_distance_ticks (a trailing leg,
+    same rules as scan_trailing_stop; without them the leg is fixed SL/TP).
+    All legs advance together bar by bar; each stops at its first exit.
+
+    Returns dict with:
+    - legs: per leg (size, exit_type, exit_index, exit_price, pnl_ticks)
+    - exit_pnl_ticks: blended P&L per contract (size-weighted average)
+    - total_pnl_ticks: P&L of the whole position in contract-ticks
+    - exit_type: leg exit types joined with '+', e.g. 'TP+TRAIL'
+    - exit_index: bar of the last leg's exit
+    - trail_activated, max_profit_ticks
+    """
+    is_long = direction == 'LONG'
+    sign = 1 if is_long else -1
+    n = len(legs)
+    tp_prices = [entry_price + sign * leg['tp_ticks'] * TICK_SIZE for leg in legs]
+    sl_prices = [entry_price - sign * leg['sl_ticks'] * TICK_SIZE for leg in legs]
+    activation = [leg.get('activation_ticks') for leg in legs]
+    distance = [leg.get('trail_distance_ticks', 0) * TICK_SIZE for leg in legs]
+    trail_stops = [None] * n
+    exits = [None] * n
+    open_legs = list(range(n))
+    max_profit_points = 0
+
+    for i in range(lo, hi):
+        close = closes[i]
+        profit_points = sign * (close - entry_price)
+        if profit_points > max_profit_points:
+            max_profit_points = profit_points
+
+        still_open = []
+        for k in open_legs:
+            leg = legs[k]
+            if (close >= tp_prices[k]) if is_long else (close <= tp_prices[k]):
+                exits[k] = ('TP', i, close, leg['tp_ticks'])
+                continue
+            if activation[k] is not None:
+                if trail_stops[k] is None and profit_points >= activation[k] * TICK_SIZE:
+                    trail_stops[k] = close - sign * distance[k]
+                if trail_stops[k] is not None:
+                    trail_stops[k] = max(trail_stops[k], close - distance[k]) if is_long else \
+                        min(trail_stops[k], close + distance[k])
+                    if (close <= trail_stops[k]) if is_long else (close >= trail_stops[k]):
+                        exits[k] = ('TRAIL', i, trail_stops[k], sign * (trail_stops[k] - entry_price) / TICK_SIZE)
+                        continue
+            if (close <= sl_prices[k]) if is_long else (close >= sl_prices[k]):
+                exits[k] = ('SL', i, close, -leg['sl_ticks'])
+                continue
+            still_open.append(k)
+        open_legs = still_open
+        if not open_legs:
+            break
+
+    if open_legs:
+        last_close = closes[hi - 1]
+        for k in open_legs:
+            exits[k] = ('TIMEOUT', hi - 1, last_close, sign * (last_close - entry_price) / TICK_SIZE)
+
+    contracts = sum(leg['size'] for leg in legs)
+    total = sum(leg['size'] * exit[3] for leg, exit in zip(legs, exits))
+    return {
+        'legs': [
+            {'size': leg['size'], 'exit_type': exit[0], 'exit_index': exit[1], 'exit_price': exit[2],
+             'pnl_ticks': exit[3]}
+            for leg, exit in zip(legs, exits)
+        ],
+        'exit_pnl_ticks': total / contracts if contracts else 0,
+        'total_pnl_ticks': total,
+        'exit_type': '+'.join(exit[0] for exit in exits),
+        'exit_index': max(exit[1] for exit in exits),
+        'trail_activated': any(stop is not None for stop in trail_stops),
+        'max_profit_ticks': max_profit_points / TICK_SIZE
+    }
+
+
+def _confluence_drop_record(bar, direction, entry_price, entry_confluence):
+    """Confluence drop exit at bar's close."""
     if direction == 'LONG':
-        exit_pnl_ticks = (last_bar['close'] - entry_price) / TICK_SIZE
+        hypo_pnl_ticks = (bar['close'] - entry_price) / TICK_SIZE
+        exit_confluence = bar.get('bull_conf', 0)
     else:
-        exit_pnl_ticks = (entry_price - last_bar['close']) / TICK_SIZE
-    
+        hypo_pnl_ticks = (entry_price - bar['close']) / TICK_SIZE
+        exit_confluence = bar.get('bear_conf', 0)
     return {
-        'exit_type': 'TIMEOUT',
-        'exit_time': last_bar['timestamp'],
-        'exit_price': last_bar['close'],
-        'exit_pnl_ticks': exit_pnl_ticks,
-        'trail_activated': trail_activated,
-        'max_profit_ticks': max_profit_points / TICK_SIZE,
-        'trail_details': trail_details
+        'time': bar['time_str'],
+        'timestamp': bar['timestamp'],
+        'price': bar['close'],
+        'entry_confluence': entry_confluence,
+        'exit_confluence': exit_confluence,
+        'hypothetical_pnl_ticks': hypo_pnl_ticks
     }
 
 
-def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction, entry_price, min_confluence=6):
+def _adverse_flip_record(bar, indicator, direction, entry_price):
+    """Single indicator flip exit at bar's close."""
+    if direction == 'LONG':
+        hypo_pnl_ticks = (bar['close'] - entry_price) / TICK_SIZE
+    else:
+        hypo_pnl_ticks = (entry_price - bar['close']) / TICK_SIZE
+    return {
+        'indicator': indicator,
+        'time': bar['time_str'],
+        'timestamp': bar['timestamp'],
+        'price': bar['close'],
+        'hypothetical_pnl_ticks': hypo_pnl_ticks
+    }
+
+
+def confluence_threshold_exits(drop_index, entry_time, exit_time, direction, entry_price):
+    """
+    Confluence drop exit P&L for every precomputed threshold k in one go:
+    each k is a single lookup in the drop index, no bar rescans.
+    
+    Returns {k: hypothetical P&L ticks at the first bar after entry with
+    trade-side confluence < k, or None if it never drops before exit_time}.
+    """
+    store = drop_index['store']
+    lo, hi = find_window(store, entry_time, exit_time)
+    closes = store['closes']
+    sign = 1 if direction == 'LONG' else -1
+    side = drop_index['bull' if direction == 'LONG' else 'bear']
+    exits = {}
+    for k in side:
+        j = next_confluence_drop(drop_index, direction, k, lo + 1)
+        exits[k] = sign * (closes[j] - entry_price) / TICK_SIZE if hi - lo >= 2 and j < hi else None
+    return exits
+
+
+def time_stop_marks(store, entry_time, entry_price, direction, horizons_minutes, sl_ticks, tp_ticks):
+    """
+    Time-stop P&L of one trade at every horizon in one pass.
+    
+    Each horizon is a single binary search for the last bar at or before
+    entry + horizon (mark-to-market at its close). The fixed SL/TP is
+    scanned once over the longest horizon, so "SL/TP plus time stop" at
+    horizon h is the SL/TP exit if it came first, else the mark.
+    
+    Returns dict with 'mtm' and 'with_sltp' (P&L ticks per horizon, in
+    horizons_minutes order), or None without bars after entry. A horizon
+    with no bar between entry and entry + horizon, or past the last bar
+    of the data, is None in both lists.
+    """
+    times = store['times']
+    closes = store['closes']
+    start = to_epoch_seconds(entry_time)
+    lo = bisect_left(times, start)
+    hi = bisect_right(times, start + max(horizons_minutes) * 60)
+    if lo >= hi or not entry_price:
+        return None
+    
+    sign = 1 if direction == 'LONG' else -1
+    tp_price = entry_price + sign * tp_ticks * TICK_SIZE
+    sl_price = entry_price - sign * sl_ticks * TICK_SIZE
+    hit_index = hi
+    hit_pnl = 0
+    for i in range(lo, hi):
+        close = closes[i]
+        if (close >= tp_price) if sign > 0 else (close <= tp_price):
+            hit_index, hit_pnl = i, tp_ticks
+            break
+        if (close <= sl_price) if sign > 0 else (close >= sl_price):
+            hit_index, hit_pnl = i, -sl_ticks
+            break
+    
+    mtm = []
+    with_sltp = []
+    for minutes in horizons_minutes:
+        end = start + minutes * 60
+        i = bisect_right(times, end, lo, hi) - 1
+        if i < lo or end > times[-1]:
+            mtm.append(None)
+            with_sltp.append(None)
+            continue
+        pnl = sign * (closes[i] - entry_price) / TICK_SIZE
+        mtm.append(pnl)
+        with_sltp.append(hit_pnl if hit_index <= i else pnl)
+    return {'mtm': mtm, 'with_sltp': with_sltp}
+
+
+def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction, entry_price, min_confluence=6,
+                                         drop_index=None, flip_index=None):
     """
     Analyze both:
     1. When confluence drops below threshold during the trade
@@ -353,9 +572,30 @@ def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction,
       - Confluence drop: BearConf drops below min_confluence
       - Indicator flip: any indicator goes DN→UP
     
+    drop_index (barstore.build_confluence_drop_index over the same bars)
+    turns the trade window and confluence drop into O(log n) / O(1) lookups;
+    flip_index (timelines.build_flip_index) finds the first adverse flip by
+    binary search over flip events. With both, no bars are rescanned.
+    
     Returns dict with both analyses
     """
-    trade_bars = find_bars_in_range(bars, entry_time, exit_time)
+    drop_at = None
+    flip_at = None
+    index = drop_index if drop_index is not None else flip_index
+    if index is not None:
+        store = index['store']
+        lo, hi = find_window(store, entry_time, exit_time)
+        trade_bars = store['bars'][lo:hi]
+        if drop_index is not None:
+            drop_at = next_confluence_drop(drop_index, direction, min_confluence, lo + 1)
+            if drop_at is not None:
+                drop_at -= lo
+        if flip_index is not None:
+            # (bar offset in trade, indicator) or False when there is no flip
+            flip = find_adverse_flip(flip_index, direction, lo + 1, hi)
+            flip_at = (flip[0] - lo, flip[1]) if flip else False
+    else:
+        trade_bars = find_bars_in_range(bars, entry_time, exit_time)
     
     if len(trade_bars) < 2:
         return {
@@ -376,8 +616,18 @@ def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction,
     else:
         entry_confluence = entry_bar.get('bear_conf', 0)
     
+    if drop_at is not None and drop_at < len(trade_bars):
+        first_confluence_drop = _confluence_drop_record(trade_bars[drop_at], direction, entry_price, entry_confluence)
+    if flip_at:
+        first_adverse_flip = _adverse_flip_record(trade_bars[flip_at[0]], flip_at[1], direction, entry_price)
+    
+    if drop_at is not None and flip_at is not None:
+        scan_bars = 0  # Both answered by the indexes
+    else:
+        scan_bars = len(trade_bars)
+    
     # Scan bars for both conditions
-    for i in range(1, len(trade_bars)):
+    for i in range(1, scan_bars):
         prev_bar = trade_bars[i - 1]
         curr_bar = trade_bars[i]
         
@@ -387,24 +637,12 @@ def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction,
         else:
             curr_confluence = curr_bar.get('bear_conf', 0)
         
-        if curr_confluence < min_confluence and first_confluence_drop is None:
-            if direction == 'LONG':
-                hypo_pnl_ticks = (curr_bar['close'] - entry_price) / TICK_SIZE
-            else:
-                hypo_pnl_ticks = (entry_price - curr_bar['close']) / TICK_SIZE
-            
-            first_confluence_drop = {
-                'time': curr_bar['time_str'],
-                'timestamp': curr_bar['timestamp'],
-                'price': curr_bar['close'],
-                'entry_confluence': entry_confluence,
-                'exit_confluence': curr_confluence,
-                'hypothetical_pnl_ticks': hypo_pnl_ticks
-            }
+        if drop_at is None and curr_confluence < min_confluence and first_confluence_drop is None:
+            first_confluence_drop = _confluence_drop_record(curr_bar, direction, entry_price, entry_confluence)
         
         # === Check single indicator flips ===
-        if first_adverse_flip is None:
-            for ind in ['RR', 'DT', 'VY', 'ET', 'SW', 'T3P', 'AAA']:
+        if flip_at is None and first_adverse_flip is None:
+            for ind in FLIP_INDICATORS:
                 prev_state = prev_bar['indicators'].get(ind)
                 curr_state = curr_bar['indicators'].get(ind)
                 
@@ -416,18 +654,7 @@ def analyze_indicator_flips_during_trade(bars, entry_time, exit_time, direction,
                         adverse = True
                     
                     if adverse:
-                        if direction == 'LONG':
-                            hypo_pnl_ticks = (curr_bar['close'] - entry_price) / TICK_SIZE
-                        else:
-                            hypo_pnl_ticks = (entry_price - curr_bar['close']) / TICK_SIZE
-                        
-                        first_adverse_flip = {
-                            'indicator': ind,
-                            'time': curr_bar['time_str'],
-                            'timestamp': curr_bar['timestamp'],
-                            'price': curr_bar['close'],
-                            'hypothetical_pnl_ticks': hypo_pnl_ticks
-                        }
+                        first_adverse_flip = _adverse_flip_record(curr_bar, ind, direction, entry_price)
                         break  # Found first flip, stop checking other indicators
     
     return {
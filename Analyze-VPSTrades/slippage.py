@@ -0,0 +1,190 @@
+"""
+Empirical slippage model for the exit simulations.
+
+Logged fills carry entry_slippage_ticks (ENTRY FILLED) and
+exit_slippage_ticks per exit reason (TRADE CLOSED), positive = cost. They
+are kept as compact integer histograms: entry overall and per entry hour,
+exit overall and per reason (SL / TRAIL / TP). Groups with fewer than
+SLIPPAGE_MIN_SAMPLES fills fall back to the pooled histogram.
+
+The simulators assume perfect fills; apply_slippage_model adds a cost to
+each simulated result after the fact, and apply_window_slippage attaches
+each trade window's cost per exit type so the sweep, optimizer and
+walk-forward totals are net of it (one lookup per trade, so simulations
+are no slower):
+- expectation: histogram means
+- sample: one draw per trade through the histograms' inverse CDFs. The
+  entry draw and the exit uniform are shared by every config of a trade
+  (common random numbers), so config comparisons are not blurred by noise,
+  and seeded per trade so every backend gives the same numbers.
+"""
+
+import os
+import json
+import random
+from bisect import bisect_right
+from collections import Counter
+
+from config import SLIPPAGE_MIN_SAMPLES, SLIPPAGE_SEED
+
+SLIPPAGE_MODES = ['expectation', 'sample', 'off']
+
+# Simulated exit types -> logged exit reasons (others use the pooled exit histogram)
+EXIT_REASONS = {'SL': 'SL', 'TRAIL': 'TRAIL', 'TP': 'TP'}
+
+# Exit types a trade window can end with in the multi-day simulations
+WINDOW_EXIT_TYPES = ['TP', 'SL', 'TRAIL', 'TIMEOUT']
+
+
+def build_distribution(samples):
+    """Histogram of integer slippage samples: values, cumulative counts, n, mean."""
+    counts = Counter(int(round(s)) for s in samples)
+    values = sorted(counts)
+    cum = []
+    running = 0
+    for v in values:
+        running += counts[v]
+        cum.append(running)
+    n = len(samples)
+    return {'values': values, 'cum': cum, 'n': n, 'mean': sum(samples) / n if n else 0.0}
+
+
+def distribution_quantile(dist, u):
+    """Inverse CDF of a histogram at u in [0, 1)."""
+    if not dist['n']:
+        return 0
+    return dist['values'][bisect_right(dist['cum'], u * dist['n'])]
+
+
+def calibrate_slippage_model(roundtrips, source=''):
+    """
+    Build the model from complete round-trips with logged fills.
+    Returns None when no trade has slippage data.
+    """
+    entry = []
+    entry_by_hour = {}
+    exits = []
+    exit_by_reason = {}
+    for rt in roundtrips:
+        if not rt.get('complete'):
+            continue
+        hour = rt['entry']['timestamp'].hour
+        slip = rt.get('entry_slippage_ticks')
+        if slip is not None:
+            entry.append(slip)
+            entry_by_hour.setdefault(hour, []).append(slip)
+        slip = rt.get('exit_slippage_ticks')
+        if slip is not None:
+            exits.append(slip)
+            exit_by_reason.setdefault(rt.get('exit_reason', 'UNKNOWN'), []).append(slip)
+    if not entry and not exits:
+        return None
+    return {
+        'source': source,
+        'trades': max(len(entry), len(exits)),
+        'entry': build_distribution(entry),
+        'entry_by_hour': {str(h): build_distribution(s) for h, s in sorted(entry_by_hour.items())},
+        'exit': build_distribution(exits),
+        'exit_by_reason': {r: build_distribution(s) for r, s in sorted(exit_by_reason.items())}
+    }
+
+
+def save_slippage_model(path, model):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(model, f, indent=1)
+
+
+def load_slippage_model(path):
+    """Model saved by save_slippage_model, or None if missing/unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def entry_distribution(model, hour):
+    dist = model['entry_by_hour'].get(str(hour))
+    return dist if dist and dist['n'] >= SLIPPAGE_MIN_SAMPLES else model['entry']
+
+
+def exit_distribution(model, exit_type):
+    dist = model['exit_by_reason'].get(EXIT_REASONS.get(exit_type))
+    return dist if dist and dist['n'] >= SLIPPAGE_MIN_SAMPLES else model['exit']
+
+
+def trade_slippage(model, entry_time, mode, exit_types):
+    """
+    Slippage (ticks) for one trade: returns (entry, {exit_type: exit}).
+    Sample mode seeds its draws from the entry time (SLIPPAGE_SEED).
+    """
+    entry_dist = entry_distribution(model, entry_time.hour)
+    if mode == 'sample':
+        rng = random.Random(f"{SLIPPAGE_SEED}:{entry_time.isoformat()}")
+        entry = distribution_quantile(entry_dist, rng.random())
+        u = rng.random()
+        return entry, {t: distribution_quantile(exit_distribution(model, t), u) for t in exit_types}
+    return entry_dist['mean'], {t: exit_distribution(model, t)['mean'] for t in exit_types}
+
+
+def _add_net(entry_fields, cost):
+    entry_fields['slippage_ticks'] = cost
+    entry_fields['trail_net_pnl'] = entry_fields['trail_pnl'] - cost
+
+
+def apply_slippage_model(roundtrips, model, mode):
+    """
+    Add slippage_ticks and trail_net_pnl to every trailing_stop_analysis and
+    scale_out_analysis entry (scale-out: entry cost plus size-weighted leg
+    exit costs, per contract).
+    """
+    if not model or mode == 'off':
+        return roundtrips
+    for rt in roundtrips:
+        trails = rt.get('trailing_stop_analysis') or {}
+        scales = rt.get('scale_out_analysis') or {}
+        if not trails and not scales:
+            continue
+        exit_types = {t['result']['exit_type'] for t in trails.values()}
+        for s in scales.values():
+            exit_types.update(leg['exit_type'] for leg in s['result']['legs'])
+        entry, exit_costs = trade_slippage(model, rt['entry']['timestamp'], mode, exit_types)
+        for t in trails.values():
+            _add_net(t, entry + exit_costs[t['result']['exit_type']])
+        for s in scales.values():
+            legs = s['result']['legs']
+            contracts = sum(leg['size'] for leg in legs)
+            exit_cost = sum(leg['size'] * exit_costs[leg['exit_type']] for leg in legs) / contracts
+            _add_net(s, entry + exit_cost)
+    return roundtrips
+
+
+def apply_window_slippage(windows, model, mode):
+    """
+    Add slippage ({exit_type: entry + exit cost}) to every trade window
+    (sweep.build_trade_windows); the multi-day simulations subtract it from
+    each simulated trade.
+    """
+    if not model or mode == 'off':
+        return windows
+    for w in windows:
+        entry, exit_costs = trade_slippage(model, w['entry_time'], mode, WINDOW_EXIT_TYPES)
+        w['slippage'] = {t: entry + cost for t, cost in exit_costs.items()}
+    return windows
+
+
+def format_slippage_model_lines(model):
+    """Summary lines of a model (means and sample counts)."""
+    lines = []
+    lines.append(f"Calibrated from {model['trades']} trades ({model['source'] or 'this session'})")
+    lines.append(f"  Entry: mean {model['entry']['mean']:+.2f}t (n={model['entry']['n']})")
+    lines.append(f"  Exit:  mean {model['exit']['mean']:+.2f}t (n={model['exit']['n']})")
+    for reason, dist in model['exit_by_reason'].items():
+        pooled = " -> pooled" if dist['n'] < SLIPPAGE_MIN_SAMPLES else ""
+        lines.append(f"    {reason:<8} mean {dist['mean']:+.2f}t (n={dist['n']}){pooled}")
+    hours = [f"{h}h {d['mean']:+.1f}t" for h, d in model['entry_by_hour'].items() if d['n'] >= SLIPPAGE_MIN_SAMPLES]
+    if hours:
+        lines.append("  Entry by hour: " + ", ".join(hours))
+    return lines
@@ -0,0 +1,472 @@
+"""
+Exit-parameter sweep.
+Expands SL/TP/activation/trail ranges into a full grid, simulates every
+combination over every trade with a process pool, and writes the results
+as an N-dimensional cube (JSON, row-major) plus a ranked text summary.
+
+Pool workers read the trade windows' bars from a shared-memory bar store
+(barstore.publish_bar_store), so worker startup and memory stay flat as
+workers are added.
+
+The scale-out sweep (run_scale_out_sweep) evaluates multi-leg exits the
+same way over the packed windows.
+
+Windows carrying a slippage model cost (slippage.apply_window_slippage)
+are scored net of it: total_pnl, wins and day_pnl are net, and the
+subtracted cost is kept in each result's slippage total.
+"""
+
+import os
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from config import (
+    SWEEP_RANGES, SWEEP_TOP_N, TICK_VALUE, SCALE_OUT_SWEEP_RANGES,
+    DEFAULT_SL_TICKS, DEFAULT_TP_TICKS
+)
+from barstore import (
+    build_bar_store, find_window, publish_bar_store, attach_bar_store
+)
+from simulation import simulate_trailing_stop, scan_trailing_stop, scan_scale_out, SIMULATION_WINDOW
+from overfit import cscv_pbo, deflated_best_sharpe, format_overfit_lines
+
+# Axis order of the cube (slowest-varying first)
+SWEEP_AXES = ['sl_ticks', 'tp_ticks', 'activation_ticks', 'trail_distance_ticks']
+
+# Exit types counted per combination
+SWEEP_EXIT_TYPES = ['TP', 'SL', 'TRAIL', 'TIMEOUT']
+
+# Axis order of the scale-out grid (main.py --scale-out)
+SCALE_OUT_AXES = ['first_target_ticks', 'activation_ticks', 'trail_distance_ticks']
+
+
+def parse_range_spec(spec):
+    """
+    Parse a range spec into a list of ints.
+    Accepts "start:stop:step" (stop inclusive), "start:stop" (step 1),
+    a comma list "30,40,60", or a single value "40".
+    """
+    spec = spec.strip()
+    if ':' in spec:
+        parts = [int(p) for p in spec.split(':')]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1
+        if step <= 0:
+            raise ValueError(f"Range step must be positive: {spec}")
+        return list(range(start, stop + 1, step))
+    return [int(p) for p in spec.split(',') if p.strip()]
+
+
+def default_sweep_ranges():
+    """Expand config.SWEEP_RANGES tuples into value lists per axis."""
+    return {
+        axis: list(range(start, stop + 1, step))
+        for axis, (start, stop, step) in SWEEP_RANGES.items()
+    }
+
+
+def expand_sweep_grid(ranges):
+    """
+    Expand per-axis value lists into the full grid.
+    Returns list of (sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks)
+    tuples in row-major cube order.
+    """
+    return list(itertools.product(*(ranges[axis] for axis in SWEEP_AXES)))
+
+
+def build_trade_windows(roundtrips, bars, day=None, horizon=SIMULATION_WINDOW):
+    """
+    Cut each complete round-trip's simulation window (entry to entry +
+    horizon) out of the BAR data. Workers only receive these windows, never
+    the full bar list.
+
+    Returns list of dicts with day, entry_time, entry_price, direction,
+    actual_pnl and bars (the BAR dicts inside the simulation window).
+    """
+    store = build_bar_store(bars)
+    windows = []
+    for rt in roundtrips:
+        if not rt['complete']:
+            continue
+        entry_time = rt['entry']['timestamp']
+        entry_price = rt['entry'].get('price', 0)
+        if not entry_price:
+            continue
+        lo, hi = find_window(store, entry_time, entry_time + horizon)
+        if lo >= hi:
+            continue
+        windows.append({
+            'day': day or entry_time.strftime('%Y-%m-%d'),
+            'entry_time': entry_time,
+            'entry_price': entry_price,
+            'direction': rt['direction'],
+            'actual_pnl': rt['pnl_ticks'],
+            'bars': bars[lo:hi]
+        })
+    return windows
+
+
+def _new_combo_result():
+    return {
+        'trades': 0,
+        'wins': 0,
+        'total_pnl': 0.0,
+        'slippage': 0.0,
+        'exits': dict.fromkeys(SWEEP_EXIT_TYPES, 0),
+        'day_pnl': {}
+    }
+
+
+def _add_trade(result, day, exit_type, pnl, cost=0.0):
+    pnl -= cost
+    result['trades'] += 1
+    result['total_pnl'] += pnl
+    result['slippage'] += cost
+    if pnl > 0:
+        result['wins'] += 1
+    if exit_type in result['exits']:
+        result['exits'][exit_type] += 1
+    result['day_pnl'][day] = result['day_pnl'].get(day, 0.0) + pnl
+
+
+def evaluate_combo(windows, combo):
+    """
+    Simulate one (sl, tp, activation, trail) combination over all trade windows.
+    Returns dict with trades, wins, total_pnl, exit type counts and P&L per day.
+    """
+    sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks = combo
+    result = _new_combo_result()
+    for w in windows:
+        sim = simulate_trailing_stop(
+            w['bars'], w['entry_time'], w['entry_price'], w['direction'],
+            sl_ticks=sl_ticks, tp_ticks=tp_ticks,
+            activation_ticks=activation_ticks,
+            trail_distance_ticks=trail_distance_ticks,
+            record='none', horizon=None  # Window already cut to the horizon
+        )
+        _add_trade(result, w['day'], sim['exit_type'], sim['exit_pnl_ticks'],
+                   w.get('slippage', {}).get(sim['exit_type'], 0.0))
+    return result
+
+
+def pack_trade_windows(windows):
+    """
+    Concatenate the windows' bars into one bar store for sharing.
+    Returns (store, specs) where specs are (day, entry_price, direction, lo,
+    hi, slippage) tuples locating each window in the store.
+    """
+    all_bars = []
+    specs = []
+    for w in windows:
+        lo = len(all_bars)
+        all_bars.extend(w['bars'])
+        specs.append((w['day'], w['entry_price'], w['direction'], lo, len(all_bars), w.get('slippage', {})))
+    return build_bar_store(all_bars), specs
+
+
+def evaluate_packed_combo(closes, specs, combo):
+    """evaluate_combo over packed windows (closes may be a shared-memory view)."""
+    sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks = combo
+    result = _new_combo_result()
+    for day, entry_price, direction, lo, hi, slippage in specs:
+        sim = scan_trailing_stop(
+            closes, lo, hi, entry_price, direction,
+            sl_ticks, tp_ticks, activation_ticks, trail_distance_ticks
+        )
+        _add_trade(result, day, sim['exit_type'], sim['exit_pnl_ticks'], slippage.get(sim['exit_type'], 0.0))
+    return result
+
+
+# Shared bar store and window specs for pool workers (set once per worker by the initializer)
+_worker_store = None
+_worker_specs = None
+
+
+def _init_sweep_worker(descriptor, specs):
+    global _worker_store, _worker_specs
+    _worker_store = attach_bar_store(descriptor)
+    _worker_specs = specs
+
+
+def _evaluate_combo_block(block):
+    return [evaluate_packed_combo(_worker_store['closes'], _worker_specs, combo) for combo in block]
+
+
+def _run_packed_pool(windows, blocks, block_func, workers):
+    """Publish the packed windows to shared memory and map block_func over a process pool."""
+    store, specs = pack_trade_windows(windows)
+    shm, descriptor = publish_bar_store(store)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                 initargs=(descriptor, specs)) as executor:
+            for block_results in executor.map(block_func, blocks):
+                results.extend(block_results)
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+
+def run_sweep(windows, grid, workers=None, chunk_size=None):
+    """
+    Evaluate every grid combination over the trade windows.
+
+    workers=1 runs serially in-process; otherwise combos are split into
+    blocks of chunk_size and fanned out over a process pool. The windows'
+    bars are published once to shared memory; each worker attaches by name
+    and only receives the small per-window specs.
+    Returns list of per-combo results in grid order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(grid) < 2:
+        return [evaluate_combo(windows, combo) for combo in grid]
+
+    if not chunk_size:
+        # ~4 blocks per worker balances load without too much IPC overhead
+        chunk_size = max(1, -(-len(grid) // (workers * 4)))
+    blocks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    return _run_packed_pool(windows, blocks, _evaluate_combo_block, workers)
+
+
+def default_scale_out_ranges():
+    """Expand config.SCALE_OUT_SWEEP_RANGES tuples into value lists per axis."""
+    return {
+        axis: list(range(start, stop + 1, step))
+        for axis, (start, stop, step) in SCALE_OUT_SWEEP_RANGES.items()
+    }
+
+
+def scale_out_legs(combo, contracts, sl_ticks=DEFAULT_SL_TICKS, tp_ticks=DEFAULT_TP_TICKS):
+    """
+    Legs of one scale-out grid point (first_target, activation, trail):
+    1 contract off at the first target, the other contracts-1 trailed.
+    All legs keep the fixed SL; the runner keeps the fixed TP.
+    """
+    first_target_ticks, activation_ticks, trail_distance_ticks = combo
+    return [
+        {'size': 1, 'sl_ticks': sl_ticks, 'tp_ticks': first_target_ticks},
+        {'size': contracts - 1, 'sl_ticks': sl_ticks, 'tp_ticks': tp_ticks,
+         'activation_ticks': activation_ticks, 'trail_distance_ticks': trail_distance_ticks},
+    ]
+
+
+def evaluate_scale_out_combo(closes, specs, legs):
+    """
+    Scale-out legs over packed windows. P&L (and slippage: size-weighted
+    leg costs) is blended per contract; exit counts are by the runner (last
+    leg) exit type.
+    """
+    result = _new_combo_result()
+    for day, entry_price, direction, lo, hi, slippage in specs:
+        sim = scan_scale_out(closes, lo, hi, entry_price, direction, legs)
+        contracts = sum(leg['size'] for leg in sim['legs'])
+        cost = sum(leg['size'] * slippage.get(leg['exit_type'], 0.0) for leg in sim['legs']) / contracts
+        _add_trade(result, day, sim['legs'][-1]['exit_type'], sim['exit_pnl_ticks'], cost)
+    return result
+
+
+def _evaluate_scale_out_block(block):
+    return [evaluate_scale_out_combo(_worker_store['closes'], _worker_specs, legs) for legs in block]
+
+
+def run_scale_out_sweep(windows, legs_grid, workers=None):
+    """
+    Evaluate every leg set in legs_grid over the trade windows (same
+    pool/shared-memory layout as run_sweep). All windows are packed into
+    one close array, so each leg set is a single pass over every trade.
+    Returns list of per-leg-set results in grid order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(legs_grid) < 2:
+        store, specs = pack_trade_windows(windows)
+        return [evaluate_scale_out_combo(store['closes'], specs, legs) for legs in legs_grid]
+
+    chunk_size = max(1, -(-len(legs_grid) // (workers * 4)))
+    blocks = [legs_grid[i:i + chunk_size] for i in range(0, len(legs_grid), chunk_size)]
+    return _run_packed_pool(windows, blocks, _evaluate_scale_out_block, workers)
+
+
+def merge_sweep_results(parts):
+    """
+    Merge per-combo result lists computed on disjoint trade sets (e.g. one
+    list per day, same grid order). Parts are summed in the order given so
+    the merged totals are identical however the parts were scheduled.
+    """
+    merged = []
+    for combo_parts in zip(*parts):
+        result = _new_combo_result()
+        for part in combo_parts:
+            result['trades'] += part['trades']
+            result['wins'] += part['wins']
+            result['total_pnl'] += part['total_pnl']
+            result['slippage'] += part.get('slippage', 0.0)  # Units journaled before slippage was tracked
+            for exit_type in SWEEP_EXIT_TYPES:
+                result['exits'][exit_type] += part['exits'][exit_type]
+            for day, pnl in part['day_pnl'].items():
+                result['day_pnl'][day] = result['day_pnl'].get(day, 0.0) + pnl
+        merged.append(result)
+    return merged
+
+
+def write_sweep_cube(filepath, ranges, grid, results, days):
+    """
+    Write sweep results as an N-dimensional cube.
+    Metrics are flat row-major lists over SWEEP_AXES; day_pnl_ticks has an
+    extra trailing axis over `days`. P&L metrics are net of slippage_ticks.
+    """
+    metrics = {
+        'total_pnl_ticks': [r['total_pnl'] for r in results],
+        'slippage_ticks': [r['slippage'] for r in results],
+        'trades': [r['trades'] for r in results],
+        'win_rate': [(r['wins'] / r['trades'] * 100) if r['trades'] else 0 for r in results],
+    }
+    for exit_type in SWEEP_EXIT_TYPES:
+        metrics[f'exit_{exit_type}'] = [r['exits'][exit_type] for r in results]
+
+    cube = {
+        'axes': [{'name': axis, 'values': ranges[axis]} for axis in SWEEP_AXES],
+        'shape': [len(ranges[axis]) for axis in SWEEP_AXES],
+        'order': 'row-major',
+        'days': days,
+        'metrics': metrics,
+        'day_pnl_ticks': [r['day_pnl'].get(day, 0.0) for r in results for day in days]
+    }
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(cube, f)
+    return cube
+
+
+def load_sweep_cube(filepath):
+    """Load a cube written by write_sweep_cube; rebuilds the grid tuples."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        cube = json.load(f)
+    ranges = {axis['name']: axis['values'] for axis in cube['axes']}
+    cube['grid'] = expand_sweep_grid(ranges)
+    return cube
+
+
+def slippage_note(slippage_mode):
+    """Header line saying whether the simulated P&L is net of a slippage model."""
+    if slippage_mode:
+        return f"P&L is net of the slippage model ({slippage_mode}); Slip is the cost subtracted."
+    return "P&L assumes perfect fills (no slippage model applied; see --calibrate-slippage, --slippage)."
+
+
+def format_sweep_summary(label, ranges, grid, results, days, top_n=SWEEP_TOP_N, slippage_mode=None):
+    """
+    Ranked text summary of the sweep (best total P&L first).
+    slippage_mode names the model the totals are net of (None: gross).
+    """
+    ranked = sorted(range(len(grid)), key=lambda i: results[i]['total_pnl'], reverse=True)
+    trades = results[0]['trades'] if results else 0
+
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"EXIT PARAMETER SWEEP - {label}")
+    lines.append("=" * 100)
+    lines.append("")
+    lines.append(f"Days: {len(days)} ({days[0]} to {days[-1]})" if days else "Days: 0")
+    lines.append(f"Trades simulated per combination: {trades}")
+    lines.append(f"Combinations: {len(grid)}")
+    for axis in SWEEP_AXES:
+        values = ranges[axis]
+        lines.append(f"  {axis:<22} {len(values):>3} values: {values[0]}..{values[-1]}")
+    lines.append(slippage_note(slippage_mode))
+    lines.append("")
+
+    lines.append(f"TOP {min(top_n, len(grid))} COMBINATIONS BY TOTAL P&L")
+    lines.append("-" * 100)
+    slip_header = f" {'Slip':>7}" if slippage_mode else ""
+    lines.append(f"{'Rank':>4} {'SL':>5} {'TP':>5} {'Act':>5} {'Trail':>6} {'Trades':>7} {'Win%':>6} {'P&L':>10} {'$':>11}{slip_header}   {'TP':>4} {'SL':>4} {'TRAIL':>5} {'TMO':>4}")
+    lines.append("-" * 100)
+    for rank, i in enumerate(ranked[:top_n], 1):
+        sl, tp, act, trail = grid[i]
+        r = results[i]
+        wr = (r['wins'] / r['trades'] * 100) if r['trades'] else 0
+        ex = r['exits']
+        slip_str = f" {-r['slippage']:>+6.0f}t" if slippage_mode else ""
+        lines.append(
+            f"{rank:>4} {sl:>5} {tp:>5} {act:>5} {trail:>6} {r['trades']:>7} {wr:>5.0f}% "
+            f"{r['total_pnl']:>+9.0f}t {r['total_pnl'] * TICK_VALUE:>+11.2f}{slip_str}   "
+            f"{ex['TP']:>4} {ex['SL']:>4} {ex['TRAIL']:>5} {ex['TIMEOUT']:>4}"
+        )
+    lines.append("-" * 100)
+    lines.append("")
+
+    if ranked:
+        worst = results[ranked[-1]]['total_pnl']
+        median = results[ranked[len(ranked) // 2]]['total_pnl']
+        lines.append(f"P&L spread across grid: best {results[ranked[0]]['total_pnl']:+.0f}t | median {median:+.0f}t | worst {worst:+.0f}t")
+        lines.append("")
+    
+    # Selection-bias check over the day x combo P&L matrix
+    if len(days) >= 4 and len(grid) >= 2:
+        matrix = [[r['day_pnl'].get(day, 0.0) for r in results] for day in days]
+        cscv = cscv_pbo(matrix)
+        deflated = deflated_best_sharpe(matrix)
+        if cscv or deflated:
+            best_name = "---"
+            if deflated:
+                sl, tp, act, trail = grid[deflated['best_index']]
+                best_name = f"SL{sl}/TP{tp}/Act{act}/Trail{trail}"
+            lines.append("OVERFITTING DIAGNOSTICS (selection bias of best combination)")
+            lines.append("-" * 60)
+            lines.extend(format_overfit_lines(cscv, deflated, best_name, 'days'))
+            lines.append("")
+
+    lines.append("=" * 100)
+    return "\n".join(lines)
+
+
+def format_scale_out_summary(label, ranges, grid, results, days, contracts, top_n=SWEEP_TOP_N,
+                             slippage_mode=None):
+    """Ranked text summary of the scale-out sweep (best blended P&L first)."""
+    ranked = sorted(range(len(grid)), key=lambda i: results[i]['total_pnl'], reverse=True)
+    trades = results[0]['trades'] if results else 0
+
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"SCALE-OUT SWEEP - {label}")
+    lines.append("=" * 100)
+    lines.append("")
+    lines.append(f"Days: {len(days)} ({days[0]} to {days[-1]})" if days else "Days: 0")
+    lines.append(f"Trades simulated per configuration: {trades}")
+    lines.append(f"Position: {contracts} contracts - 1 off at T1, {contracts - 1} trailed "
+                 f"(SL {DEFAULT_SL_TICKS}t on all legs, runner TP {DEFAULT_TP_TICKS}t)")
+    lines.append(f"Configurations: {len(grid)}")
+    for axis in SCALE_OUT_AXES:
+        values = ranges[axis]
+        lines.append(f"  {axis:<22} {len(values):>3} values: {values[0]}..{values[-1]}")
+    lines.append("P&L is blended per contract; $ is for the whole position. Exit counts are the runner's.")
+    lines.append(slippage_note(slippage_mode))
+    lines.append("")
+
+    lines.append(f"TOP {min(top_n, len(grid))} CONFIGURATIONS BY BLENDED P&L")
+    lines.append("-" * 100)
+    slip_header = f" {'Slip/ct':>7}" if slippage_mode else ""
+    lines.append(f"{'Rank':>4} {'T1':>5} {'Act':>5} {'Trail':>6} {'Trades':>7} {'Win%':>6} {'P&L/ct':>10} {'$':>11}{slip_header}   {'TP':>4} {'SL':>4} {'TRAIL':>5} {'TMO':>4}")
+    lines.append("-" * 100)
+    for rank, i in enumerate(ranked[:top_n], 1):
+        t1, act, trail = grid[i]
+        r = results[i]
+        wr = (r['wins'] / r['trades'] * 100) if r['trades'] else 0
+        ex = r['exits']
+        slip_str = f" {-r['slippage']:>+6.0f}t" if slippage_mode else ""
+        lines.append(
+            f"{rank:>4} {t1:>5} {act:>5} {trail:>6} {r['trades']:>7} {wr:>5.0f}% "
+            f"{r['total_pnl']:>+9.0f}t {r['total_pnl'] * TICK_VALUE * contracts:>+11.2f}{slip_str}   "
+            f"{ex['TP']:>4} {ex['SL']:>4} {ex['TRAIL']:>5} {ex['TIMEOUT']:>4}"
+        )
+    lines.append("-" * 100)
+    lines.append("")
+
+    if ranked:
+        worst = results[ranked[-1]]['total_pnl']
+        median = results[ranked[len(ranked) // 2]]['total_pnl']
+        lines.append(f"P&L spread across grid: best {results[ranked[0]]['total_pnl']:+.0f}t | median {median:+.0f}t | worst {worst:+.0f}t")
+        lines.append("")
+
+    lines.append("=" * 100)
+    return "\n".join(lines)
@@ -0,0 +1,237 @@
+"""
+Streaming store for NinjaTrader 8 historical tick exports.
+
+The export ("yyyyMMdd HHmmss fffffff;price;volume" per line, optionally
+"...;last;bid;ask;volume") is read in chunks of TICK_CHUNK_LINES lines and
+appended to two binary column files next to it:
+
+    <export>.times.bin   array('d') epoch seconds
+    <export>.prices.bin  array('d') trade prices
+
+plus a JSON sidecar <export>.index.json mapping each minute to the first
+tick of that minute. Conversion happens once (redone when the export's
+size or mtime changes); afterwards a trade's window is two seeks and two
+array reads, so memory stays proportional to the window, not the file.
+
+Windows come back in the barstore layout (times/closes arrays) for the
+scan_* simulators, or as BAR-like dicts for simulate_trailing_stop and
+build_trade_windows.
+"""
+
+import os
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from config import TICK_CHUNK_LINES, TICK_TIME_OFFSET_HOURS
+from barstore import to_epoch_seconds, EPOCH
+
+# Bump when the binary layout or parsing changes
+TICK_CACHE_VERSION = 1
+
+
+def tick_cache_paths(export_path):
+    """(times file, prices file, index file) for an export."""
+    return (f"{export_path}.times.bin", f"{export_path}.prices.bin", f"{export_path}.index.json")
+
+
+def parse_tick_line(line, day_cache):
+    """
+    Parse one export line into (epoch seconds, price), or None for blank or
+    malformed lines. day_cache maps 'yyyyMMdd' to that day's epoch seconds.
+    """
+    fields = line.split(';')
+    stamp = fields[0]
+    if len(fields) < 2 or len(stamp) < 15:
+        return None
+    day = stamp[:8]
+    base = day_cache.get(day)
+    if base is None:
+        try:
+            base = to_epoch_seconds(datetime.strptime(day, '%Y%m%d')) + TICK_TIME_OFFSET_HOURS * 3600
+        except ValueError:
+            return None
+        day_cache[day] = base
+    try:
+        seconds = int(stamp[9:11]) * 3600 + int(stamp[11:13]) * 60 + int(stamp[13:15])
+        fraction = int(stamp[16:23]) / 1e7 if len(stamp) > 16 else 0.0
+        return base + seconds + fraction, float(fields[1])
+    except ValueError:
+        return None
+
+
+def build_tick_cache(export_path, chunk_lines=TICK_CHUNK_LINES, log=None):
+    """
+    Convert a tick export into the binary columns and minute index.
+
+    Streams the file; at most chunk_lines ticks are held in memory. Raises
+    ValueError if timestamps go backwards (exports are chronological).
+    Returns the index dict written to the sidecar.
+    """
+    times_path, prices_path, index_path = tick_cache_paths(export_path)
+    stat = os.stat(export_path)
+    minutes = []
+    count = 0
+    skipped = 0
+    last_time = None
+    last_minute = None
+    day_cache = {}
+
+    with open(export_path, 'r', encoding='utf-8', errors='replace') as src, \
+            open(times_path, 'wb') as times_out, open(prices_path, 'wb') as prices_out:
+        times = array('d')
+        prices = array('d')
+        for line in src:
+            tick = parse_tick_line(line.strip(), day_cache)
+            if tick is None:
+                skipped += 1
+                continue
+            t, price = tick
+            if last_time is not None and t < last_time:
+                raise ValueError(f"{export_path}: tick times go backwards at line {count + skipped + 1}")
+            minute = int(t // 60)
+            if minute != last_minute:
+                minutes.append((minute, count))
+                last_minute = minute
+            times.append(t)
+            prices.append(price)
+            last_time = t
+            count += 1
+            if len(times) >= chunk_lines:
+                times.tofile(times_out)
+                prices.tofile(prices_out)
+                times = array('d')
+                prices = array('d')
+        times.tofile(times_out)
+        prices.tofile(prices_out)
+
+    index = {
+        'version': TICK_CACHE_VERSION,
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'offset_hours': TICK_TIME_OFFSET_HOURS,
+        'count': count,
+        'skipped_lines': skipped,
+        'minutes': minutes
+    }
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    if log:
+        log(f"  Tick cache built: {count} ticks, {len(minutes)} minutes ({skipped} lines skipped)")
+    return index
+
+
+def _load_index(export_path):
+    """Sidecar index if it is current for the export, else None."""
+    times_path, prices_path, index_path = tick_cache_paths(export_path)
+    if not all(os.path.exists(p) for p in (times_path, prices_path, index_path)):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(export_path)
+    if (index.get('version') != TICK_CACHE_VERSION or index.get('source_size') != stat.st_size
+            or index.get('source_mtime') != stat.st_mtime
+            or index.get('offset_hours') != TICK_TIME_OFFSET_HOURS):
+        return None
+    return index
+
+
+def open_tick_store(export_path, log=None):
+    """
+    Open a tick export for window reads, converting it first if the cache
+    is missing or stale.
+
+    Returns dict with path, count and the minute index as two arrays
+    (minute_keys: minute since epoch, minute_offsets: first tick index).
+    """
+    index = _load_index(export_path)
+    if index is None:
+        if log:
+            log(f"  Converting tick export {os.path.basename(export_path)}...")
+        index = build_tick_cache(export_path, log=log)
+    return {
+        'path': export_path,
+        'count': index['count'],
+        'minute_keys': array('q', [m for m, _ in index['minutes']]),
+        'minute_offsets': array('q', [o for _, o in index['minutes']]),
+    }
+
+
+def _read_column(path, start, count):
+    values = array('d')
+    with open(path, 'rb') as f:
+        f.seek(start * values.itemsize)
+        values.fromfile(f, count)
+    return values
+
+
+def load_tick_window(tick_store, start_time, end_time):
+    """
+    Ticks with start_time <= time <= end_time in the barstore layout.
+
+    Only the minutes covering the window are read from disk. Returns dict
+    with bars (None), times and closes (array('d')); empty arrays when the
+    export has no ticks in the window.
+    """
+    start = to_epoch_seconds(start_time)
+    end = to_epoch_seconds(end_time)
+    keys = tick_store['minute_keys']
+    offsets = tick_store['minute_offsets']
+    first = bisect_right(keys, int(start // 60)) - 1
+    last = bisect_right(keys, int(end // 60))
+    lo = offsets[first] if first >= 0 else 0
+    hi = offsets[last] if last < len(offsets) else tick_store['count']
+    if hi <= lo:
+        return {'bars': None, 'times': array('d'), 'closes': array('d')}
+
+    times_path, prices_path, _ = tick_cache_paths(tick_store['path'])
+    times = _read_column(times_path, lo, hi - lo)
+    prices = _read_column(prices_path, lo, hi - lo)
+    a = bisect_left(times, start)
+    b = bisect_right(times, end)
+    return {'bars': None, 'times': times[a:b], 'closes': prices[a:b]}
+
+
+def tick_window_bars(window, compress=True):
+    """
+    BAR-like dicts (timestamp, time_str, close; no indicators) for a tick
+    window, usable wherever the simulators take BAR dicts.
+
+    compress drops ticks that repeat the previous price (the last tick is
+    always kept): the close-based exit simulators cannot change state on an
+    unchanged price, so results are identical with far fewer rows.
+    """
+    bars = []
+    previous = None
+    last = len(window['times']) - 1
+    for i, (t, price) in enumerate(zip(window['times'], window['closes'])):
+        if compress and price == previous and i < last:
+            continue
+        previous = price
+        timestamp = EPOCH + timedelta(seconds=t)
+        bars.append({
+            'timestamp': timestamp,
+            'time_str': timestamp.strftime('%H:%M:%S'),
+            'close': price,
+            'indicators': {},
+            'bull_conf': 0,
+            'bear_conf': 0
+        })
+    return bars
+
+
+def apply_tick_windows(windows, tick_store, horizon):
+    """
+    Replace each trade window's bars (build_trade_windows output) with its
+    ticks from entry to entry + horizon. Windows without ticks are dropped.
+    """
+    result = []
+    for w in windows:
+        ticks = load_tick_window(tick_store, w['entry_time'], w['entry_time'] + horizon)
+        if len(ticks['times']):
+            result.append(dict(w, bars=tick_window_bars(ticks)))
+    return result
@@ -0,0 +1,92 @@
+"""
+Run-length-encoded indicator timelines and flip-event index.
+
+Indicator states change far less often than IndicatorValues rows are
+written, so each indicator's state history is kept as runs: the bar index
+where the run starts and its state code (1 = UP, -1 = DN, 0 = missing).
+Memory is proportional to the number of state changes, not bars.
+
+The flip index lists, per indicator, the bar indices where the state flips
+UP->DN and DN->UP (a flip needs both neighbouring bars to have a state, as
+in analyze_indicator_flips_during_trade). "First adverse flip of any
+indicator in S at or after bar i" is then one binary search per indicator.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from config import FLIP_INDICATORS
+
+
+def encode_runs(codes):
+    """RLE of a state code column -> (starts array('i'), values array('b'))."""
+    starts = array('i')
+    values = array('b')
+    previous = None
+    for i, code in enumerate(codes):
+        if code != previous:
+            starts.append(i)
+            values.append(code)
+            previous = code
+    return starts, values
+
+
+def build_indicator_timelines(store):
+    """
+    RLE timelines for every indicator column of a bar store.
+
+    Returns {'count': number of bars, 'runs': {name: (starts, values)}}.
+    """
+    return {
+        'count': len(store['times']),
+        'runs': {name: encode_runs(codes) for name, codes in store['indicators'].items()}
+    }
+
+
+def state_at(timelines, name, index):
+    """State code of indicator name at bar index (binary search over runs)."""
+    starts, values = timelines['runs'][name]
+    run = bisect_left(starts, index + 1) - 1
+    return values[run] if run >= 0 else 0
+
+
+def build_flip_index(store, timelines=None):
+    """
+    Flip events from the RLE timelines.
+
+    Returns dict with store, timelines and 'down' / 'up': {name: array('i')
+    of bar indices where the state flipped UP->DN / DN->UP}.
+    """
+    timelines = timelines or build_indicator_timelines(store)
+    index = {'store': store, 'timelines': timelines, 'down': {}, 'up': {}}
+    for name, (starts, values) in timelines['runs'].items():
+        down = array('i')
+        up = array('i')
+        for r in range(1, len(starts)):
+            if values[r - 1] == 1 and values[r] == -1:
+                down.append(starts[r])
+            elif values[r - 1] == -1 and values[r] == 1:
+                up.append(starts[r])
+        index['down'][name] = down
+        index['up'][name] = up
+    return index
+
+
+def find_adverse_flip(flip_index, direction, start, end, indicators=FLIP_INDICATORS):
+    """
+    First bar index in [start, end) where any of indicators flips against
+    direction (UP->DN for LONG, DN->UP for SHORT).
+
+    Returns (bar index, indicator) or None. Ties on the same bar go to the
+    indicator listed first, matching the bar-by-bar scan.
+    """
+    events = flip_index['down' if direction == 'LONG' else 'up']
+    best = None
+    for name in indicators:
+        flips = events.get(name)
+        if not flips:
+            continue
+        k = bisect_left(flips, start)
+        if k < len(flips) and flips[k] < end and (best is None or flips[k] < best[0]):
+            best = (flips[k], name)
+    return best
@@ -0,0 +1,215 @@
+"""
+Walk-forward evaluation of exit configs across dated analysis folders.
+For each rolling training window the best config (by in-sample P&L) is
+picked and then scored on the following out-of-sample day(s).
+
+Per-day, per-config trade P&L is computed once (days in parallel) and
+shared by every fold that touches that day, so overlapping training
+windows never re-simulate or re-parse anything. Simulated P&L is net of
+the trade windows' slippage cost when they carry one
+(slippage.apply_window_slippage), like the actual trades it is compared to.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from config import (
+    TRAILING_STOP_CONFIGS, DEFAULT_SL_TICKS, DEFAULT_TP_TICKS, TICK_VALUE,
+    WALK_FORWARD_REFERENCE
+)
+from simulation import simulate_trailing_stop
+from sweep import slippage_note
+
+
+def trailing_config_candidates():
+    """TRAILING_STOP_CONFIGS as (name, combo) candidates at the default SL/TP."""
+    return [
+        (c['name'], (DEFAULT_SL_TICKS, DEFAULT_TP_TICKS, c['activation_ticks'], c['trail_distance_ticks']))
+        for c in TRAILING_STOP_CONFIGS
+    ]
+
+
+def grid_candidates(grid):
+    """Sweep grid tuples as (name, combo) candidates."""
+    return [(f"SL{sl}/TP{tp}/Trail-{act}/{trail}", (sl, tp, act, trail)) for sl, tp, act, trail in grid]
+
+
+def _evaluate_day(task):
+    """Simulate every candidate over one day's trade windows (pool worker)."""
+    day, windows, candidates = task
+    trade_pnls = {}
+    slippage = {}
+    for name, (sl, tp, act, trail) in candidates:
+        pnls = []
+        costs = []
+        for w in windows:
+            sim = simulate_trailing_stop(
+                w['bars'], w['entry_time'], w['entry_price'], w['direction'],
+                sl_ticks=sl, tp_ticks=tp, activation_ticks=act, trail_distance_ticks=trail,
+                record='none', horizon=None  # Window already cut to the horizon
+            )
+            cost = w.get('slippage', {}).get(sim['exit_type'], 0.0)
+            pnls.append(sim['exit_pnl_ticks'] - cost)
+            costs.append(cost)
+        trade_pnls[name] = pnls
+        slippage[name] = sum(costs)
+    return day, {
+        'actual': [w['actual_pnl'] for w in windows],
+        'entry_times': [w['entry_time'] for w in windows],
+        'configs': trade_pnls,
+        'slippage': slippage
+    }
+
+
+def evaluate_days(day_windows, candidates, workers=None):
+    """
+    Compute per-trade (net) P&L of every candidate on every day.
+    Days are independent and run in a process pool (workers=1 runs serially).
+    Returns {day: {'actual': [...], 'entry_times': [...], 'configs': {name: [...]},
+    'slippage': {name: total cost}}}.
+    """
+    tasks = [(day, day_windows[day], candidates) for day in sorted(day_windows)]
+    if workers == 1 or len(tasks) < 2:
+        return dict(_evaluate_day(task) for task in tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(_evaluate_day, tasks))
+
+
+def build_folds(days, train_days, test_days):
+    """Rolling (train, test) day lists stepping forward by test_days."""
+    folds = []
+    start = 0
+    while start + train_days + test_days <= len(days):
+        folds.append((days[start:start + train_days], days[start + train_days:start + train_days + test_days]))
+        start += test_days
+    return folds
+
+
+def run_walk_forward(day_windows, candidates, train_days, test_days, workers=None,
+                     reference=WALK_FORWARD_REFERENCE):
+    """
+    Walk-forward over the dated sessions in day_windows.
+
+    Returns dict with per-fold results (chosen config, in-sample P&L,
+    out-of-sample P&L, OOS equity curve, reference/actual OOS P&L) and
+    overall totals, or None if there are too few days for one fold.
+    """
+    days = sorted(day for day, windows in day_windows.items() if windows)
+    folds = build_folds(days, train_days, test_days)
+    if not folds:
+        return None
+
+    by_day = evaluate_days({day: day_windows[day] for day in days}, candidates, workers=workers)
+    names = [name for name, _ in candidates]
+    day_totals = {day: {name: sum(by_day[day]['configs'][name]) for name in names} for day in days}
+
+    fold_results = []
+    for train, test in folds:
+        in_sample = {name: sum(day_totals[day][name] for day in train) for name in names}
+        # Ties go to the earlier candidate (config order), keeping folds deterministic
+        chosen = max(names, key=lambda name: in_sample[name])
+
+        equity = []
+        running = 0.0
+        for day in test:
+            for pnl in by_day[day]['configs'][chosen]:
+                running += pnl
+                equity.append(running)
+
+        oos_trades = sum(len(by_day[day]['actual']) for day in test)
+        fold_results.append({
+            'train': train,
+            'test': test,
+            'chosen': chosen,
+            'in_sample_pnl': in_sample[chosen],
+            'in_sample_per_day': in_sample[chosen] / len(train),
+            'oos_pnl': running,
+            'oos_per_day': running / len(test),
+            'oos_trades': oos_trades,
+            'oos_slippage': sum(by_day[day]['slippage'][chosen] for day in test),
+            'oos_equity': equity,
+            'reference_oos_pnl': (sum(day_totals[day][reference] for day in test)
+                                  if reference in names else None),
+            'actual_oos_pnl': sum(sum(by_day[day]['actual']) for day in test)
+        })
+
+    total_oos = sum(f['oos_pnl'] for f in fold_results)
+    ref_values = [f['reference_oos_pnl'] for f in fold_results if f['reference_oos_pnl'] is not None]
+    return {
+        'days': days,
+        'train_days': train_days,
+        'test_days': test_days,
+        'candidates': len(candidates),
+        'reference': reference if reference in names else None,
+        'folds': fold_results,
+        'total_oos_pnl': total_oos,
+        'total_oos_slippage': sum(f['oos_slippage'] for f in fold_results),
+        'total_reference_oos_pnl': sum(ref_values) if ref_values else None,
+        'total_actual_oos_pnl': sum(f['actual_oos_pnl'] for f in fold_results),
+        'avg_in_sample_per_day': sum(f['in_sample_per_day'] for f in fold_results) / len(fold_results),
+        'avg_oos_per_day': sum(f['oos_per_day'] for f in fold_results) / len(fold_results),
+        'profitable_folds': sum(1 for f in fold_results if f['oos_pnl'] > 0)
+    }
+
+
+def format_walk_forward_report(label, wf, slippage_mode=None):
+    """Text report of a walk-forward run (slippage_mode: model the simulated P&L is net of)."""
+    lines = []
+    lines.append("=" * 100)
+    lines.append(f"WALK-FORWARD EXIT CONFIG EVALUATION - {label}")
+    lines.append("=" * 100)
+    lines.append("")
+    lines.append(f"Days: {len(wf['days'])} | Train window: {wf['train_days']} day(s) | "
+                 f"Test window: {wf['test_days']} day(s) | Candidates: {wf['candidates']}")
+    lines.append("Best config chosen on the training window, then scored out-of-sample (OOS).")
+    lines.append(slippage_note(slippage_mode))
+    lines.append("")
+
+    lines.append("FOLD SUMMARY")
+    lines.append("-" * 100)
+    ref_header = f"{'Ref OOS':>9}" if wf['reference'] else ""
+    slip_header = f"{'Slip':>8} " if slippage_mode else ""
+    lines.append(f"{'Fold':>4}  {'Train':<23} {'Test':<10}  {'Chosen config':<28} {'IS/day':>8} {'OOS':>8} {slip_header}{'Actual':>8} {ref_header}")
+    lines.append("-" * 100)
+    for i, f in enumerate(wf['folds'], 1):
+        train_str = f"{f['train'][0]}..{f['train'][-1][5:]}"
+        test_str = f['test'][0] if len(f['test']) == 1 else f"{f['test'][0]}+{len(f['test']) - 1}"
+        ref_str = f"{f['reference_oos_pnl']:>+8.0f}t" if f['reference_oos_pnl'] is not None else ""
+        slip_str = f"{-f['oos_slippage']:>+7.0f}t " if slippage_mode else ""
+        lines.append(
+            f"{i:>4}  {train_str:<23} {test_str:<10}  {f['chosen']:<28} {f['in_sample_per_day']:>+7.0f}t "
+            f"{f['oos_pnl']:>+7.0f}t {slip_str}{f['actual_oos_pnl']:>+7.0f}t {ref_str}"
+        )
+    lines.append("-" * 100)
+    lines.append("")
+
+    lines.append("OUT-OF-SAMPLE EQUITY CURVES (cumulative ticks per trade)")
+    for i, f in enumerate(wf['folds'], 1):
+        curve = " ".join(f"{v:+.0f}" for v in f['oos_equity']) or "(no trades)"
+        lines.append(f"  Fold {i:>2} [{f['chosen']}]: {curve}")
+    lines.append("")
+
+    # Chained OOS equity across folds (end of each fold)
+    chained = []
+    running = 0.0
+    for f in wf['folds']:
+        running += f['oos_pnl']
+        chained.append(running)
+    lines.append("  Chained OOS equity by fold: " + " ".join(f"{v:+.0f}" for v in chained))
+    lines.append("")
+
+    lines.append("WALK-FORWARD VERDICT")
+    lines.append("-" * 30)
+    lines.append(f"  Walk-forward OOS P&L: {wf['total_oos_pnl']:+.0f}t (${wf['total_oos_pnl'] * TICK_VALUE:+.2f})")
+    if slippage_mode:
+        lines.append(f"  Slippage subtracted from OOS P&L: {wf['total_oos_slippage']:.0f}t")
+    if wf['total_reference_oos_pnl'] is not None:
+        lines.append(f"  Fixed {wf['reference']} over same days: {wf['total_reference_oos_pnl']:+.0f}t")
+    lines.append(f"  Actual trades over same days: {wf['total_actual_oos_pnl']:+.0f}t")
+    lines.append(f"  Profitable OOS folds: {wf['profitable_folds']} of {len(wf['folds'])}")
+    lines.append(f"  Avg in-sample P&L/day: {wf['avg_in_sample_per_day']:+.1f}t | Avg OOS P&L/day: {wf['avg_oos_per_day']:+.1f}t")
+    if wf['avg_in_sample_per_day'] > 0:
+        retained = wf['avg_oos_per_day'] / wf['avg_in_sample_per_day'] * 100
+        lines.append(f"  OOS retains {retained:.0f}% of in-sample edge")
+    lines.append("")
+    lines.append("=" * 100)
+    return "\n".join(lines)
@@ -0,0 +1,168 @@
+"""
+Indicator behaviour analytics over the IndicatorValues bar history:
+flip rates, dwell times, whipsaws and co-flips per indicator.
+
+Everything is computed from the RLE timelines (timelines.py), so after the
+one pass that encodes each column the work is proportional to the number
+of state changes rather than bars - months of history reduce to a few
+thousand runs per indicator.
+
+- flip:      state change UP->DN or DN->UP between consecutive bars
+- dwell:     duration of a run in one state (runs touching the start or
+             end of a day's data are censored and left out)
+- whipsaw:   a flip followed by the flip back within WHIPSAW_BARS bars
+- co-flip:   a flip of indicator A with a flip of B within COFLIP_BARS bars
+             (rate = share of A's flips that B accompanies)
+
+Days are analysed separately and merged, so no run spans two sessions.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from config import WHIPSAW_BARS, COFLIP_BARS
+from barstore import build_bar_store
+from timelines import build_flip_index
+from analysis import summarize_distribution
+
+
+def day_indicator_stats(store, whipsaw_bars=WHIPSAW_BARS, coflip_bars=COFLIP_BARS):
+    """
+    Flip, dwell, whipsaw and co-flip counts for one session's bar store.
+
+    Returns dict with bars, seconds covered and per indicator:
+    up_flips, down_flips, whipsaws, dwell_seconds / dwell_bars lists and
+    coflips {other indicator: count}. Indicators never in a state are skipped.
+    """
+    times = store['times']
+    flip_index = build_flip_index(store)
+    runs = flip_index['timelines']['runs']
+    n = len(times)
+    stats = {'bars': n, 'seconds': times[-1] - times[0] if n else 0, 'indicators': {}}
+
+    flips = {}
+    for name, (starts, values) in runs.items():
+        if not any(values):
+            continue
+        flips[name] = sorted(flip_index['up'][name] + flip_index['down'][name])
+
+        whipsaws = 0
+        dwell_seconds = []
+        dwell_bars = []
+        for r in range(1, len(starts) - 1):
+            if values[r] == 0:
+                continue
+            length = starts[r + 1] - starts[r]
+            dwell_bars.append(length)
+            dwell_seconds.append(times[starts[r + 1]] - times[starts[r]])
+            if values[r - 1] == -values[r] and values[r + 1] == values[r - 1] and length <= whipsaw_bars:
+                whipsaws += 1
+
+        stats['indicators'][name] = {
+            'up_flips': len(flip_index['up'][name]),
+            'down_flips': len(flip_index['down'][name]),
+            'whipsaws': whipsaws,
+            'dwell_seconds': dwell_seconds,
+            'dwell_bars': dwell_bars,
+            'coflips': {}
+        }
+
+    for name, positions in flips.items():
+        coflips = stats['indicators'][name]['coflips']
+        for other, other_positions in flips.items():
+            if other == name or not other_positions:
+                continue
+            count = 0
+            for pos in positions:
+                if bisect_right(other_positions, pos + coflip_bars) > bisect_left(other_positions, pos - coflip_bars):
+                    count += 1
+            coflips[other] = count
+    return stats
+
+
+def merge_indicator_stats(day_stats):
+    """Pool per-day stats (day_indicator_stats) into one set of totals."""
+    merged = {'days': 0, 'bars': 0, 'seconds': 0, 'indicators': {}}
+    for day in day_stats:
+        merged['days'] += 1
+        merged['bars'] += day['bars']
+        merged['seconds'] += day['seconds']
+        for name, s in day['indicators'].items():
+            m = merged['indicators'].setdefault(name, {
+                'up_flips': 0, 'down_flips': 0, 'whipsaws': 0,
+                'dwell_seconds': [], 'dwell_bars': [], 'coflips': {}
+            })
+            m['up_flips'] += s['up_flips']
+            m['down_flips'] += s['down_flips']
+            m['whipsaws'] += s['whipsaws']
+            m['dwell_seconds'].extend(s['dwell_seconds'])
+            m['dwell_bars'].extend(s['dwell_bars'])
+            for other, count in s['coflips'].items():
+                m['coflips'][other] = m['coflips'].get(other, 0) + count
+    return merged
+
+
+def summarize_indicator_stats(merged):
+    """
+    Rates and distributions from merged stats.
+
+    Returns dict with days, bars, hours and per indicator (most flips
+    first): flips, flips_per_hour, whipsaws, whipsaw_rate (%), dwell
+    distributions (seconds and bars) and coflip_rates {other: %}.
+    """
+    hours = merged['seconds'] / 3600
+    indicators = {}
+    for name, m in merged['indicators'].items():
+        flips = m['up_flips'] + m['down_flips']
+        indicators[name] = {
+            'flips': flips,
+            'up_flips': m['up_flips'],
+            'down_flips': m['down_flips'],
+            'flips_per_hour': flips / hours if hours else 0,
+            'whipsaws': m['whipsaws'],
+            'whipsaw_rate': m['whipsaws'] / flips * 100 if flips else 0,
+            'dwell_seconds': summarize_distribution(m['dwell_seconds']),
+            'dwell_bars': summarize_distribution(m['dwell_bars']),
+            'coflip_rates': {other: count / flips * 100 if flips else 0
+                             for other, count in m['coflips'].items()}
+        }
+    ordered = dict(sorted(indicators.items(), key=lambda x: -x[1]['flips']))
+    return {'days': merged['days'], 'bars': merged['bars'], 'hours': hours, 'indicators': ordered}
+
+
+def analyze_indicator_behavior(bars):
+    """Summary for one session's BAR dicts (daily report)."""
+    if not bars:
+        return None
+    return summarize_indicator_stats(merge_indicator_stats([day_indicator_stats(build_bar_store(bars))]))
+
+
+def format_indicator_behavior_lines(summary):
+    """Report lines for summarize_indicator_stats output."""
+    lines = []
+    names = list(summary['indicators'])
+    lines.append(f"Bars: {summary['bars']} over {summary['hours']:.1f}h ({summary['days']} day(s)) | "
+                 f"Whipsaw = flip and flip back within {WHIPSAW_BARS} bars | Co-flip window: ±{COFLIP_BARS} bar(s)")
+    lines.append("")
+    lines.append(f"{'Indicator':<10} {'Flips':>7} {'Up':>6} {'Dn':>6} {'Per hr':>7} {'Whipsaw':>8} {'WS%':>6} "
+                 f"{'Dwell P10':>10} {'P50':>8} {'P90':>8} {'Mean':>8}")
+    lines.append("-" * 90)
+    for name, s in summary['indicators'].items():
+        dwell = s['dwell_seconds']
+        if dwell:
+            dwell_str = f"{dwell['p10']:>9.0f}s {dwell['p50']:>7.0f}s {dwell['p90']:>7.0f}s {dwell['mean']:>7.0f}s"
+        else:
+            dwell_str = f"{'---':>10} {'---':>8} {'---':>8} {'---':>8}"
+        lines.append(f"{name:<10} {s['flips']:>7} {s['up_flips']:>6} {s['down_flips']:>6} {s['flips_per_hour']:>7.1f} "
+                     f"{s['whipsaws']:>8} {s['whipsaw_rate']:>5.1f}% {dwell_str}")
+    lines.append("-" * 90)
+    lines.append("")
+
+    if len(names) > 1:
+        lines.append("CO-FLIP RATES (% of row indicator's flips with a column indicator flip nearby)")
+        lines.append(f"{'':<10}" + "".join(f"{n:>7}" for n in names))
+        for name in names:
+            rates = summary['indicators'][name]['coflip_rates']
+            cells = "".join(f"{'-':>7}" if other == name else f"{rates.get(other, 0):>6.0f}%" for other in names)
+            lines.append(f"{name:<10}{cells}")
+        lines.append("")
+    return lines
@@ -6,16 +6,30 @@ Generates {Mon}{DD}_MR_{Start}_{End}_Trading_Analysis{N}.txt report.
 
 Usage: 
     python AnalyzeMarketReplaySessionLocal.py <start_date> <end_date> [--trader-log <path>] [--csv-log <path>]
+                                           [--same-bar stop_first|target_first|nearest_open] [--max-bars N]
 
 Examples:
     python AnalyzeMarketReplaySessionLocal.py 2025-12-19 2025-12-31
     python AnalyzeMarketReplaySessionLocal.py 2025-12-19 2025-12-31 --trader-log "path/to/ActiveNikiTrader_*.txt"
+
+Exit simulation: every traded round-trip is replayed from its entry bar on
+the logged BAR O/H/L/C, once with the strategy's fixed SL/TP and once per
+point of the trailing-stop grid, and compared with the logged P&L.
+--same-bar picks which level fills first when one bar's range touches
+both the stop and the target (default SAME_BAR_RULE).
+
+Daily policy sweep: each replay day's logged trade sequence is cut by
+every daily loss limit x profit target x max-trades-per-day policy of the
+POLICY_* grid (first trade whose running P&L crosses a limit, as the
+strategy stops after that close) and the resulting P&L is ranked.
 """
 
 import sys
 import os
 import re
 import glob
+import itertools
+from bisect import bisect_left
 from datetime import datetime
 from collections import defaultdict
 
@@ -25,6 +39,26 @@ OUTPUT_BASE_PATH = r"C:\Users\alexb\Downloads\ActiveNiki"
 TICK_VALUE = 5.00  # NQ tick value in dollars
 TICK_SIZE = 0.25   # NQ tick size
 
+# === OHLC EXIT SIMULATION ===
+# Bar whose high/low touches both stop and target: which fills first
+#   stop_first   - assume the stop (conservative)
+#   target_first - assume the target (optimistic)
+#   nearest_open - whichever level is closer to the bar's open
+SAME_BAR_RULES = ['stop_first', 'target_first', 'nearest_open']
+SAME_BAR_RULE = 'stop_first'  # --same-bar
+SIM_MAX_BARS = 120            # Bars followed after entry before TIMEOUT (--max-bars)
+# Trailing-stop grid (ticks): activate at +A, trail D behind the best price
+TRAIL_GRID_ACTIVATION_TICKS = list(range(40, 161, 20))
+TRAIL_GRID_DISTANCE_TICKS = list(range(20, 81, 10))
+TRAIL_GRID_TOP_N = 15  # Rows in the trailing comparison table
+
+# === DAILY POLICY SWEEP ===
+# Policies replayed over each day's logged trades (0 = off)
+POLICY_LOSS_LIMITS_USD = list(range(0, 1001, 100))
+POLICY_PROFIT_TARGETS_USD = list(range(0, 2001, 200))
+POLICY_MAX_TRADES = list(range(0, 11))
+POLICY_TOP_N = 15  # Rows in the policy ranking table
+
 
 def find_latest_file(pattern, folder):
     """Find the most recently modified file matching pattern."""
@@ -47,7 +81,10 @@ def parse_header_config(lines):
         'auto_trade': False,
         'trading_hours': '',
         'daily_loss_limit': 0,
-        'daily_profit_target': 0
+        'daily_profit_target': 0,
+        'sl_buffer_ticks': 0,
+        'trail_activation_ticks': None,
+        'trail_distance_ticks': None
     }
     
     for line in lines[:50]:  # Check first 50 lines for config
@@ -88,6 +125,17 @@ def parse_header_config(lines):
         match = re.search(r'Daily Profit Target: \$(\d+)', line)
         if match:
             config['daily_profit_target'] = int(match.group(1))
+        
+        # SL Buffer: 2 ticks
+        match = re.search(r'SL Buffer: (\d+) ticks', line)
+        if match:
+            config['sl_buffer_ticks'] = int(match.group(1))
+        
+        # Trailing Stop: TICK-BASED | Activate=80t | Distance=30t
+        match = re.search(r'Trailing Stop: TICK-BASED \| Activate=(\d+)t \| Distance=(\d+)t', line)
+        if match:
+            config['trail_activation_ticks'] = int(match.group(1))
+            config['trail_distance_ticks'] = int(match.group(2))
     
     return config
 
@@ -205,10 +253,33 @@ def parse_indicator_state(line):
 
 
 def parse_trades(lines):
-    """Parse trades from ActiveNikiTrader log."""
+    """
+    Parse trades from ActiveNikiTrader log.
+    Entries remember the last [BAR n] logged before the order (the signal
+    bar; the market order fills on the next bar). Exits carry the replay
+    day (NEW DAY lines seen so far) and, from the Daily P&L line that
+    follows them, the entry date.
+    """
     trades = []
+    last_bar = None
+    day = 0
     
     for line in lines:
+        bar_match = re.search(r'\[BAR (\d+)\]', line)
+        if bar_match:
+            last_bar = int(bar_match.group(1))
+            continue
+        
+        if 'NEW DAY:' in line:
+            day += 1
+            continue
+        
+        # Daily P&L: $-340.00 (1 trades) | Entry Time: 2025-12-19 09:31:05
+        date_match = re.search(r'Daily P&L: .*Entry Time: (\d{4}-\d{2}-\d{2})', line)
+        if date_match and trades and trades[-1]['type'] == 'EXIT':
+            trades[-1]['entry_date'] = date_match.group(1)
+            continue
+        
         # ORDER PLACED: LONG @ Market
         order_match = re.search(r'>>> ORDER PLACED: (LONG|SHORT) @ Market', line)
         if order_match:
@@ -219,7 +290,8 @@ def parse_trades(lines):
             trades.append({
                 'type': 'ENTRY',
                 'direction': order_match.group(1),
-                'log_time': log_time
+                'log_time': log_time,
+                'bar_num': last_bar
             })
         
         # TRADE CLOSED: P&L $-340.00 | Daily P&L: $-340.00 (1 trades)
@@ -234,7 +306,27 @@ def parse_trades(lines):
                 'type': 'EXIT',
                 'pnl_dollars': pnl,
                 'pnl_ticks': pnl / TICK_VALUE,
-                'log_time': log_time
+                'log_time': log_time,
+                'entry_price': None,
+                'day': day
+            })
+            continue
+        
+        # TRADE CLOSED: LONG | Entry=25641.50 Exit=25633.25 | -33t $-165.00 | Reason: ...
+        closed_match = re.search(r'TRADE CLOSED: (?:LONG|SHORT) \| Entry=(\d+\.?\d*) Exit=(\d+\.?\d*) \| [+-]?\d+t \$([+-]?\d+\.?\d*)', line)
+        if closed_match:
+            pnl = float(closed_match.group(3))
+            
+            time_match = re.match(r'(\d{2}:\d{2}:\d{2})', line)
+            log_time = time_match.group(1) if time_match else '00:00:00'
+            
+            trades.append({
+                'type': 'EXIT',
+                'pnl_dollars': pnl,
+                'pnl_ticks': pnl / TICK_VALUE,
+                'log_time': log_time,
+                'entry_price': float(closed_match.group(1)),
+                'day': day
             })
     
     return trades
@@ -316,7 +408,11 @@ def build_trade_roundtrips(trades):
                 'entry_time': pending_entry['log_time'],
                 'exit_time': trade['log_time'],
                 'pnl_dollars': trade['pnl_dollars'],
-                'pnl_ticks': trade['pnl_ticks']
+                'pnl_ticks': trade['pnl_ticks'],
+                'entry_bar': pending_entry.get('bar_num'),
+                'entry_price': trade.get('entry_price'),
+                'day': trade.get('day'),
+                'date': trade.get('entry_date')
             })
             pending_entry = None
     
@@ -388,6 +484,400 @@ def analyze_indicator_at_signals(signals):
     return dict(indicator_stats)
 
 
+def build_bar_columns(bars):
+    """
+    Column lists over the parsed bars for the exit simulation.
+    Returns dict with opens/highs/lows/closes/times lists and
+    index {bar_num: position}.
+    """
+    return {
+        'opens': [b['open'] for b in bars],
+        'highs': [b['high'] for b in bars],
+        'lows': [b['low'] for b in bars],
+        'closes': [b['close'] for b in bars],
+        'times': [b['time'] for b in bars],
+        'index': {b['bar_num']: i for i, b in enumerate(bars)}
+    }
+
+
+def simulate_exits_ohlc(columns, start, entry_price, direction, sl_ticks, tp_ticks, exit_configs,
+                        same_bar_rule=SAME_BAR_RULE, max_bars=SIM_MAX_BARS):
+    """
+    Replay one trade on BAR O/H/L/C from bar position start, advancing every
+    exit config together bar by bar.
+    
+    exit_configs: list of (activation_ticks, trail_distance_ticks); (None, None)
+    is plain fixed SL/TP. Levels are checked against each bar's high/low; a
+    bar that opens beyond a level fills at the open. The trailing stop arms
+    and ratchets on the bar's close, as ActiveNikiTrader.OnBarUpdate does
+    (profit from Close[0], stop at Close[0] -/+ distance), after the bar's
+    exits are checked, so it applies from the next bar. The replay ends after max_bars bars or
+    at the end of the session (bar time going backwards) as TIMEOUT at the
+    last close.
+    
+    Returns (results, ambiguous) where results is one dict per config
+    (exit_type, pnl_ticks, bars_held, trail_activated, max_profit_ticks)
+    and ambiguous is True if the fixed SL/TP levels were both inside one bar.
+    """
+    sign = 1 if direction == 'LONG' else -1
+    opens, highs, lows, closes, times = (columns['opens'], columns['highs'], columns['lows'],
+                                         columns['closes'], columns['times'])
+    stops = [-sl_ticks] * len(exit_configs)
+    trailing = [False] * len(exit_configs)
+    results = [None] * len(exit_configs)
+    active = list(range(len(exit_configs)))
+    ambiguous = False
+    max_profit = 0.0
+    end = min(len(closes), start + max_bars)
+    last = start
+    
+    for i in range(start, end):
+        if i > start and times[i] < times[i - 1]:
+            break  # New session - the position would not be carried over
+        last = i
+        open_p = sign * (opens[i] - entry_price) / TICK_SIZE
+        close_p = sign * (closes[i] - entry_price) / TICK_SIZE
+        best = sign * ((highs[i] if sign > 0 else lows[i]) - entry_price) / TICK_SIZE
+        worst = sign * ((lows[i] if sign > 0 else highs[i]) - entry_price) / TICK_SIZE
+        max_profit = max(max_profit, best)
+        if worst <= -sl_ticks and best >= tp_ticks:
+            ambiguous = True
+        
+        still_active = []
+        for k in active:
+            stop = stops[k]
+            stop_type = 'TRAIL' if trailing[k] else 'SL'
+            if open_p <= stop:
+                results[k] = (stop_type, open_p, i)
+                continue
+            if open_p >= tp_ticks:
+                results[k] = ('TP', open_p, i)
+                continue
+            stop_hit = worst <= stop
+            target_hit = best >= tp_ticks
+            if stop_hit and target_hit:
+                if same_bar_rule == 'target_first':
+                    stop_hit = False
+                elif same_bar_rule == 'nearest_open' and tp_ticks - open_p < open_p - stop:
+                    stop_hit = False
+            if stop_hit:
+                results[k] = (stop_type, stop, i)
+                continue
+            if target_hit:
+                results[k] = ('TP', tp_ticks, i)
+                continue
+            activation, distance = exit_configs[k]
+            if activation is not None and close_p >= activation:
+                trailing[k] = True
+                stops[k] = max(stop, close_p - distance)
+            still_active.append(k)
+        active = still_active
+        if not active:
+            break
+    
+    last_close = sign * (closes[last] - entry_price) / TICK_SIZE
+    for k in active:
+        results[k] = ('TIMEOUT', last_close, last)
+    return [
+        {'exit_type': exit_type, 'pnl_ticks': pnl, 'bars_held': i - start + 1,
+         'trail_activated': trailing[k], 'max_profit_ticks': max_profit}
+        for k, (exit_type, pnl, i) in enumerate(results)
+    ], ambiguous
+
+
+def run_exit_simulation(roundtrips, bars, config, same_bar_rule=SAME_BAR_RULE, max_bars=SIM_MAX_BARS):
+    """
+    Simulate fixed SL/TP and the trailing grid for every round-trip with a
+    logged entry bar. SL/TP come from the log header (SL includes the SL
+    buffer). Entry price is the logged fill, else the next bar's open.
+    
+    Returns dict with sl/tp ticks, rule, exit_configs, per-config totals
+    (actual, simulated, better/worse/same, exit types) and per-rule totals
+    of the fixed SL/TP replay; None without bars or simulatable trades.
+    """
+    if not bars:
+        return None
+    columns = build_bar_columns(bars)
+    sl_ticks = config['stop_loss'] / TICK_VALUE + config['sl_buffer_ticks']
+    tp_ticks = config['take_profit'] / TICK_VALUE
+    exit_configs = [(None, None)] + [
+        (activation, distance)
+        for activation in TRAIL_GRID_ACTIVATION_TICKS
+        for distance in TRAIL_GRID_DISTANCE_TICKS
+    ]
+    totals = [{'trades': 0, 'better': 0, 'worse': 0, 'same': 0, 'actual': 0.0, 'simulated': 0.0,
+               'exit_types': defaultdict(int)} for _ in exit_configs]
+    by_rule = {rule: {'simulated': 0.0, 'exit_types': defaultdict(int)} for rule in SAME_BAR_RULES}
+    trades = 0
+    skipped = 0
+    ambiguous_trades = 0
+    
+    for rt in roundtrips:
+        position = columns['index'].get(rt.get('entry_bar'))
+        if position is None or position + 1 >= len(bars):
+            skipped += 1
+            continue
+        start = position + 1  # Market order fills on the bar after the signal bar
+        entry_price = rt.get('entry_price') or columns['opens'][start]
+        trades += 1
+        
+        results, ambiguous = simulate_exits_ohlc(columns, start, entry_price, rt['direction'],
+                                                 sl_ticks, tp_ticks, exit_configs, same_bar_rule, max_bars)
+        if ambiguous:
+            ambiguous_trades += 1
+        for total, result in zip(totals, results):
+            difference = result['pnl_ticks'] - rt['pnl_ticks']
+            total['trades'] += 1
+            total['actual'] += rt['pnl_ticks']
+            total['simulated'] += result['pnl_ticks']
+            total['exit_types'][result['exit_type']] += 1
+            if abs(difference) < 0.5:
+                total['same'] += 1
+            elif difference > 0:
+                total['better'] += 1
+            else:
+                total['worse'] += 1
+        
+        # Fixed SL/TP under every same-bar rule (sensitivity to the assumption)
+        for rule in SAME_BAR_RULES:
+            fixed = results[0] if rule == same_bar_rule else simulate_exits_ohlc(
+                columns, start, entry_price, rt['direction'], sl_ticks, tp_ticks,
+                [(None, None)], rule, max_bars)[0][0]
+            by_rule[rule]['simulated'] += fixed['pnl_ticks']
+            by_rule[rule]['exit_types'][fixed['exit_type']] += 1
+    
+    if trades == 0:
+        return None
+    return {
+        'sl_ticks': sl_ticks,
+        'tp_ticks': tp_ticks,
+        'same_bar_rule': same_bar_rule,
+        'max_bars': max_bars,
+        'trades': trades,
+        'skipped': skipped,
+        'ambiguous_trades': ambiguous_trades,
+        'exit_configs': exit_configs,
+        'totals': totals,
+        'by_rule': by_rule
+    }
+
+
+def format_exit_simulation_lines(sim, config):
+    """Report sections for run_exit_simulation output (mirrors the daily report's trailing sections)."""
+    lines = []
+    lines.append("=" * 80)
+    lines.append("EXIT SIMULATION (BAR OHLC)")
+    lines.append("=" * 80)
+    lines.append(f"Trades simulated: {sim['trades']}" +
+                 (f" | Skipped (no entry BAR): {sim['skipped']}" if sim['skipped'] else ""))
+    lines.append(f"SL {sim['sl_ticks']:.0f}t (incl. {config['sl_buffer_ticks']}t buffer) | TP {sim['tp_ticks']:.0f}t | "
+                 f"Max hold {sim['max_bars']} bars | Same-bar rule: {sim['same_bar_rule']}")
+    lines.append(f"Trades with a bar touching both SL and TP: {sim['ambiguous_trades']}")
+    lines.append("")
+    
+    baseline = sim['totals'][0]
+    lines.append("SIMULATION vs ACTUAL (fixed SL/TP)")
+    lines.append("-" * 34)
+    lines.append(f"  Actual P&L:    {baseline['actual']:+.0f}t (${baseline['actual'] * TICK_VALUE:+.2f})")
+    lines.append(f"  Simulated P&L: {baseline['simulated']:+.0f}t (${baseline['simulated'] * TICK_VALUE:+.2f})")
+    lines.append(f"  Trades matching actual (within 1t): {baseline['same']} of {baseline['trades']}")
+    lines.append("  Exit types: " + ", ".join(f"{t} {n}" for t, n in sorted(baseline['exit_types'].items())))
+    lines.append("")
+    
+    lines.append("SAME-BAR RULE SENSITIVITY (fixed SL/TP)")
+    lines.append("-" * 39)
+    for rule in SAME_BAR_RULES:
+        r = sim['by_rule'][rule]
+        marker = "  <- used" if rule == sim['same_bar_rule'] else ""
+        lines.append(f"  {rule:<13} {r['simulated']:>+8.0f}t  TP {r['exit_types'].get('TP', 0):>4}  "
+                     f"SL {r['exit_types'].get('SL', 0):>4}  TIMEOUT {r['exit_types'].get('TIMEOUT', 0):>4}{marker}")
+    lines.append("")
+    
+    # Live tick-based trailing config on the grid (None for ATR trailing / no trailing line);
+    # index 0 is the fixed SL/TP baseline and is never the live trailing row
+    live = None
+    if config['trail_activation_ticks'] is not None:
+        live_config = (config['trail_activation_ticks'], config['trail_distance_ticks'])
+        if live_config in sim['exit_configs'][1:]:
+            live = sim['exit_configs'].index(live_config, 1)
+    ranked = sorted(range(1, len(sim['exit_configs'])),
+                    key=lambda k: sim['totals'][k]['simulated'], reverse=True)
+    lines.append("TRAILING STOP COMPARISON SUMMARY")
+    lines.append("-" * 80)
+    lines.append(f"{'Strategy':<22} {'Trades':>7} {'Better':>7} {'Worse':>7} {'Same':>6} {'Actual':>9} {'Trail':>9} {'NET':>9}")
+    lines.append("-" * 80)
+    lines.append(f"{'Fixed SL/TP (sim)':<22} {baseline['trades']:>7} {baseline['better']:>7} {baseline['worse']:>7} "
+                 f"{baseline['same']:>6} {baseline['actual']:>+8.0f}t {baseline['simulated']:>+8.0f}t "
+                 f"{baseline['simulated'] - baseline['actual']:>+8.0f}t")
+    shown = ranked[:TRAIL_GRID_TOP_N]
+    if live is not None and live not in shown:
+        shown.append(live)
+    for k in shown:
+        activation, distance = sim['exit_configs'][k]
+        t = sim['totals'][k]
+        name = f"Trail {activation}/{distance}" + (" (live)" if k == live else "")
+        lines.append(f"{name:<22} {t['trades']:>7} {t['better']:>7} {t['worse']:>7} {t['same']:>6} "
+                     f"{t['actual']:>+8.0f}t {t['simulated']:>+8.0f}t {t['simulated'] - t['actual']:>+8.0f}t")
+    lines.append("-" * 80)
+    lines.append(f"Top {len(ranked[:TRAIL_GRID_TOP_N])} of {len(ranked)} grid points by simulated P&L; "
+                 f"NET = simulated - actual")
+    lines.append("")
+    
+    lines.append("TRAILING STOP GRID (simulated P&L, ticks) - rows: activation, columns: distance")
+    lines.append(f"{'Act':>6} " + "".join(f"{d:>8}" for d in TRAIL_GRID_DISTANCE_TICKS))
+    for activation in TRAIL_GRID_ACTIVATION_TICKS:
+        cells = "".join(f"{sim['totals'][sim['exit_configs'].index((activation, d))]['simulated']:>+8.0f}"
+                        for d in TRAIL_GRID_DISTANCE_TICKS)
+        lines.append(f"{activation:>6} {cells}")
+    lines.append("")
+    
+    lines.append("TRAILING STOP RECOMMENDATION")
+    lines.append("-" * 28)
+    best = ranked[0] if ranked else None
+    if best is not None and sim['totals'][best]['simulated'] > baseline['simulated']:
+        activation, distance = sim['exit_configs'][best]
+        gain = sim['totals'][best]['simulated'] - baseline['simulated']
+        lines.append(f"  Best trailing config: activate +{activation}t, trail {distance}t "
+                     f"({gain:+.0f}t vs simulated fixed SL/TP)")
+    else:
+        lines.append("  No trailing stop configuration beat fixed SL/TP in the simulation.")
+    lines.append("")
+    return lines
+
+
+def group_daily_pnl(roundtrips):
+    """Per replay day: (label, [P&L $ per trade in order]); label is the entry date when logged."""
+    days = []
+    current = None
+    for rt in roundtrips:
+        if not days or rt.get('day') != current:
+            current = rt.get('day')
+            days.append([rt.get('date') or f"Day {len(days) + 1}", []])
+        days[-1][1].append(rt['pnl_dollars'])
+    return [tuple(day) for day in days]
+
+
+def first_crossings(levels, running):
+    """Index of the first trade whose running value reaches each level (len = never); 0 = off."""
+    n = len(running)
+    return {level: bisect_left(running, level) if level else n for level in levels}
+
+
+def run_policy_sweep(roundtrips, loss_limits=POLICY_LOSS_LIMITS_USD, profit_targets=POLICY_PROFIT_TARGETS_USD,
+                     max_trades=POLICY_MAX_TRADES):
+    """
+    Replay every (loss limit, profit target, max trades) policy over each
+    day's logged trade sequence.
+    
+    Per day the cumulative P&L is built once; its running drawdown and
+    running peak are non-decreasing, so the first trade that hits a loss
+    limit / profit target is a bisect per level, shared by all policies.
+    A policy's day then stops at the earliest of the three indices.
+    
+    Returns dict with days (labels), grid, per-policy results (pnl, trades,
+    loss/profit/max-trade stop days, worst day, positive days) and the
+    logged totals; None without trades.
+    """
+    days = group_daily_pnl(roundtrips)
+    if not days:
+        return None
+    tables = []
+    for _, pnls in days:
+        cumulative = [round(x, 2) for x in itertools.accumulate(pnls)]
+        drawdown = [-x for x in itertools.accumulate(cumulative, min)]
+        peak = list(itertools.accumulate(cumulative, max))
+        n = len(cumulative)
+        tables.append({
+            'cumulative': cumulative,
+            'loss': first_crossings(loss_limits, drawdown),
+            'profit': first_crossings(profit_targets, peak),
+            'max': {m: min(m, n) - 1 if m else n - 1 for m in max_trades},
+            'last': n - 1
+        })
+    
+    grid = list(itertools.product(loss_limits, profit_targets, max_trades))
+    results = []
+    for loss, profit, most in grid:
+        result = {'pnl': 0.0, 'trades': 0, 'loss_days': 0, 'profit_days': 0, 'max_days': 0,
+                  'worst_day': None, 'positive_days': 0}
+        for table in tables:
+            loss_stop = table['loss'][loss]
+            profit_stop = table['profit'][profit]
+            stop = min(loss_stop, profit_stop, table['max'][most])
+            day_pnl = table['cumulative'][stop]
+            result['pnl'] += day_pnl
+            result['trades'] += stop + 1
+            if stop == loss_stop:
+                result['loss_days'] += 1
+            elif stop == profit_stop:
+                result['profit_days'] += 1
+            elif stop < table['last']:
+                result['max_days'] += 1
+            if result['worst_day'] is None or day_pnl < result['worst_day']:
+                result['worst_day'] = day_pnl
+            if day_pnl > 0:
+                result['positive_days'] += 1
+        results.append(result)
+    
+    return {
+        'days': [label for label, _ in days],
+        'grid': grid,
+        'results': results,
+        'logged': {'pnl': sum(t['cumulative'][-1] for t in tables), 'trades': sum(t['last'] + 1 for t in tables)}
+    }
+
+
+def format_policy_sweep_lines(sweep, config, top_n=POLICY_TOP_N):
+    """Report section for run_policy_sweep output."""
+    grid = sweep['grid']
+    results = sweep['results']
+    ranked = sorted(range(len(grid)), key=lambda i: results[i]['pnl'], reverse=True)
+    live = (config['daily_loss_limit'], config['daily_profit_target'], 0)
+    days = len(sweep['days'])
+    
+    def fmt(value, unit=''):
+        return f"{value}{unit}" if value else "off"
+    
+    def row(label, i):
+        loss, profit, most = grid[i]
+        r = results[i]
+        return (f"{label:>5} {fmt(loss, '$'):>7} {fmt(profit, '$'):>7} {fmt(most):>5} {r['trades']:>7} "
+                f"{r['pnl']:>+11.2f} {r['pnl'] - sweep['logged']['pnl']:>+10.2f} {r['worst_day']:>+10.2f} "
+                f"{r['positive_days']:>3}/{days:<3} {r['loss_days']:>4} {r['profit_days']:>4} {r['max_days']:>4}")
+    
+    lines = []
+    lines.append("=" * 80)
+    lines.append("DAILY LIMIT POLICY SWEEP (logged trade sequences)")
+    lines.append("=" * 80)
+    lines.append(f"Days: {days} | Trades logged: {sweep['logged']['trades']} (${sweep['logged']['pnl']:+.2f}) | "
+                 f"Policies: {len(grid)}")
+    lines.append(f"Loss limits: {POLICY_LOSS_LIMITS_USD[0]}..{POLICY_LOSS_LIMITS_USD[-1]}$ | "
+                 f"Profit targets: {POLICY_PROFIT_TARGETS_USD[0]}..{POLICY_PROFIT_TARGETS_USD[-1]}$ | "
+                 f"Max trades/day: {POLICY_MAX_TRADES[0]}..{POLICY_MAX_TRADES[-1]} (0 = off)")
+    if config['daily_loss_limit'] or config['daily_profit_target']:
+        lines.append("Note: the log already stops at the live limits - looser policies cannot add trades that were never taken")
+    lines.append("")
+    header = (f"{'Rank':>5} {'Loss':>7} {'Target':>7} {'Max':>5} {'Trades':>7} {'P&L $':>11} {'vs Log':>10} "
+              f"{'Worst day':>10} {'Up days':>7} {'LStp':>4} {'PStp':>4} {'MStp':>4}")
+    lines.append(header)
+    lines.append("-" * len(header))
+    for rank, i in enumerate(ranked[:top_n], 1):
+        lines.append(row(rank, i))
+    lines.append("-" * len(header))
+    positions = {i: rank for rank, i in enumerate(ranked, 1)}
+    policies = [('No limits', (0, 0, 0))]
+    if live != (0, 0, 0):
+        policies.append(('Live (header)', live))
+    for label, policy in policies:
+        if policy in grid:
+            i = grid.index(policy)
+            lines.append(row(positions[i], i) + f"  <- {label}")
+    lines.append("")
+    lines.append("LStp/PStp/MStp = days stopped by the loss limit / profit target / max trades")
+    lines.append("")
+    return lines
+
+
 def find_previous_runs(output_folder, start_date, end_date):
     """Find previous analysis files for the same date range."""
     parent_dir = os.path.dirname(output_folder.rstrip('/\\'))
@@ -468,7 +958,8 @@ def get_next_run_number(output_folder, start_date, end_date, month_abbr, day):
     return max_num + 1
 
 
-def generate_report(config, signals, roundtrips, bars, daily_events, start_date, end_date):
+def generate_report(config, signals, roundtrips, bars, daily_events, start_date, end_date,
+                    same_bar_rule=SAME_BAR_RULE, max_bars=SIM_MAX_BARS):
     """Generate the Market Replay analysis report."""
     
     # Basic stats
@@ -611,6 +1102,21 @@ def generate_report(config, signals, roundtrips, bars, daily_events, start_date,
                 lines.append(f"  {conf}/8: {bull_counts[conf]} bars ({pct:.1f}%)")
         lines.append("")
     
+    # OHLC exit simulation (fixed SL/TP and trailing grid vs actual)
+    exit_sim = run_exit_simulation(roundtrips, bars, config, same_bar_rule, max_bars)
+    if exit_sim:
+        lines.extend(format_exit_simulation_lines(exit_sim, config))
+    
+    # Daily loss limit / profit target / max trades policies over the logged trades
+    # (the header's live limits are always on the grid)
+    policy_sweep = run_policy_sweep(
+        roundtrips,
+        sorted(set(POLICY_LOSS_LIMITS_USD) | {config['daily_loss_limit']}),
+        sorted(set(POLICY_PROFIT_TARGETS_USD) | {config['daily_profit_target']})
+    )
+    if policy_sweep:
+        lines.extend(format_policy_sweep_lines(policy_sweep, config))
+    
     # Key insights
     lines.append("=" * 80)
     lines.append("KEY INSIGHTS")
@@ -700,6 +1206,8 @@ def main():
     # Parse optional arguments
     trader_log_path = None
     csv_log_path = None
+    same_bar_rule = SAME_BAR_RULE
+    max_bars = SIM_MAX_BARS
     
     i = 3
     while i < len(sys.argv):
@@ -709,9 +1217,23 @@ def main():
         elif sys.argv[i] == '--csv-log' and i + 1 < len(sys.argv):
             csv_log_path = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == '--same-bar' and i + 1 < len(sys.argv):
+            same_bar_rule = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--max-bars' and i + 1 < len(sys.argv):
+            max_bars = sys.argv[i + 1]
+            i += 2
         else:
             i += 1
     
+    if same_bar_rule not in SAME_BAR_RULES:
+        print(f"ERROR: Unknown --same-bar '{same_bar_rule}' (use {', '.join(SAME_BAR_RULES)})")
+        sys.exit(1)
+    if not str(max_bars).isdigit() or int(max_bars) < 1:
+        print(f"ERROR: --max-bars must be a whole number >= 1 (got '{max_bars}')")
+        sys.exit(1)
+    max_bars = int(max_bars)
+    
     # Find log files
     if trader_log_path is None:
         trader_log_path = find_latest_file("ActiveNikiTrader_*.txt", LOCAL_LOG_PATH)
@@ -760,7 +1282,8 @@ def main():
     
     # Generate report
     print("\nGenerating analysis report...")
-    report = generate_report(config, signals, roundtrips, bars, daily_events, start_date, end_date)
+    report = generate_report(config, signals, roundtrips, bars, daily_events, start_date, end_date,
+                             same_bar_rule, max_bars)
     
     # Calculate current stats for comparison
     total_trades = len(roundtrips)